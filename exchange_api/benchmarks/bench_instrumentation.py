@@ -0,0 +1,58 @@
+""" Cost of the instrumentation per request: the event and hook calls alone (disabled is the `event is not None`
+checks the clients make), and requests per second against a local stub of the api without instrumentation, with
+no hooks and with `RequestMetrics` installed:
+
+    PYTHONPATH=. python3 -m benchmarks.bench_instrumentation --requests 2000 --events 200000
+"""
+import argparse
+from time import perf_counter
+
+from exchange_api.client import Client
+from exchange_api.instrumentation import Instrumentation, RequestMetrics
+from tests.stub_server import StubApi
+
+HEADERS = {'Accept': 'application/json', 'Authorization': 'HMAC key|1|2|digest'}
+
+
+def request_path(instrumentation, events: int) -> float:
+    # the instrumentation calls of `Client.send_request_`, without the request
+    start = perf_counter()
+    for _ in range(events):
+        event = None if instrumentation is None else instrumentation.start('GET', 'trades/abc123', None, None)
+        if event is not None:
+            event.admitted()
+        if event is not None:
+            event.signed('http://localhost/v1/trades/abc123', HEADERS, None)
+            instrumentation.sent(event)
+        if event is not None:
+            event.received(200, 100, 0.001)
+        if event is not None:
+            instrumentation.succeeded(event, None)
+    return (perf_counter() - start) / events
+
+
+def requests_per_second(api: StubApi, instrumentation, requests: int) -> float:
+    with Client(api.key, api.secret, api.url, None, venue_id='venue', instrumentation=instrumentation) as client:
+        start = perf_counter()
+        for _ in range(requests):
+            client.list_symbols()
+        return requests / (perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='cost of the request instrumentation')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=200000)
+    args = parser.parse_args()
+
+    variants = (
+        ('disabled', lambda: None),
+        ('no hooks', Instrumentation),
+        ('RequestMetrics', lambda: RequestMetrics().install(Instrumentation())),
+    )
+    for name, create in variants:
+        print(f'{name:>15}: {request_path(create(), args.events) * 1e6:7.3f} us per request')
+    with StubApi() as api:
+        api.route('GET', 'symbols', lambda request: (200, [{'symbol': 'BTC'}]))
+        for name, create in variants:
+            print(f'{name:>15}: {requests_per_second(api, create(), args.requests):7.0f} requests/s')
@@ -0,0 +1,29 @@
+""" Load test of "nonce too low" recovery against a local stub of the api that checks nonces: many threads share a
+client whose nonces start far below the highest nonce used by the api key, and every request has to succeed:
+
+    PYTHONPATH=. python3 -m benchmarks.bench_nonce_recovery --requests 5000 --threads 32
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from exchange_api.client import Client
+from tests.stub_server import StubApi
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='load tests nonce resyncs of concurrent requests')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--nonce-window', type=int, default=1000)
+    args = parser.parse_args()
+
+    with StubApi(check_nonces=True, nonce_window=args.nonce_window, highest_used_nonce=10 ** 9) as api:
+        api.route('GET', 'symbols', lambda request: (200, []))
+        with Client(api.key, api.secret, api.url, None, venue_id='venue', pool_maxsize=args.threads) as client:
+            start = perf_counter()
+            with ThreadPoolExecutor(args.threads) as executor:
+                for _ in executor.map(lambda _: client.list_symbols(), range(args.requests)):
+                    pass
+            elapsed = perf_counter() - start
+            print(f'{args.requests / elapsed:.0f} requests/s, {api.rejected_nonces} rejected nonces, '
+                  f'nonce stats: {client.nonce_stats}')
@@ -0,0 +1,49 @@
+""" Memory held by a day of trades decoded as response dicts and as `TradeInfo` records:
+
+    PYTHONPATH=. python3 -m benchmarks.bench_records --trades 200000
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from exchange_api.models import TradeInfo
+
+
+def trades_json(count) -> bytes:
+    rng = random.Random(1)
+    return json.dumps([{
+        'baseSymbol': rng.choice(['XXBT', 'XETH', 'USDC']), 'counter': f'{rng.random() * 10 ** 6:.8f}',
+        'counterpartyIdentifier': rng.choice(['123456', '234567', '345678']), 'dealt': f'{rng.random() * 10:.8f}',
+        'executionDate': '2020-09-07T11:17:23.456+00:00', 'identifier': f'trade-{i}',
+        'liquidityIndicator': rng.choice(['Aggressive', 'Passive']), 'notes': None,
+        'rate': f'{rng.random() * 10 ** 5:.8f}', 'receivedDate': '2020-09-07T11:17:24.000+00:00',
+        'settlementNumber': f'KRKN-{i // 1000:06d}', 'side': rng.choice(['Buy', 'Sell']), 'source': 'source-api-key',
+        'status': 'Open', 'strikeFee': '0.02', 'strikeFeeSymbol': 'USD', 'strikeTradeId': f'strike-{i}',
+        'termSymbol': 'ZUSD', 'tradeHash': f'{rng.getrandbits(256):064x}', 'venueFee': '0.01',
+        'venueFeeSymbol': 'USD',
+    } for i in range(count)]).encode()
+
+
+def measure(decode, content: bytes) -> int:
+    """ The bytes still allocated once `content` was decoded, i.e. what holding the decoded trades costs. """
+    gc.collect()
+    tracemalloc.start()
+    trades = decode(content)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del trades
+    return size
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='compares the memory of trade dicts and records')
+    parser.add_argument('--trades', type=int, default=200000)
+    args = parser.parse_args()
+
+    content = trades_json(args.trades)
+    dicts = measure(json.loads, content)
+    records = measure(lambda c: [TradeInfo.from_json(trade) for trade in json.loads(c)], content)
+    for name, size in (('dicts', dicts), ('records', records)):
+        print(f'{name:>8}: {size / 2 ** 20:8.1f} MB, {size / args.trades:6.0f} bytes/trade')
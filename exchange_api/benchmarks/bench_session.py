@@ -0,0 +1,36 @@
+""" Requests per second against a local stub of the api, with a new connection per request (as with the
+module-level `requests.get`/`requests.post` the client used before) and with the pooled session:
+
+    PYTHONPATH=. python3 -m benchmarks.bench_session --requests 2000 --threads 8
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from exchange_api.client import Client
+from tests.stub_server import StubApi
+
+
+def run(api: StubApi, requests: int, threads: int, keep_alive: bool):
+    with Client(api.key, api.secret, api.url, None, venue_id='venue', keep_alive=keep_alive,
+                pool_maxsize=threads) as client:
+        connections = api.connections
+        start = perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            for _ in executor.map(lambda _: client.list_symbols(), range(requests)):
+                pass
+        elapsed = perf_counter() - start
+    return requests / elapsed, api.connections - connections
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='compares connection per request and pooled connections')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    with StubApi() as api:
+        api.route('GET', 'symbols', lambda request: (200, [{'symbol': 'BTC'}, {'symbol': 'USD'}]))
+        for name, keep_alive in (('connection per request', False), ('pooled session', True)):
+            requests_per_second, connections = run(api, args.requests, args.threads, keep_alive)
+            print(f'{name:>24}: {requests_per_second:8.0f} requests/s, {connections} connections')
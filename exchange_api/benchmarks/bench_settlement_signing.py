@@ -0,0 +1,48 @@
+""" Settlement signatures per second: `Client.sign` as it was before (the `ecdsa` package without precomputation),
+`EcdsaSigner`, `CryptographySigner` (if installed) and `SigningPool` over each backend:
+
+    PYTHONPATH=. python3 -m benchmarks.bench_settlement_signing --signatures 2000 --processes 4
+"""
+import argparse
+import hashlib
+from time import perf_counter
+
+from ecdsa import NIST256p, SigningKey, util as ecdsa_util
+
+from exchange_api.settlement_signing import HAS_CRYPTOGRAPHY, CryptographySigner, EcdsaSigner, SigningPool
+
+
+def signatures_per_second(sign_many, flow_hashes) -> float:
+    start = perf_counter()
+    sign_many(flow_hashes)
+    return len(flow_hashes) / (perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='compares the settlement signing backends')
+    parser.add_argument('--signatures', type=int, default=2000)
+    parser.add_argument('--processes', type=int, default=4)
+    args = parser.parse_args()
+
+    pem = SigningKey.generate(curve=NIST256p, hashfunc=hashlib.sha256).to_pem().decode()
+    flow_hashes = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(args.signatures)]
+
+    # the signing key the client used to load, without the precomputed generator tables
+    signing_key = SigningKey.from_pem(pem, hashlib.sha256)
+    runs = [('ecdsa (before)', lambda messages: [signing_key.sign(
+        message.encode(), hashfunc=hashlib.sha256, sigencode=ecdsa_util.sigencode_der) for message in messages])]
+    signer_types = [EcdsaSigner] + ([CryptographySigner] if HAS_CRYPTOGRAPHY else [])
+    pools = []
+    for signer_type in signer_types:
+        signer = signer_type(pem)
+        pool = SigningPool(signer, processes=args.processes, min_batch_size=1)
+        pools.append(pool)
+        runs.append((signer_type.__name__, lambda messages, signer=signer: [signer.sign_b64(m) for m in messages]))
+        # the first batch also starts the processes
+        pool.sign_many(flow_hashes[:args.processes])
+        runs.append((f'{signer_type.__name__} pool', pool.sign_many))
+
+    for name, sign_many in runs:
+        print(f'{name:>24}: {signatures_per_second(sign_many, flow_hashes):9.0f} signatures/s')
+    for pool in pools:
+        pool.close()
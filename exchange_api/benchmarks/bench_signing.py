@@ -0,0 +1,55 @@
+""" Per-request signing cost: the digest as it was computed before (the whole `key|secret|...` string formatted
+and hashed, the timestamp formatted with strftime and the body encoded with json.dumps for the digest and again
+for the wire) against `RequestSigner` and `Client.get_headers`:
+
+    PYTHONPATH=. python3 -m benchmarks.bench_signing --requests 200000
+"""
+import argparse
+from datetime import datetime, timezone
+import json
+from time import perf_counter
+
+from exchange_api.client import Client
+from exchange_api.request_signing import RequestSigner
+from tests.test_request_signing import naive_digest
+
+DATA = {
+    'identifier': 'abc123', 'side': 'Sell', 'baseSymbol': 'XBT', 'termSymbol': 'USD', 'dealt': '12.345678',
+    'rate': '11201.72', 'counter': '138292.83', 'counterpartyIdentifier': '987654', 'liquidityIndicator': None,
+    'venueFee': '0', 'venueFeeSymbol': None, 'notes': None, 'executionDate': '2020-01-02T03:04:05.678+00:00',
+    'tradeHash': '1d0b0b4ab7a8bb2c28062323efae4e4270c478daf65bdffdb97f0c1c08287305',
+}
+
+
+def naive(requests):
+    for nonce in range(requests):
+        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        naive_digest('key', 'secret', timestamp, nonce, 'POST', '/v1/trades', None, DATA, 'idempotency-id')
+        # the transport encoded the body once more
+        json.dumps(DATA).encode()
+
+
+def signer(requests):
+    signer = RequestSigner('key', 'secret')
+    for nonce in range(requests):
+        body = json.dumps(DATA).encode()
+        signer.digest(signer.timestamp(), nonce, 'POST', '/v1/trades', '', body, 'idempotency-id')
+
+
+def get_headers(requests):
+    client = Client('key', 'secret', 'http://localhost', None, venue_id='venue')
+    for _ in range(requests):
+        client.get_headers('POST', '/v1/trades', data=DATA, idempotency_id='idempotency-id',
+                           body=client.encode_body(DATA))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='measures the cost of signing a request')
+    parser.add_argument('--requests', type=int, default=200000)
+    args = parser.parse_args()
+
+    for name, run in (('naive digest', naive), ('RequestSigner', signer), ('Client.get_headers', get_headers)):
+        start = perf_counter()
+        run(args.requests)
+        elapsed = perf_counter() - start
+        print(f'{name:>20}: {elapsed / args.requests * 1e6:6.2f} us/request')
@@ -0,0 +1,85 @@
+""" Time until a client is ready, against a local stub of the api: constructing it as before (signing key parsed
+and venue id looked up in the constructor) and lazily, the first venue id lookup without and with a warm
+`VenueIdCache` for `Client` and `AsyncClient`, and a whole worker process importing the package and creating a
+client:
+
+    PYTHONPATH=. python3 -m benchmarks.bench_startup --repeat 50
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+from ecdsa import NIST256p, SigningKey
+
+from exchange_api.async_client import AsyncClient
+from exchange_api.client import Client
+from exchange_api.reference_cache import VenueIdCache
+from tests.stub_server import StubApi
+
+
+def timed(create, repeat: int) -> float:
+    start = perf_counter()
+    for _ in range(repeat):
+        create()
+    return (perf_counter() - start) / repeat
+
+
+def eager(api: StubApi, key_file: str):
+    # what `Client.__init__` did before
+    with open(key_file) as f:
+        SigningKey.from_pem(f.read(), hashlib.sha256)
+    client = Client(api.key, api.secret, api.url, key_file)
+    client.venue_id
+    client.close()
+
+
+def lazy(api: StubApi, key_file: str, cache=None, resolve=False):
+    client = Client(api.key, api.secret, api.url, key_file, venue_id_cache=cache)
+    if resolve:
+        client.venue_id
+    client.close()
+
+
+def lazy_async(api: StubApi, key_file: str, cache=None):
+    async def run():
+        client = AsyncClient(api.key, api.secret, api.url, key_file, venue_id_cache=cache)
+        await client.resolve_venue_id()
+        await client.close()
+    asyncio.run(run())
+
+
+def process(api: StubApi, key_file: str):
+    code = (f'from exchange_api.client import Client; '
+            f'Client({api.key!r}, {api.secret!r}, {api.url!r}, {key_file!r}, venue_id="venue")')
+    subprocess.run([sys.executable, '-c', code], check=True, env={**os.environ, 'PYTHONPATH': '.'})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='time until a client is ready')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, StubApi() as api:
+        api.route('GET', 'api-key', lambda request: (200, {'venueIdentifier': '123456'}))
+        key_file = os.path.join(directory, 'signing-key.pem')
+        with open(key_file, 'w') as f:
+            f.write(SigningKey.generate(curve=NIST256p).to_pem().decode())
+        cache = VenueIdCache(os.path.join(directory, 'venue-ids.json'))
+        cache.save(api.url, api.key, '123456')
+
+        runs = (
+            ('eager (before)', lambda: eager(api, key_file)),
+            ('lazy', lambda: lazy(api, key_file)),
+            ('lazy + venue id', lambda: lazy(api, key_file, resolve=True)),
+            ('lazy + cached venue id', lambda: lazy(api, key_file, cache, resolve=True)),
+            ('async + venue id', lambda: lazy_async(api, key_file)),
+            ('async + cached venue id', lambda: lazy_async(api, key_file, cache)),
+        )
+        for name, create in runs:
+            print(f'{name:>24}: {timed(create, args.repeat) * 1000:8.3f} ms')
+        print(f'{"worker process":>24}: {timed(lambda: process(api, key_file), 5) * 1000:8.3f} ms')
@@ -0,0 +1,68 @@
+""" Time and requests of a cold start (first sync into an empty cache), a warm start (incremental sync of a cache
+that was synced before, with a few new trades) and a refresh, against a local stub of the api:
+
+    PYTHONPATH=. python3 -m benchmarks.bench_trade_cache --trades 20000 --new 50 --page-size 1000
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+
+from exchange_api.client import Client
+from exchange_api.trade_cache import TradeCache, to_milliseconds
+from tests.stub_server import StubApi
+
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def trade(i: int):
+    date = (START + timedelta(minutes=i)).isoformat(timespec='milliseconds')
+    return {
+        'identifier': f'trade-{i}', 'counterpartyIdentifier': f'counterparty-{i % 10}', 'side': 'Buy',
+        'baseSymbol': 'BTC', 'termSymbol': 'USD', 'dealt': '1.5', 'rate': '10000.25', 'executionDate': date,
+        'receivedDate': date, 'status': 'Pending', 'settlementNumber': None,
+    }
+
+
+def trades_route(trades, page_size):
+    def list_trades(request):
+        from_ms = to_milliseconds(request.params['from']) if 'from' in request.params else None
+        matching = [t for t in trades if from_ms is None or t['executionMs'] >= from_ms]
+        start = int(request.params.get('continuationToken') or 0)
+        page = {'trades': [t['trade'] for t in matching[start:start + page_size]]}
+        if start + page_size < len(matching):
+            page['continuationToken'] = start + page_size
+        return 200, page
+    return list_trades
+
+
+def timed(name, api, sync):
+    requests = len(api.requests)
+    start = perf_counter()
+    count = sync()
+    print(f'{name:>11}: {perf_counter() - start:7.3f}s, {count:6d} trades, {len(api.requests) - requests} requests')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='compares cold start, warm start and refresh of the trade cache')
+    parser.add_argument('--trades', type=int, default=20000)
+    parser.add_argument('--new', type=int, default=50)
+    parser.add_argument('--page-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    trades = []
+
+    def add(i):
+        t = trade(i)
+        trades.append({'trade': t, 'executionMs': to_milliseconds(t['executionDate'])})
+
+    for i in range(args.trades):
+        add(i)
+    with StubApi() as api, Client(api.key, api.secret, api.url, None, venue_id='venue') as client:
+        api.route('GET', 'trades', trades_route(trades, args.page_size))
+        cache = TradeCache()
+        timed('cold start', api, lambda: cache.sync(client))
+        for i in range(args.trades, args.trades + args.new):
+            add(i)
+        # the overlap is kept small, otherwise a day of minutely trades is fetched again
+        timed('warm start', api, lambda: cache.sync(client, overlap=timedelta(minutes=5)))
+        timed('refresh', api, lambda: cache.sync(client, refresh_interval=0))
@@ -0,0 +1,55 @@
+""" Trade hashes per second of the scalar path (one `Decimal` quantize per amount, as in trade_hash.py), of
+`trade_hash` and of the batch `compute_trade_hashes`, in one and in all processes:
+
+    PYTHONPATH=. python3 -m benchmarks.bench_trade_hashes --trades 500000
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+import random
+from time import perf_counter
+
+from exchange_api.trade_hashing import compute_trade_hashes, trade_hash
+from tests.test_trade_hashing import scalar_trade_hash
+
+
+def columns(count):
+    rng = random.Random(1)
+    start = datetime(2020, 1, 2, tzinfo=timezone.utc)
+    return (
+        '123456',
+        [rng.choice(['987654', '555555', '111111']) for _ in range(count)],
+        [f'trade-{i}' for i in range(count)],
+        [rng.choice(['Buy', 'Sell']) for _ in range(count)],
+        'XBT',
+        'USD',
+        [f'{rng.randint(0, 100)}.{rng.randint(0, 10 ** 6):06d}' for _ in range(count)],
+        [f'{rng.randint(9000, 12000)}.{rng.randint(0, 99):02d}' for _ in range(count)],
+        [f'{rng.randint(0, 10 ** 6)}.{rng.randint(0, 99):02d}' for _ in range(count)],
+        [start + timedelta(milliseconds=rng.randint(0, 10 ** 9)) for _ in range(count)],
+    )
+
+
+def rows(trade_columns, count):
+    return zip(*(c if not isinstance(c, str) else [c] * count for c in trade_columns))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='compares scalar and batch trade hashing')
+    parser.add_argument('--trades', type=int, default=200000)
+    args = parser.parse_args()
+
+    trade_columns = columns(args.trades)
+    runs = [
+        ('scalar (Decimal)', lambda: [scalar_trade_hash(*row) for row in rows(trade_columns, args.trades)]),
+        ('trade_hash', lambda: [trade_hash(*row) for row in rows(trade_columns, args.trades)]),
+        ('batch, 1 process', lambda: compute_trade_hashes(*trade_columns, processes=1)),
+        ('batch, all processes', lambda: compute_trade_hashes(*trade_columns)),
+    ]
+    expected = None
+    for name, run in runs:
+        start = perf_counter()
+        hashes = run()
+        elapsed = perf_counter() - start
+        expected = expected or hashes
+        assert hashes == expected, f'{name} computed different hashes'
+        print(f'{name:>22}: {args.trades / elapsed:10.0f} trades/s')
@@ -0,0 +1,41 @@
+""" Webhooks per second handled by a `WebhookReceiver`, pushed by the local pusher stand-in out of order and with
+duplicates, one webhook per request and several per request:
+
+    PYTHONPATH=. python3 -m benchmarks.bench_webhook_receiver --webhooks 20000 --concurrency 16
+"""
+import argparse
+import asyncio
+from time import perf_counter
+
+from exchange_api.webhook_receiver import WebhookReceiver
+from exchange_api.webhooks import MemorySequenceStore
+from tests.test_webhook_receiver import url
+from tests.webhook_pusher import WebhookPusher, webhook
+
+
+async def run(webhooks: int, concurrency: int, per_request: int):
+    handled = 0
+
+    async def handler(batch):
+        nonlocal handled
+        handled += len(batch)
+
+    receiver = WebhookReceiver(default_handler=handler, store=MemorySequenceStore(0))
+    await receiver.start(host='127.0.0.1', port=0)
+    start = perf_counter()
+    async with WebhookPusher(url(receiver), concurrency=concurrency, per_request=per_request) as pusher:
+        await pusher.push([webhook(n) for n in range(1, webhooks + 1)], shuffle=50, duplicates=0.05)
+    await receiver.stop()
+    elapsed = perf_counter() - start
+    return handled / elapsed, receiver.stats['batches']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='webhooks per second through the webhook receiver')
+    parser.add_argument('--webhooks', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    for per_request in (1, 10):
+        webhooks_per_second, batches = asyncio.run(run(args.webhooks, args.concurrency, per_request))
+        print(f'{per_request:3d} per request: {webhooks_per_second:8.0f} webhooks/s in {batches} batches')
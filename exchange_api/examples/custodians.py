@@ -1,11 +1,11 @@
 from datetime import datetime
 from decimal import Decimal
-from time import time, sleep
 
 import pytz
 
 from exchange_api.client import Client
 from exchange_api.models import WithdrawalDestinationType, SymbolType, CustodianStatus, TransferStatus
+from exchange_api.waiting import wait_until
 
 from .symbols import get_symbols_supported_by_custodian
 
@@ -16,25 +16,15 @@ def select_enabled_custodian(client: Client):
 
 
 def wait_for_deposit_to_complete(client: Client, custodian_id: str, from_dt: datetime, timeout_seconds: int = 90):
-    start = time()
-    while True:
-        deposit = client.list_custodian_deposits(custodian_id, from_dt=from_dt)[0]
-        if deposit['status'] == TransferStatus.Completed.name:
-            break
-        if time() - start > timeout_seconds:
-            raise TimeoutError(f'Timed out waiting for deposit to complete. Current deposit: {deposit}')
-        sleep(0.5)
+    wait_until(lambda deposits: deposits[0]['status'] == TransferStatus.Completed.name,
+               lambda: client.list_custodian_deposits(custodian_id, from_dt=from_dt),
+               timeout_seconds, description='deposit to complete')
 
 
 def wait_for_withdrawal_to_complete(client: Client, custodian_id: str, from_dt: datetime, timeout_seconds: int = 90):
-    start = time()
-    while True:
-        withdrawal = client.list_custodian_withdrawals(custodian_id, from_dt=from_dt)[0]
-        if withdrawal['status'] == TransferStatus.Completed.name:
-            break
-        if time() - start > timeout_seconds:
-            raise TimeoutError(f'Timed out waiting for withdrawal to complete. Current withdrawal: {withdrawal}')
-        sleep(0.5)
+    wait_until(lambda withdrawals: withdrawals[0]['status'] == TransferStatus.Completed.name,
+               lambda: client.list_custodian_withdrawals(custodian_id, from_dt=from_dt),
+               timeout_seconds, description='withdrawal to complete')
 
 
 def assert_custodian_balance_change(client: Client, custodian, symbol: str, delta: str):
@@ -2,6 +2,7 @@ import argparse
 import time
 
 from exchange_api.client import Client
+from exchange_api.reference_cache import ReferenceCache
 
 from .custodians import test_custodians
 from .customer import test_customer_and_sandbox_methods
@@ -19,7 +20,8 @@ if __name__ == '__main__':
     parser.add_argument('--sandbox-url', required=False, help="Strike exchange api sandbox url")
     args = parser.parse_args()
 
-    client = Client(args.key, args.secret, args.url, args.signing_key_file, sandbox_url=args.sandbox_url, debug=True)
+    client = Client(args.key, args.secret, args.url, args.signing_key_file, sandbox_url=args.sandbox_url, debug=True,
+                    reference_cache=ReferenceCache())
     client.counter_nonce = int(time.time()) + 10000
 
     test_custodians(client)
@@ -0,0 +1,297 @@
+import asyncio
+from datetime import datetime
+from time import monotonic
+from typing import Optional, Union
+from uuid import uuid4
+
+import aiohttp
+
+from .client import BaseClient, UnexpectedStatusCode
+from .models import TransferStatus
+from .instrumentation import Instrumentation
+from .nonce import NonceAllocator
+from .rate_limiting import ConcurrencyLimiter, RateLimiter, endpoint_class
+from .reference_cache import VenueIdCache
+from .retry import RetryPolicy, RetryState
+from .serialization import JsonDecoder, JsonEncoder, project_fields
+from .settlement_signing import SettlementSigner
+from .waiting import wait_until_async
+
+
+class AsyncClient(BaseClient):
+    """ asyncio counterpart of `Client`. Every endpoint method of `Client` is available and returns an awaitable:
+
+        async with AsyncClient(key, secret, url, signing_key_file) as client:
+            trades = await client.list_trades()
+
+    All requests share one aiohttp connection pool, so many requests can be in flight from a single event loop.
+    """
+
+    transient_errors = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+    def __init__(
+            self,
+            key,
+            secret,
+            url,
+            signing_key_file,
+            sandbox_url=None,
+            venue_id=None,
+            api_version='v1',
+            debug=False,
+            session: Optional[aiohttp.ClientSession] = None,
+            timeout: Optional[float] = None,
+            limit: int = 100,
+            limit_per_host: int = 0,
+            keep_alive: bool = True,
+            nonce_allocator: Optional[NonceAllocator] = None,
+            max_nonce_retries: int = 3,
+            json_encoder: Optional[JsonEncoder] = None,
+            json_decoder: Optional[JsonDecoder] = None,
+            records: bool = False,
+            retry_policy: Optional[RetryPolicy] = None,
+            rate_limiter: Optional[RateLimiter] = None,
+            concurrency_limiter: Optional[ConcurrencyLimiter] = None,
+            instrumentation: Optional[Instrumentation] = None,
+            settlement_signer: Optional[SettlementSigner] = None,
+            venue_id_cache: Optional[VenueIdCache] = None,
+    ):
+        super().__init__(
+            key, secret, url, signing_key_file, sandbox_url, venue_id, api_version, debug, nonce_allocator,
+            max_nonce_retries, json_encoder, json_decoder, records, retry_policy, rate_limiter, concurrency_limiter,
+            instrumentation, settlement_signer, venue_id_cache)
+        self._session = session
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keep_alive = keep_alive
+        # the venue id lookup in progress, shared by concurrent callers of `resolve_venue_id`
+        self._venue_id_lookup: Optional[asyncio.Future] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # the aiohttp session has to be created from within the running event loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.limit, limit_per_host=self.limit_per_host, force_close=not self.keep_alive),
+                timeout=self.timeout,
+                trace_configs=[self.trace_config()] if self.instrumentation is not None else None)
+        return self._session
+
+    @staticmethod
+    def trace_config() -> aiohttp.TraceConfig:
+        # fills in the connect and time to first byte phases of the `RequestEvent` passed as trace_request_ctx
+        async def on_connection_create_start(session, context, params):
+            context.trace_request_ctx.connect_started_at = monotonic()
+
+        async def on_connection_create_end(session, context, params):
+            event = context.trace_request_ctx
+            event.connect = monotonic() - event.connect_started_at
+
+        async def on_request_end(session, context, params):
+            context.trace_request_ctx.headers_received_at = monotonic()
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self):
+        await self.resolve_venue_id()
+        return self
+
+    async def resolve_venue_id(self) -> str:
+        """ Looks up the venue id unless it was supplied or cached. Called by `async with`, `submit_trade` and
+        `update_trade`; the venue id is part of the trade hash. """
+        if self._venue_id is None:
+            if self._venue_id_lookup is None:
+                self._venue_id_lookup = asyncio.ensure_future(self.lookup_venue_id_async())
+            lookup = self._venue_id_lookup
+            try:
+                # a cancelled caller does not cancel the lookup other callers are waiting for
+                self.venue_id = await asyncio.shield(lookup)
+            finally:
+                if lookup.done() and self._venue_id_lookup is lookup:
+                    # a failed lookup is tried again by the next caller
+                    self._venue_id_lookup = None
+        return self._venue_id
+
+    async def lookup_venue_id_async(self) -> str:
+        # the `venue_id_cache` is a file, read and written off the event loop
+        loop = asyncio.get_running_loop()
+        venue_id = None
+        if self.venue_id_cache is not None:
+            venue_id = await loop.run_in_executor(None, super().lookup_venue_id)
+        if venue_id is None:
+            # if venue id is not supplied or cached, just get it from the current user endpoint
+            venue_id = (await self.get_api_key())['venueIdentifier']
+            if self.venue_id_cache is not None:
+                await loop.run_in_executor(None, self.remember_venue_id, venue_id)
+        return venue_id
+
+    def lookup_venue_id(self) -> str:
+        venue_id = super().lookup_venue_id()
+        if venue_id is None:
+            # the api cannot be called synchronously from here, and hashing a trade without venue id is wrong
+            raise RuntimeError('The venue id has not been resolved yet, await client.resolve_venue_id() first')
+        return venue_id
+
+    async def submit_trade(self, *args, **kwargs):
+        await self.resolve_venue_id()
+        return await super().submit_trade(*args, **kwargs)
+
+    async def update_trade(self, *args, **kwargs):
+        await self.resolve_venue_id()
+        return await super().update_trade(*args, **kwargs)
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def send_request_(
+            self,
+            request_type,
+            route_in,
+            params=None,
+            data=None,
+            sandbox=False,
+            expected_status_code=200,
+            idempotency_id=None,
+            body=None,
+    ):
+        url, route = self.url_and_route(route_in, sandbox)
+        # the body is encoded once, and exactly those bytes are both signed and sent
+        body = self.encode_body(data) if body is None else body
+        endpoint = endpoint_class(request_type, route_in)
+        instrumentation = self.instrumentation
+        # started before waiting for the limiters, so that wait is the queue phase
+        event = None if instrumentation is None else instrumentation.start(request_type, route_in, params, data)
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(self.key, endpoint)
+        limiter = self.concurrency_limiter
+        if limiter is not None:
+            await limiter.acquire_async()
+        # from here on the slot is released whatever fails, e.g. signing or a hook
+        start = None
+        overloaded = False
+        try:
+            if event is not None:
+                event.admitted()
+            headers = self.get_headers(request_type, route, params=params, idempotency_id=idempotency_id, body=body)
+            if event is not None:
+                event.signed(url, headers, body)
+                instrumentation.sent(event)
+            # unlike requests, aiohttp does not drop query parameters that are None
+            params = {k: v for k, v in params.items() if v is not None} if params else None
+            start = monotonic()
+            async with self.session.request(
+                    request_type, url, headers=headers, params=params, data=body, trace_request_ctx=event,
+            ) as response:
+                response_body = await response.read()
+                if event is not None:
+                    event.received(response.status, len(response_body))
+                content = None if not response_body else self.json_decoder(response_body)
+                # decoding the body as text is only needed for the error message
+                text = response_body.decode(errors='replace') if response.status != expected_status_code else None
+                content = self.handle_response(
+                    response.status, request_type, str(response.url), text, content, expected_status_code,
+                    response.headers.get('Retry-After'))
+        except Exception as e:
+            overloaded = self.is_overloaded(e)
+            if event is not None:
+                instrumentation.failed(event, e)
+            raise
+        finally:
+            if limiter is not None:
+                limiter.release(None if start is None else monotonic() - start, overloaded, endpoint)
+        # outside the try: the request has been applied, whatever the hooks do with the response
+        if event is not None:
+            instrumentation.succeeded(event, content)
+        return content
+
+    async def send_request(
+            self,
+            request_type,
+            route_in,
+            params=None,
+            data=None,
+            sandbox=False,
+            expected_status_code=200,
+            idempotency_id=None,
+            body=None,
+    ):
+        # see `Client.send_request`
+        if request_type != 'GET' and idempotency_id is None:
+            idempotency_id = str(uuid4())
+        body = self.encode_body(data) if body is None else body
+        retry = RetryState(self)
+        while True:
+            try:
+                return await self.send_request_(
+                    request_type, route_in, params, data, sandbox, expected_status_code, idempotency_id, body)
+            except (UnexpectedStatusCode, *self.transient_errors) as e:
+                delay = retry.next_delay(e)
+                if delay is None:
+                    raise e
+                await asyncio.sleep(delay)
+
+    async def get(self, route_in, params=None, expected_status_code=200, fields=None, record_type=None):
+        content = await self.send_request(
+            'GET', route_in, params=params, expected_status_code=expected_status_code)
+        return self.as_records(content, record_type) if fields is None else project_fields(content, fields)
+
+    async def post(
+            self, route_in, data=None, sandbox=False, expected_status_code=200, idempotency_id=None, body=None):
+        """ `body` is `data` already encoded, e.g. by a worker that prepares requests ahead of sending them. """
+        return await self.send_request(
+            'POST', route_in, data=data, sandbox=sandbox, expected_status_code=expected_status_code,
+            idempotency_id=idempotency_id, body=body)
+
+    async def delete(self, route_in, sandbox=False, expected_status_code=204, idempotency_id=None):
+        return await self.send_request(
+            'DELETE', route_in, sandbox=sandbox, expected_status_code=expected_status_code,
+            idempotency_id=idempotency_id)
+
+    async def patch(self, route_in, data, expected_status_code=200, idempotency_id=None):
+        return await self.send_request(
+            'PATCH', route_in, data=data, expected_status_code=expected_status_code,
+            idempotency_id=idempotency_id)
+
+    async def iter_trades(
+            self,
+            from_dt: Optional[Union[datetime, str]] = None,
+            to_dt: Optional[Union[datetime, str]] = None,
+            counterparty_id: Optional[str] = None,
+            prefetch: bool = True,
+    ):
+        """ Async generator over the trades of every page of `list_trades`, see `Client.iter_trades`. """
+        def fetch(continuation_token=None):
+            return self.list_trades(continuation_token, from_dt=from_dt, to_dt=to_dt, counterparty_id=counterparty_id)
+
+        page = await fetch()
+        while True:
+            continuation_token = page.get('continuationToken')
+            next_page = asyncio.ensure_future(fetch(continuation_token)) if continuation_token and prefetch else None
+            try:
+                for trade in page['trades']:
+                    yield trade
+            except GeneratorExit:
+                if next_page:
+                    next_page.cancel()
+                raise
+            if not continuation_token:
+                return
+            page = await next_page if next_page else await fetch(continuation_token)
+
+    async def wait_for_customer_withdrawals_to_complete(self, customer_id: str, timeout_seconds: int = 10):
+        def completed(withdrawals):
+            return all(withdrawal['status'] == TransferStatus.Completed.name for withdrawal in withdrawals)
+
+        return await wait_until_async(
+            completed, lambda: self.list_customer_withdrawals(customer_id), timeout_seconds,
+            description=f'withdrawals of customer {customer_id}')
@@ -0,0 +1,101 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from time import time, sleep
+from typing import Any, Dict, Iterable, Iterator, Optional
+from uuid import uuid4
+
+
+class TradeSubmission:
+    def __init__(self, trade_id: str, response: Optional[Dict[str, Any]] = None, error: Optional[Exception] = None):
+        self.trade_id = trade_id
+        self.response = response
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class BulkSubmitStats:
+    def __init__(self):
+        self.submitted = 0
+        self.failed = 0
+        self.retries = 0
+        self.started_at = None
+        self.finished_at = None
+        # the counters are updated from the threads sending the trades
+        self.lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time()) - self.started_at
+
+    @property
+    def trades_per_second(self):
+        return (self.submitted + self.failed) / self.elapsed if self.elapsed else 0.0
+
+
+def submit_trades(
+        client,
+        trades: Iterable[Dict[str, Any]],
+        max_in_flight: int = 8,
+        prepare_workers: int = 2,
+        max_attempts: int = 1,
+        retry_interval: float = 0.5,
+        stats: Optional[BulkSubmitStats] = None,
+) -> Iterator[TradeSubmission]:
+    """ Submits `trades` (keyword arguments for `Client.submit_trade`) and yields a `TradeSubmission` per trade, in
+    the order of `trades`. Trades are consumed lazily, so `trades` can be a generator.
+
+    Payloads are prepared ahead of time by `prepare_workers` threads: the trade hash is computed and the body is
+    encoded to the exact bytes that are signed and sent. The HMAC signature itself covers the nonce and timestamp,
+    so it is only computed when a trade is sent, which keeps nonces in the order requests go out. At most
+    `max_in_flight` trades are being sent at any time. Failures the client's `retry_policy` considers retryable
+    (429, 5xx, connection errors and timeouts by default) are retried by the client; with `max_attempts` > 1 a trade
+    that still failed with such an error is submitted again, with the same idempotency id so it is never booked
+    twice. """
+    stats = stats if stats is not None else BulkSubmitStats()
+    stats.started_at = time()
+
+    def prepare(trade):
+        payload = client.trade_payload(**trade)
+        return payload, client.encode_body(payload), str(uuid4())
+
+    def send(trade_id, prepared_future):
+        try:
+            payload, body, idempotency_id = prepared_future.result()
+        except Exception as e:
+            return TradeSubmission(trade_id, error=e)
+        for attempt in range(1, max_attempts + 1):
+            try:
+                return TradeSubmission(
+                    trade_id, client.post('trades', data=payload, idempotency_id=idempotency_id, body=body))
+            except Exception as e:
+                if attempt == max_attempts or not client.retry_policy.is_retryable(e, client.transient_errors):
+                    return TradeSubmission(trade_id, error=e)
+                with stats.lock:
+                    stats.retries += 1
+                sleep(retry_interval * attempt)
+
+    in_flight = deque()
+    with ThreadPoolExecutor(prepare_workers) as prepare_pool, ThreadPoolExecutor(max_in_flight) as send_pool:
+        def collect():
+            submission = in_flight.popleft().result()
+            with stats.lock:
+                if submission.ok:
+                    stats.submitted += 1
+                else:
+                    stats.failed += 1
+            return submission
+
+        for trade in trades:
+            in_flight.append(send_pool.submit(send, trade['trade_id'], prepare_pool.submit(prepare, trade)))
+            # keep at most one extra batch queued behind the requests that are actually in flight
+            if len(in_flight) >= 2 * max_in_flight:
+                yield collect()
+        while in_flight:
+            yield collect()
+    stats.finished_at = time()
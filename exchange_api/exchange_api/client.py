@@ -1,49 +1,167 @@
-from base64 import b64encode
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
 from decimal import Decimal
-import hashlib
-import json
-from time import time, sleep
-from typing import List, Tuple, Optional, Dict, Union
+from time import monotonic, sleep
+from typing import Any, Iterable, List, Tuple, Type, Optional, Dict, Union
 import os
 import re
+import threading
 from uuid import uuid4
 
-from ecdsa import SigningKey, util as ecdsa_util
 import pytz
 import requests
-
-from .models import WithdrawalDestinationType, BankTransferDetails, TransferStatus
-
-
-class UnexpectedStatusCode(Exception):
-    def __init__(self, message, status_code, json):
-        self.message = message
-        self.status_code = status_code
-        self.json = json
-
-
-request_type_dict = {
-    'GET': requests.get,
-    'POST': requests.post,
-    'PATCH': requests.patch,
-    'DELETE': requests.delete,
-}
-
-
-class Client:
-    def __init__(self, key, secret, url, signing_key_file, sandbox_url=None, venue_id=None, api_version='v1', debug=False):
+from requests.adapters import HTTPAdapter
+
+from .bulk import BulkSubmitStats, submit_trades
+from .exceptions import UnexpectedStatusCode
+from .instrumentation import DebugPrinter, Instrumentation
+from .models import (
+    WithdrawalDestinationType, BankTransferDetails, TransferStatus, ApiKey, SymbolInfo, CustomerInfo, CustomerDeposit,
+    CustomerWithdrawal, CustomerWithdrawalRequest, WebhookSettings, WebhooksList, Webhook, TradeList, TradeInfo,
+    SettlementPlanShort, SettlementPlan, Settlement, SettlementShort, Custodian, CustodianDepositInstructions,
+    CustodianDeposit, WithdrawalDestination, CustodianWithdrawal, Record, WebhookType)
+from .nonce import NonceAllocator, AtomicNonceAllocator
+from .rate_limiting import ConcurrencyLimiter, RateLimiter, endpoint_class
+from .reference_cache import ReferenceCache, VenueIdCache
+from .request_signing import RequestSigner
+from .retry import RetryPolicy, RetryState
+from .serialization import (
+    JsonDecoder, JsonEncoder, NEXT_PAGE_KEYS, RECORD_ARRAY_KEYS, default_json_decoder, default_json_encoder,
+    iter_json_array, project_fields)
+from .settlement_signing import SettlementSigner, SigningPool, load_signer
+from .sharding import SHARDABLE_ENDPOINTS, fetch_sharded
+from .trade_cache import TradeCache
+from .trade_hashing import trade_hash
+from .waiting import Poller, wait_until
+
+
+def create_session(pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True):
+    # pool_connections is the number of hosts to keep pools for, pool_maxsize the number of connections per host
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    return session
+
+
+class BaseClient:
+    """ Everything that does not depend on the HTTP transport: request signing, routing, response handling and the
+    endpoint methods. The endpoint methods return whatever `get`/`post`/`delete`/`patch` return, so for the
+    `AsyncClient` they return awaitables. """
+
+    # errors of the HTTP transport that are worth retrying
+    transient_errors: Tuple[Type[Exception], ...] = ()
+
+    def __init__(
+            self,
+            key,
+            secret,
+            url,
+            signing_key_file,
+            sandbox_url=None,
+            venue_id=None,
+            api_version='v1',
+            debug=False,
+            nonce_allocator: Optional[NonceAllocator] = None,
+            max_nonce_retries: int = 3,
+            json_encoder: Optional[JsonEncoder] = None,
+            json_decoder: Optional[JsonDecoder] = None,
+            records: bool = False,
+            retry_policy: Optional[RetryPolicy] = None,
+            rate_limiter: Optional[RateLimiter] = None,
+            concurrency_limiter: Optional[ConcurrencyLimiter] = None,
+            instrumentation: Optional[Instrumentation] = None,
+            settlement_signer: Optional[SettlementSigner] = None,
+            venue_id_cache: Optional[VenueIdCache] = None,
+    ):
         self.key = key
         self.secret = secret
-        self.counter_nonce = 1
+        self.signer = RequestSigner(key, secret)
+        self.json_encoder = json_encoder or default_json_encoder
+        self.json_decoder = json_decoder or default_json_decoder
+        # return `Record`s from `models` instead of dicts
+        self.records = records
+        self.nonce_allocator = nonce_allocator or AtomicNonceAllocator()
+        self.max_nonce_retries = max_nonce_retries
+        self.nonce_stats = {'resyncs': 0, 'coalesced_resyncs': 0, 'retries': 0, 'retries_exhausted': 0}
+        self._nonce_stats_lock = threading.Lock()
+        self.retry_policy = retry_policy or RetryPolicy()
+        # one budget per client, shared by all of its threads
+        self.retry_budget = self.retry_policy.budget()
+        self.retry_stats = {'retries': 0, 'exhausted': 0, 'budget_exhausted': 0}
+        self._retry_stats_lock = threading.Lock()
+        # local admission control in front of every request, both optional and shareable between clients
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
         self.url = url
         self.sandbox_url = sandbox_url
         self.api_version = api_version
         self.debug = debug
+        # request hooks; None keeps instrumentation entirely off the request path
+        self.instrumentation = instrumentation
+        if debug:
+            self.instrumentation = (instrumentation or Instrumentation()).add(
+                DebugPrinter.before_request, DebugPrinter.after_response, DebugPrinter.on_error)
         self.quanta = Decimal('0.' + '0' * 18)
-        self.signing_key = SigningKey.from_pem(open(signing_key_file).read(), hashlib.sha256)
-        # if venue id is not supplied, just get it from the current user endpoint
-        self.venue_id = venue_id if venue_id else self.get_api_key()['venueIdentifier']
+        # the settlement signer and venue id are only resolved when first needed, so creating a client is cheap
+        self.signing_key_file = signing_key_file
+        self._settlement_signer = settlement_signer
+        self._settlement_signer_lock = threading.Lock()
+        self.venue_id_cache = venue_id_cache
+        self._venue_id = venue_id or None
+        self._venue_id_lock = threading.Lock()
+
+    @property
+    def settlement_signer(self) -> SettlementSigner:
+        """ Signs settlement flow hashes; by default the fastest backend installed, loaded from `signing_key_file`
+        on first use. """
+        signer = self._settlement_signer
+        if signer is None:
+            with self._settlement_signer_lock:
+                if self._settlement_signer is None:
+                    self._settlement_signer = load_signer(self.signing_key_file)
+                signer = self._settlement_signer
+        return signer
+
+    @settlement_signer.setter
+    def settlement_signer(self, signer: SettlementSigner):
+        self._settlement_signer = signer
+
+    @property
+    def venue_id(self) -> Optional[str]:
+        """ The venue id passed in, else the one in `venue_id_cache`, else (for a `Client`) the one of the api key,
+        looked up once on first use. """
+        venue_id = self._venue_id
+        if venue_id is None:
+            with self._venue_id_lock:
+                if self._venue_id is None:
+                    self._venue_id = self.lookup_venue_id()
+                venue_id = self._venue_id
+        return venue_id
+
+    @venue_id.setter
+    def venue_id(self, venue_id: Optional[str]):
+        self._venue_id = venue_id or None
+
+    def lookup_venue_id(self) -> Optional[str]:
+        return None if self.venue_id_cache is None else self.venue_id_cache.load(self.url, self.key)
+
+    def remember_venue_id(self, venue_id: str) -> str:
+        if self.venue_id_cache is not None:
+            self.venue_id_cache.save(self.url, self.key, venue_id)
+        return venue_id
+
+    @property
+    def counter_nonce(self):
+        return self.nonce_allocator.peek()
+
+    @counter_nonce.setter
+    def counter_nonce(self, nonce):
+        # nonces are shared with other threads (and possibly processes), so they are only ever moved forward
+        self.nonce_allocator.advance_to(nonce)
 
     @staticmethod
     def urljoin(*args):
@@ -76,44 +194,39 @@ class Client:
             counter: str,
             execution_date: datetime
     ):
-        content = "|".join([
-            venue_id,
-            counterparty_id,
-            trade_id,
-            side,
-            base_symbol,
-            term_symbol,
-            str(Decimal(dealt).quantize(self.quanta)),
-            str(Decimal(rate).quantize(self.quanta)),
-            str(Decimal(counter).quantize(self.quanta)),
-            execution_date.isoformat(timespec='milliseconds')])
-        trade_hash = hashlib.sha256(str.encode(content)).hexdigest()
-
-        return trade_hash
+        return trade_hash(venue_id, counterparty_id, trade_id, side, base_symbol, term_symbol, dealt, rate, counter,
+                          execution_date)
 
     def sign(self, to_sign):
-        return b64encode(self.signing_key.sign(
-            to_sign.encode(), hashfunc=hashlib.sha256, sigencode=ecdsa_util.sigencode_der)).decode()
+        return self.settlement_signer.sign_b64(to_sign)
+
+    def sign_many(self, to_sign: List[str], pool: Optional[SigningPool] = None) -> List[str]:
+        """ Signs e.g. the flow hashes of many settlement plans, on the processes of `pool` if given. """
+        if pool is None:
+            return [self.sign(s) for s in to_sign]
+        return pool.sign_many(to_sign)
+
+    def encode_body(self, data) -> Optional[bytes]:
+        return None if not data else self.json_encoder(data)
 
     def get_digest(self, timestamp, nonce, request_type, route, params, j, idempotent_id):
-        params_str = '' if not params else '&'.join(f'{k}={v}' for k, v in params.items() if v is not None)
-        json_str = '' if not j else json.dumps(j)
-        unencoded_digest = f'{self.key}|{self.secret}|{timestamp}|{nonce}|{request_type}|{route}|' \
-                           f'{params_str}|{json_str}|{idempotent_id or ""}'
-        return hashlib.sha256(str.encode(unencoded_digest)).hexdigest()
+        return self.signer.digest(
+            timestamp, nonce, request_type, route, self.signer.params_string(params), self.encode_body(j), idempotent_id)
 
-    def get_headers(self, request_type, route, params=None, data=None):
+    def get_headers(self, request_type, route, params=None, data=None, idempotency_id=None, body=None):
+        """ `body` is the encoded request body that will be sent; it is encoded from `data` if not given. """
         headers = {'Accept': 'application/json'}
 
         if request_type != 'GET':
             headers['Content-Type'] = 'application/json'
-            headers['X-Idempotency-ID'] = str(uuid4())
+            headers['X-Idempotency-ID'] = idempotency_id or str(uuid4())
 
-        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
-        nonce = self.counter_nonce
-        self.counter_nonce += 1
+        timestamp = self.signer.timestamp()
+        nonce = self.nonce_allocator.next()
 
-        digest = self.get_digest(timestamp, nonce, request_type, route, params, data, headers.get('X-Idempotency-ID'))
+        digest = self.signer.digest(
+            timestamp, nonce, request_type, route, self.signer.params_string(params),
+            self.encode_body(data) if body is None else body, headers.get('X-Idempotency-ID'))
 
         headers['Authorization'] = f'HMAC {self.key}|{timestamp}|{nonce}|{digest}'
 
@@ -123,72 +236,61 @@ class Client:
         route = '/' + self.urljoin(self.api_version, 'sandbox' if sandbox else None, route_in)
         return self.urljoin(self.sandbox_url if sandbox and self.sandbox_url else self.url, route), route
 
-    def process_response(self, response, expected_status_code):
-        content = None if not response.text else response.json()
-        if self.debug:
-            print('\nResponse:')
-            print(f'<<< status code: {response.status_code}')
-            print(f'<<< content: {content}\n')
-
-        if response.status_code != expected_status_code:
+    def handle_response(self, status_code, method, url, text, content, expected_status_code, retry_after=None):
+        if status_code != expected_status_code:
             raise UnexpectedStatusCode(
-                f'Got HTTP status {response.status_code} trying to {response.request.method} to {response.url}: {response.text}',
-                response.status_code,
-                content)
+                f'Got HTTP status {status_code} trying to {method} to {url}: {text}',
+                status_code,
+                content,
+                retry_after)
 
         return content
 
-    def send_request_(self, request_type, route_in, params=None, data=None, sandbox=False, expected_status_code=200):
-        url, route = self.url_and_route(route_in, sandbox)
-        headers = self.get_headers(request_type, route, params=params, data=data)
-        if self.debug:
-            print('\nRequest:')
-            print(f'>>> {request_type} {url}')
-            print(f'>>> headers: {headers}')
-            if params:
-                print(f'>>> params: {params}')
-            if data:
-                print(f'>>> data: {data}')
-        return self.process_response(
-            response=request_type_dict[request_type](url, headers=headers, params=params, json=data),
-            expected_status_code=expected_status_code)
-
-    def send_request(self, request_type, route_in, params=None, data=None, sandbox=False, expected_status_code=200):
-        try:
-            return self.send_request_(request_type, route_in, params, data, sandbox, expected_status_code)
-        except UnexpectedStatusCode as e:
-            if e.status_code == 401 and e.json:
-                match = re.search('The nonce is too low. The highest used nonce is (\d+)', e.json['errors'][0]['message'])
-                if match:
-                    self.counter_nonce = int(match.group(1)) + 1
-                    return self.send_request_(request_type, route_in, params, data, sandbox, expected_status_code)
-            raise e
-
-    def get(self, route_in, params=None, expected_status_code=200):
-        return self.send_request(
-            'GET', route_in, params=params, expected_status_code=expected_status_code)
+    def as_records(self, content, record_type: Optional[Type[Record]]):
+        if not self.records or record_type is None or content is None:
+            return content
+        if isinstance(content, list):
+            return [record_type.from_json(record) for record in content]
+        return record_type.from_json(content)
 
-    def post(self, route_in, data=None, sandbox=False, expected_status_code=200):
-        return self.send_request(
-            'POST', route_in, data=data, sandbox=sandbox, expected_status_code=expected_status_code)
-
-    def delete(self, route_in, sandbox=False, expected_status_code=204):
-        return self.send_request(
-            'DELETE', route_in, sandbox=sandbox, expected_status_code=expected_status_code)
-
-    def patch(self, route_in, data, expected_status_code=200):
-        return self.send_request(
-            'PATCH', route_in, data=data, expected_status_code=expected_status_code)
-
-    def wait_for_customer_withdrawals_to_complete(self, customer_id: str, timeout_seconds: int = 10):
-        start = time()
-        while True:
-            withdrawals = self.list_customer_withdrawals(customer_id)
-            if all([withdrawal['status'] == TransferStatus.Completed.name for withdrawal in withdrawals]):
-                break
-            if time() - start > timeout_seconds:
-                raise TimeoutError(f'Timed out waiting for withdrawals. Current customer withdrawals: {withdrawals}')
-        sleep(0.1)
+    @staticmethod
+    def highest_used_nonce(e: UnexpectedStatusCode) -> Optional[int]:
+        if e.status_code == 401 and e.json:
+            match = re.search(r'The nonce is too low. The highest used nonce is (\d+)', e.json['errors'][0]['message'])
+            if match:
+                return int(match.group(1))
+        return None
+
+    def is_overloaded(self, e: Exception) -> bool:
+        """ Whether `e` means the api is pushing back, so fewer requests should be sent concurrently. """
+        if isinstance(e, UnexpectedStatusCode):
+            return e.status_code == 429 or e.status_code >= 500
+        return isinstance(e, self.transient_errors)
+
+    def admission_metrics(self) -> Dict[str, Any]:
+        return {
+            'rate_limiter': self.rate_limiter.metrics() if self.rate_limiter is not None else None,
+            'concurrency_limiter': self.concurrency_limiter.metrics() if self.concurrency_limiter is not None else None,
+        }
+
+    def resync_nonce(self, e: UnexpectedStatusCode, attempt: int) -> bool:
+        """ Returns whether a request that failed with `e` should be signed again and resent. When many in-flight
+        requests fail with "nonce is too low" at once, only the first one moves the allocator forward to the highest
+        used nonce + 1; the others see that it has already moved (the allocator never goes backwards) and are just
+        re-signed against the new window. """
+        highest_used_nonce = self.highest_used_nonce(e)
+        if highest_used_nonce is None:
+            return False
+        with self._nonce_stats_lock:
+            if attempt >= self.max_nonce_retries:
+                self.nonce_stats['retries_exhausted'] += 1
+                return False
+            if self.nonce_allocator.advance_to(highest_used_nonce + 1):
+                self.nonce_stats['resyncs'] += 1
+            else:
+                self.nonce_stats['coalesced_resyncs'] += 1
+            self.nonce_stats['retries'] += 1
+        return True
 
     def sandbox_create_customer(
             self,
@@ -237,10 +339,10 @@ class Client:
         }, sandbox=True, **kwargs)
 
     def get_api_key(self, **kwargs):
-        return self.get('api-key', **kwargs)
+        return self.get('api-key', record_type=ApiKey, **kwargs)
 
     def list_symbols(self, **kwargs):
-        return self.get('symbols', **kwargs)
+        return self.get('symbols', record_type=SymbolInfo, **kwargs)
 
     def request_customer_onboarding(
             self,
@@ -257,10 +359,10 @@ class Client:
         }, **kwargs)
 
     def get_customer(self, customer_id: str, **kwargs):
-        return self.get(f'customers/{customer_id}', **kwargs)
+        return self.get(f'customers/{customer_id}', record_type=CustomerInfo, **kwargs)
 
     def list_customers(self, **kwargs):
-        return self.get('customers', **kwargs)
+        return self.get('customers', record_type=CustomerInfo, **kwargs)
 
     def change_customer(
             self,
@@ -284,7 +386,7 @@ class Client:
         return self.get(f'customers/{customer_id}/deposits', params={
             'from': self.format_date(from_dt),
             'to': self.format_date(to_dt),
-        }, **kwargs)
+        }, record_type=CustomerDeposit, **kwargs)
 
     def list_customer_withdrawals(
             self,
@@ -296,10 +398,11 @@ class Client:
         return self.get(f'customers/{customer_id}/withdrawals', params={
             'from': self.format_date(from_dt),
             'to': self.format_date(to_dt)
-        }, **kwargs)
+        }, record_type=CustomerWithdrawal, **kwargs)
 
     def list_customer_withdrawal_requests(self, customer_id: str, **kwargs):
-        return self.get(f'customers/{customer_id}/withdrawal-requests', **kwargs)
+        return self.get(
+            f'customers/{customer_id}/withdrawal-requests', record_type=CustomerWithdrawalRequest, **kwargs)
 
     def process_customer_withdrawal_request(self, customer_id: str, withdrawal_request_id: str, **kwargs):
         return self.post(f'customers/{customer_id}/withdrawal-requests/{withdrawal_request_id}/process', **kwargs)
@@ -335,7 +438,7 @@ class Client:
         }, **kwargs)
 
     def get_webhook_config(self, **kwargs):
-        return self.get('webhook-config', **kwargs)
+        return self.get('webhook-config', record_type=WebhookSettings, **kwargs)
 
     def delete_webhook_config(self, **kwargs):
         return self.delete('webhook-config', **kwargs)
@@ -353,10 +456,10 @@ class Client:
             'from': self.format_date(from_dt),
             'to': self.format_date(to_dt),
             'undelivered': self.format_boolean(undelivered),
-        }, **kwargs)
+        }, record_type=WebhooksList, **kwargs)
 
     def get_webhook(self, webhook_sequence_number: int, **kwargs):
-        return self.get(f'webhooks/{webhook_sequence_number}', **kwargs)
+        return self.get(f'webhooks/{webhook_sequence_number}', record_type=Webhook, **kwargs)
 
     def mark_webhooks_as_delivered(self, delivered_webhooks: List[int], **kwargs):
         return self.post(f'webhooks/delivered', data={
@@ -372,14 +475,14 @@ class Client:
             **kwargs
     ):
         return self.get('trades', params={
-            'continuationToken': self.format_boolean(continuation_token),
+            'continuationToken': continuation_token,
             'from': self.format_date(from_dt),
             'to': self.format_date(to_dt),
             'counterpartyIdentifier': counterparty_id,
-        }, **kwargs)
+        }, record_type=TradeList, **kwargs)
 
     def get_trade(self, trade_id: str, **kwargs):
-        return self.get(f'trades/{trade_id}', **kwargs)
+        return self.get(f'trades/{trade_id}', record_type=TradeInfo, **kwargs)
 
     def submit_trade(
             self,
@@ -398,7 +501,27 @@ class Client:
             execution_date: datetime,
             **kwargs
     ):
-        return self.post(f'trades', data={
+        return self.post(f'trades', data=self.trade_payload(
+            trade_id, side, base_symbol, term_symbol, dealt, rate, counter, counterparty_id, liquidity_indicator,
+            venue_fee, venue_fee_symbol, notes, execution_date), **kwargs)
+
+    def trade_payload(
+            self,
+            trade_id: str,
+            side: str,
+            base_symbol: str,
+            term_symbol: str,
+            dealt: str,
+            rate: str,
+            counter: str,
+            counterparty_id: str,
+            liquidity_indicator: Optional[str],
+            venue_fee: str,
+            venue_fee_symbol: Optional[str],
+            notes: Optional[str],
+            execution_date: datetime,
+    ):
+        return {
             'identifier': trade_id,
             'side': side,
             'baseSymbol': base_symbol,
@@ -414,7 +537,7 @@ class Client:
             'executionDate': self.format_date(execution_date),
             'tradeHash': self.compute_trade_hash(self.venue_id, counterparty_id, trade_id, side,
                                                  base_symbol, term_symbol, dealt, rate, counter, execution_date),
-        }, **kwargs)
+        }
 
     def update_trade(
             self,
@@ -464,10 +587,10 @@ class Client:
         }, **kwargs)
 
     def list_settlement_plans(self, **kwargs):
-        return self.get('settlement-plans', **kwargs)
+        return self.get('settlement-plans', record_type=SettlementPlanShort, **kwargs)
 
     def get_settlement_plan(self, settlement_id: str, **kwargs):
-        return self.get(f'settlement-plans/{settlement_id}', **kwargs)
+        return self.get(f'settlement-plans/{settlement_id}', record_type=SettlementPlan, **kwargs)
 
     def cancel_settlement_plan(self, settlement_id: str, **kwargs):
         return self.delete(f'settlement-plans/{settlement_id}', **kwargs)
@@ -497,7 +620,7 @@ class Client:
         }, **kwargs)
 
     def get_settlement(self, settlement_id: str, **kwargs):
-        return self.get(f'settlements/{settlement_id}', **kwargs)
+        return self.get(f'settlements/{settlement_id}', record_type=Settlement, **kwargs)
 
     def list_settlements(
             self,
@@ -508,16 +631,17 @@ class Client:
         return self.get(f'settlements', params={
             'from': self.format_date(from_dt),
             'to': self.format_date(to_dt),
-        }, **kwargs)
+        }, record_type=SettlementShort, **kwargs)
 
     def list_custodians(self, **kwargs):
-        return self.get('custodians', **kwargs)
+        return self.get('custodians', record_type=Custodian, **kwargs)
 
     def get_custodian(self, custodian_id: str, **kwargs):
-        return self.get(f'custodians/{custodian_id}', **kwargs)
+        return self.get(f'custodians/{custodian_id}', record_type=Custodian, **kwargs)
 
     def get_custodian_deposit_instructions(self, custodian_id: str, **kwargs):
-        return self.get(f'custodians/{custodian_id}/deposit-instructions', **kwargs)
+        return self.get(
+            f'custodians/{custodian_id}/deposit-instructions', record_type=CustodianDepositInstructions, **kwargs)
 
     def list_custodian_deposits(
             self,
@@ -529,13 +653,16 @@ class Client:
         return self.get(f'custodians/{custodian_id}/deposits', params={
             'from': self.format_date(from_dt),
             'to': self.format_date(to_dt),
-        }, **kwargs)
+        }, record_type=CustodianDeposit, **kwargs)
 
     def list_custodian_withdrawal_destinations(self, custodian_id: str, **kwargs):
-        return self.get(f'custodians/{custodian_id}/withdrawal-destinations', **kwargs)
+        return self.get(
+            f'custodians/{custodian_id}/withdrawal-destinations', record_type=WithdrawalDestination, **kwargs)
 
     def get_custodian_withdrawal_destination(self, custodian_id: str, withdrawal_destination_id: str, **kwargs):
-        return self.get(f'custodians/{custodian_id}/withdrawal-destinations/{withdrawal_destination_id}', **kwargs)
+        return self.get(
+            f'custodians/{custodian_id}/withdrawal-destinations/{withdrawal_destination_id}',
+            record_type=WithdrawalDestination, **kwargs)
 
     def delete_withdrawal_destination(self, custodian_id: str, withdrawal_destination_id: str, **kwargs):
         return self.delete(f'custodians/{custodian_id}/withdrawal-destinations/{withdrawal_destination_id}', **kwargs)
@@ -586,4 +713,417 @@ class Client:
         return self.get(f'custodians/{custodian_id}/withdrawals', params={
             'from': self.format_date(from_dt),
             'to': self.format_date(to_dt),
-        }, **kwargs)
+        }, record_type=CustodianWithdrawal, **kwargs)
+
+
+class Client(BaseClient):
+    transient_errors = (requests.ConnectionError, requests.Timeout)
+
+    def __init__(
+            self,
+            key,
+            secret,
+            url,
+            signing_key_file,
+            sandbox_url=None,
+            venue_id=None,
+            api_version='v1',
+            debug=False,
+            session: Optional[requests.Session] = None,
+            timeout: Optional[Union[float, Tuple[float, float]]] = None,
+            pool_connections: int = 10,
+            pool_maxsize: int = 10,
+            pool_block: bool = False,
+            keep_alive: bool = True,
+            nonce_allocator: Optional[NonceAllocator] = None,
+            max_nonce_retries: int = 3,
+            json_encoder: Optional[JsonEncoder] = None,
+            json_decoder: Optional[JsonDecoder] = None,
+            records: bool = False,
+            retry_policy: Optional[RetryPolicy] = None,
+            rate_limiter: Optional[RateLimiter] = None,
+            concurrency_limiter: Optional[ConcurrencyLimiter] = None,
+            instrumentation: Optional[Instrumentation] = None,
+            settlement_signer: Optional[SettlementSigner] = None,
+            venue_id_cache: Optional[VenueIdCache] = None,
+            trade_cache: Optional[TradeCache] = None,
+            trade_cache_max_age: float = 60,
+            reference_cache: Optional[ReferenceCache] = None,
+    ):
+        super().__init__(
+            key, secret, url, signing_key_file, sandbox_url, venue_id, api_version, debug, nonce_allocator,
+            max_nonce_retries, json_encoder, json_decoder, records, retry_policy, rate_limiter, concurrency_limiter,
+            instrumentation, settlement_signer, venue_id_cache)
+        # all requests go through a single session, so connections to the api are pooled and reused
+        self.session = session or create_session(pool_connections, pool_maxsize, pool_block, keep_alive)
+        self.timeout = timeout
+        # get_trade and list_trades are served from the cache while its last refresh is at most max age seconds old
+        self.trade_cache = trade_cache
+        self.trade_cache_max_age = trade_cache_max_age
+        # symbols, custodians, the api key and deposit instructions are read through this cache if given
+        self.reference_cache = reference_cache
+
+    def lookup_venue_id(self) -> str:
+        # if venue id is not supplied or cached, just get it from the current user endpoint
+        return super().lookup_venue_id() or self.remember_venue_id(self.get_api_key()['venueIdentifier'])
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def connection_stats(self):
+        """ Returns the number of connections opened and requests sent per pooled host. When connections are
+        reused, `requests` will be larger than `connections`. """
+        stats = {}
+        # the same adapter is mounted for both http and https, so only visit each one once
+        for adapter in {id(a): a for a in self.session.adapters.values()}.values():
+            pools = adapter.poolmanager.pools
+            for pool_key in pools.keys():
+                pool = pools.get(pool_key)
+                if pool is None:
+                    continue
+                host_stats = stats.setdefault(f'{pool.scheme}://{pool.host}:{pool.port}', {'connections': 0, 'requests': 0})
+                host_stats['connections'] += pool.num_connections
+                host_stats['requests'] += pool.num_requests
+        return stats
+
+    def process_response(self, response, expected_status_code):
+        content = None if not response.content else self.json_decoder(response.content)
+        # decoding the body as text is only needed for the error message
+        text = response.text if response.status_code != expected_status_code else None
+        return self.handle_response(
+            response.status_code, response.request.method, response.url, text, content, expected_status_code,
+            response.headers.get('Retry-After'))
+
+    def send_request_(
+            self,
+            request_type,
+            route_in,
+            params=None,
+            data=None,
+            sandbox=False,
+            expected_status_code=200,
+            idempotency_id=None,
+            body=None,
+    ):
+        url, route = self.url_and_route(route_in, sandbox)
+        # the body is encoded once, and exactly those bytes are both signed and sent
+        body = self.encode_body(data) if body is None else body
+        endpoint = endpoint_class(request_type, route_in)
+        instrumentation = self.instrumentation
+        event = None if instrumentation is None else instrumentation.start(request_type, route_in, params, data)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self.key, endpoint)
+        limiter = self.concurrency_limiter
+        if limiter is not None:
+            limiter.acquire()
+        # from here on the slot is released whatever fails, e.g. signing or a hook
+        start = None
+        overloaded = False
+        try:
+            if event is not None:
+                event.admitted()
+            # signed after waiting for admission, so the timestamp is current
+            headers = self.get_headers(request_type, route, params=params, idempotency_id=idempotency_id, body=body)
+            if event is not None:
+                event.signed(url, headers, body)
+                instrumentation.sent(event)
+            start = monotonic()
+            response = self.session.request(
+                request_type, url, headers=headers, params=params, data=body, timeout=self.timeout)
+            if event is not None:
+                # requests measures the time until the response headers were parsed
+                event.received(response.status_code, len(response.content), response.elapsed.total_seconds())
+            content = self.process_response(response, expected_status_code)
+        except Exception as e:
+            overloaded = self.is_overloaded(e)
+            if event is not None:
+                instrumentation.failed(event, e)
+            raise
+        finally:
+            if limiter is not None:
+                limiter.release(None if start is None else monotonic() - start, overloaded, endpoint)
+        # outside the try: the request has been applied, whatever the hooks do with the response
+        if event is not None:
+            instrumentation.succeeded(event, content)
+        return content
+
+    def send_request(
+            self,
+            request_type,
+            route_in,
+            params=None,
+            data=None,
+            sandbox=False,
+            expected_status_code=200,
+            idempotency_id=None,
+            body=None,
+    ):
+        # the idempotency id and body are fixed for the whole logical operation, so a resent request is never
+        # applied twice; only the nonce and timestamp are signed again
+        if request_type != 'GET' and idempotency_id is None:
+            idempotency_id = str(uuid4())
+        body = self.encode_body(data) if body is None else body
+        retry = RetryState(self)
+        while True:
+            try:
+                return self.send_request_(
+                    request_type, route_in, params, data, sandbox, expected_status_code, idempotency_id, body)
+            except (UnexpectedStatusCode, *self.transient_errors) as e:
+                delay = retry.next_delay(e)
+                if delay is None:
+                    raise e
+                sleep(delay)
+
+    def get(self, route_in, params=None, expected_status_code=200, fields=None, stream=False, record_type=None):
+        """ With `fields`, only those keys of the returned record(s) are kept. With `stream`, a list endpoint
+        returns a generator over its records (e.g. the `trades` of `list_trades`) that decodes them one at a time
+        as the response arrives, and follows the continuation token (or next webhook sequence number) to the
+        following pages. """
+        if stream:
+            return self.get_streamed(route_in, params=params, fields=fields, record_type=record_type)
+        content = self.send_request(
+            'GET', route_in, params=params, expected_status_code=expected_status_code)
+        return self.as_records(content, record_type) if fields is None else project_fields(content, fields)
+
+    def get_streamed(self, route_in, params=None, fields=None, record_type=None, chunk_size=65536):
+        array_key = route_in if route_in in RECORD_ARRAY_KEYS else None
+        if array_key and record_type is not None:
+            # the records of e.g. a `TradeList` are `TradeInfo`s
+            record_type = record_type.schema[array_key][0]
+        next_page_key, next_page_param = NEXT_PAGE_KEYS.get(array_key, (None, None))
+        while True:
+            page = {} if array_key else None
+            yield from self.get_streamed_page(route_in, params, fields, record_type, array_key, page, chunk_size)
+            if not page or page.get(next_page_key) is None:
+                return
+            params = {**(params or {}), next_page_param: page[next_page_key]}
+
+    def get_streamed_page(self, route_in, params, fields, record_type, array_key, page, chunk_size):
+        """ Yields the records of one page; the other keys of the response are decoded into `page`. """
+        url, route = self.url_and_route(route_in)
+        endpoint = endpoint_class('GET', route_in)
+        limiter = self.concurrency_limiter
+        retry = RetryState(self)
+        while True:
+            instrumentation = self.instrumentation
+            event = None if instrumentation is None else instrumentation.start('GET', route_in, params)
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(self.key, endpoint)
+            if limiter is not None:
+                limiter.acquire()
+            # the slot is held until the stream is consumed (or abandoned), the latency is the time to the headers
+            start = latency = None
+            overloaded = False
+            try:
+                try:
+                    if event is not None:
+                        event.admitted()
+                    headers = self.get_headers('GET', route, params=params)
+                    if event is not None:
+                        event.signed(url, headers, None)
+                        instrumentation.sent(event)
+                    start = monotonic()
+                    response = self.session.get(
+                        url, headers=headers, params=params, stream=True, timeout=self.timeout)
+                    latency = monotonic() - start
+                    if response.status_code != 200:
+                        with response:
+                            self.process_response(response, 200)
+                except (UnexpectedStatusCode, *self.transient_errors) as e:
+                    overloaded = self.is_overloaded(e)
+                    if latency is None and start is not None:
+                        latency = monotonic() - start
+                    if event is not None:
+                        instrumentation.failed(event, e)
+                    delay = retry.next_delay(e)
+                    if delay is None:
+                        raise e
+                else:
+                    # once records have been yielded the request is not retried anymore
+                    with response:
+                        for record in iter_json_array(response.iter_content(chunk_size), array_key, page):
+                            yield self.as_records(record, record_type) if fields is None \
+                                else project_fields(record, fields)
+                    if event is not None:
+                        # the whole stream counts as transfer, the records were not kept around
+                        event.received(response.status_code, response.raw.tell(), response.elapsed.total_seconds())
+                        instrumentation.succeeded(event, None)
+                    return
+            finally:
+                if limiter is not None:
+                    limiter.release(latency, overloaded, endpoint)
+            sleep(delay)
+
+    def post(
+            self, route_in, data=None, sandbox=False, expected_status_code=200, idempotency_id=None, body=None):
+        """ `body` is `data` already encoded, e.g. by a worker that prepares requests ahead of sending them. """
+        return self.send_request(
+            'POST', route_in, data=data, sandbox=sandbox, expected_status_code=expected_status_code,
+            idempotency_id=idempotency_id, body=body)
+
+    def delete(self, route_in, sandbox=False, expected_status_code=204, idempotency_id=None):
+        return self.send_request(
+            'DELETE', route_in, sandbox=sandbox, expected_status_code=expected_status_code,
+            idempotency_id=idempotency_id)
+
+    def patch(self, route_in, data, expected_status_code=200, idempotency_id=None):
+        return self.send_request(
+            'PATCH', route_in, data=data, expected_status_code=expected_status_code,
+            idempotency_id=idempotency_id)
+
+    def cached(self, key: Tuple, load, **kwargs):
+        # requests with get() options (fields, stream, ...) always go to the api
+        if self.reference_cache is None or kwargs:
+            return load(**kwargs)
+        # a cache may be shared by clients of different accounts and environments
+        return self.reference_cache.get_or_load((*key, self.url, self.key, self.records), load)
+
+    def get_api_key(self, **kwargs):
+        return self.cached(('api-key',), super().get_api_key, **kwargs)
+
+    def list_symbols(self, **kwargs):
+        return self.cached(('symbols',), super().list_symbols, **kwargs)
+
+    def list_custodians(self, **kwargs):
+        return self.cached(('custodians',), super().list_custodians, **kwargs)
+
+    def get_custodian(self, custodian_id: str, **kwargs):
+        return self.cached(('custodians', custodian_id), partial(super().get_custodian, custodian_id), **kwargs)
+
+    def get_custodian_deposit_instructions(self, custodian_id: str, **kwargs):
+        return self.cached(
+            ('deposit-instructions', custodian_id), partial(super().get_custodian_deposit_instructions, custodian_id),
+            **kwargs)
+
+    def symbols_by_custodian(self) -> Dict[str, list]:
+        """ The symbols of `list_symbols` by the identifier of every custodian supporting them. Cached (and
+        invalidated) with the symbols if the client has a `reference_cache`. """
+        def index():
+            symbols_by_custodian = {}
+            for symbol in self.list_symbols():
+                for custodian_symbol in symbol['custodianSymbols']:
+                    symbols = symbols_by_custodian.setdefault(custodian_symbol['custodianIdentifier'], [])
+                    if not symbols or symbols[-1] is not symbol:
+                        symbols.append(symbol)
+            return symbols_by_custodian
+        return self.cached(('symbols', 'by-custodian'), index)
+
+    def use_trade_cache(self, cached: bool, **kwargs) -> bool:
+        # requests with get() options (fields, stream, ...) always go to the api
+        return cached and not kwargs and self.trade_cache is not None \
+            and self.trade_cache.is_fresh(self.trade_cache_max_age)
+
+    def get_trade(self, trade_id: str, cached: bool = True, **kwargs):
+        """ With a fresh `trade_cache`, a trade found there is returned locally; any other goes to the api. """
+        if self.use_trade_cache(cached, **kwargs):
+            trade = self.trade_cache.get_trade(trade_id)
+            if trade is not None:
+                return self.as_records(trade, TradeInfo)
+        return super().get_trade(trade_id, **kwargs)
+
+    def list_trades(
+            self,
+            continuation_token: Optional[str] = None,
+            from_dt: Optional[Union[datetime, str]] = None,
+            to_dt: Optional[Union[datetime, str]] = None,
+            counterparty_id: Optional[str] = None,
+            cached: bool = True,
+            **kwargs
+    ):
+        """ With a fresh `trade_cache` that covers `from_dt`, all matching trades are returned locally as a single
+        page without a continuation token. """
+        if continuation_token is None and self.use_trade_cache(cached, **kwargs) and self.trade_cache.covers(from_dt):
+            page = {'continuationToken': None, 'trades': self.trade_cache.list_trades(from_dt, to_dt, counterparty_id)}
+            return self.as_records(page, TradeList)
+        return super().list_trades(continuation_token, from_dt, to_dt, counterparty_id, **kwargs)
+
+    def submit_trades(
+            self,
+            trades: Iterable[Dict[str, Any]],
+            max_in_flight: int = 8,
+            prepare_workers: int = 2,
+            max_attempts: int = 1,
+            stats: Optional[BulkSubmitStats] = None,
+    ):
+        """ Usage:
+            stats = BulkSubmitStats()
+            for submission in client.submit_trades(trade_kwargs_generator, stats=stats):
+                ...
+            print(stats.trades_per_second)
+        """
+        return submit_trades(
+            self, trades, max_in_flight=max_in_flight, prepare_workers=prepare_workers, max_attempts=max_attempts,
+            stats=stats)
+
+    def iter_trades(
+            self,
+            from_dt: Optional[Union[datetime, str]] = None,
+            to_dt: Optional[Union[datetime, str]] = None,
+            counterparty_id: Optional[str] = None,
+            prefetch: bool = True,
+            cached: bool = True,
+    ):
+        """ Yields the trades of every page of `list_trades`, following the continuation token. Only the current
+        page (plus, with `prefetch`, the next one being fetched in the background) is held in memory. """
+        def fetch(continuation_token=None):
+            return self.list_trades(
+                continuation_token, from_dt=from_dt, to_dt=to_dt, counterparty_id=counterparty_id, cached=cached)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            page = fetch()
+            while True:
+                continuation_token = page.get('continuationToken')
+                next_page = executor.submit(fetch, continuation_token) if continuation_token and prefetch else None
+                yield from page['trades']
+                if not continuation_token:
+                    return
+                page = next_page.result() if next_page else fetch(continuation_token)
+
+    def list_sharded(
+            self,
+            endpoint: str,
+            *args,
+            from_dt: datetime,
+            to_dt: datetime,
+            shards: int = 8,
+            max_workers: int = 4,
+            **kwargs
+    ):
+        """ Fetches a large time window from one of the `list_*` endpoints with from/to filters as `shards` smaller
+        windows in parallel, e.g.:
+
+            client.list_sharded('list_custodian_deposits', custodian_id, from_dt=month_start, to_dt=month_end)
+
+        Records are deduplicated by identifier and returned in time order. """
+        if endpoint not in SHARDABLE_ENDPOINTS:
+            raise ValueError(f'{endpoint} cannot be sharded, expected one of {", ".join(SHARDABLE_ENDPOINTS)}')
+
+        def fetch(shard_from_dt, shard_to_dt):
+            if endpoint == 'list_trades':
+                return self.iter_trades(from_dt=shard_from_dt, to_dt=shard_to_dt, **kwargs)
+            return getattr(self, endpoint)(*args, from_dt=shard_from_dt, to_dt=shard_to_dt, **kwargs)
+
+        return fetch_sharded(
+            fetch, from_dt, to_dt, shards=shards, max_workers=max_workers, time_field=SHARDABLE_ENDPOINTS[endpoint])
+
+    def wait_for_customer_withdrawals_to_complete(
+            self, customer_id: str, timeout_seconds: int = 10, poller: Optional[Poller] = None):
+        """ With a `poller`, concurrent waits for the same customer share its polling and complete early on
+        `WithdrawalStatusChanged` webhooks passed to `poller.on_webhook`. """
+        def completed(withdrawals):
+            return all(withdrawal['status'] == TransferStatus.Completed.name for withdrawal in withdrawals)
+
+        def fetch():
+            return self.list_customer_withdrawals(customer_id)
+
+        if poller is None:
+            return wait_until(completed, fetch, timeout_seconds, description=f'withdrawals of customer {customer_id}')
+        return poller.wait(
+            ('customer-withdrawals', customer_id), fetch, completed, timeout_seconds,
+            webhook_types=[WebhookType.WithdrawalStatusChanged])
@@ -0,0 +1,15 @@
+class UnexpectedStatusCode(Exception):
+    def __init__(self, message, status_code, json, retry_after=None):
+        self.message = message
+        self.status_code = status_code
+        self.json = json
+        # the Retry-After header of the response, if any
+        self.retry_after = retry_after
+
+
+class SkippedWebhooks(Exception):
+    def __init__(self, message, first_sequence_number, last_sequence_number):
+        super().__init__(message)
+        self.message = message
+        self.first_sequence_number = first_sequence_number
+        self.last_sequence_number = last_sequence_number
@@ -0,0 +1,346 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+from time import monotonic
+from typing import Callable, Dict, List, Optional, Tuple
+
+# the fixed path segments of the api; every other segment is an identifier
+LITERAL_SEGMENTS = frozenset([
+    'accept', 'api-key', 'custodians', 'customers', 'delivered', 'deposit-instructions', 'deposits',
+    'funding-requests', 'onboard', 'process', 'reject', 'sandbox', 'settle', 'settlement-plans', 'settlements',
+    'symbols', 'trades', 'webhook-config', 'webhooks', 'withdrawal-destinations', 'withdrawal-requests', 'withdrawals',
+])
+
+_route_templates: Dict[str, str] = {}
+
+# credentials in requests, hooks only see them redacted
+REDACTED_HEADERS = frozenset(['Authorization'])
+REDACTED_FIELDS = frozenset(['signedSettlementFlowHash'])
+REDACTED = '[redacted]'
+
+
+def route_template(route_in: str) -> str:
+    """ `trades/abc123` -> `trades/{id}`, so metrics are aggregated per endpoint instead of per resource. """
+    template = _route_templates.get(route_in)
+    if template is None:
+        template = '/'.join(s if s in LITERAL_SEGMENTS else '{id}' for s in route_in.strip('/').split('/'))
+        # identifiers are unbounded, templates are not; only keep a bounded number of raw routes around
+        if len(_route_templates) < 10000:
+            _route_templates[route_in] = template
+    return template
+
+
+def redact(values, names: frozenset):
+    if not isinstance(values, dict) or names.isdisjoint(values):
+        return values
+    return {k: REDACTED if k in names else v for k, v in values.items()}
+
+
+class RequestEvent:
+    """ One request as seen by the hooks. Phases are in seconds and None when the transport does not report them:
+    `queue` (waiting for the rate and concurrency limiters), `sign`, `connect` (opening a new connection), `ttfb`
+    (request sent until response headers received), `transfer` (the rest of the response body) and `decode`.
+
+    The `Authorization` header and settlement signatures in `headers` and `data` are redacted. """
+
+    __slots__ = (
+        'method', 'route', 'route_template', 'url', 'headers', 'params', 'data', 'status', 'request_bytes',
+        'response_bytes', 'started_at', 'admitted_at', 'signed_at', 'received_at', 'queue', 'sign', 'connect',
+        'ttfb', 'transfer', 'decode', 'total', 'error', 'connect_started_at', 'headers_received_at')
+
+    def __init__(self, method: str, route: str, params, data):
+        self.method = method
+        self.route = route
+        self.route_template = route_template(route)
+        self.params = params
+        self.data = redact(data, REDACTED_FIELDS)
+        self.url = self.headers = self.status = self.request_bytes = self.response_bytes = None
+        self.admitted_at = self.signed_at = self.received_at = None
+        self.queue = self.sign = self.connect = self.ttfb = self.transfer = self.decode = self.total = None
+        self.error = self.connect_started_at = self.headers_received_at = None
+        self.started_at = monotonic()
+
+    def admitted(self):
+        self.admitted_at = monotonic()
+        self.queue = self.admitted_at - self.started_at
+
+    def signed(self, url: str, headers, body: Optional[bytes]):
+        self.signed_at = monotonic()
+        self.sign = self.signed_at - (self.admitted_at or self.started_at)
+        self.url = url
+        self.headers = redact(headers, REDACTED_HEADERS)
+        self.request_bytes = len(body) if body else 0
+
+    def received(self, status: int, response_bytes: int, ttfb: Optional[float] = None):
+        """ Response fully read; `ttfb` if the transport measured it, else from `headers_received_at`. """
+        self.received_at = monotonic()
+        self.status = status
+        self.response_bytes = response_bytes
+        if ttfb is None and self.headers_received_at is not None:
+            ttfb = self.headers_received_at - self.signed_at - (self.connect or 0.0)
+        self.ttfb = ttfb
+        if ttfb is not None:
+            self.transfer = max(0.0, self.received_at - self.signed_at - ttfb - (self.connect or 0.0))
+
+    def finished(self, error: Optional[Exception] = None):
+        now = monotonic()
+        if self.received_at is not None:
+            self.decode = now - self.received_at
+        self.total = now - self.started_at
+        self.error = error
+
+
+Hook = Callable[..., None]
+
+
+class Instrumentation:
+    """ Hooks called around every request of a client:
+
+        instrumentation = Instrumentation()
+        metrics = RequestMetrics()
+        instrumentation.add(after_response=metrics.after_response, on_error=metrics.on_error)
+        client = Client(..., instrumentation=instrumentation)
+
+    `before_request(event)` is called once the request is signed, `after_response(event, content)` with the decoded
+    content and `on_error(event, exception)` for unexpected statuses and transport errors. Without an
+    `instrumentation` the client does not create events at all.
+
+    An exception raised by a hook never fails, or resends, the request it observes: it is counted in `hook_errors`
+    and passed to `on_hook_error(hook, exception)` if given, and otherwise ignored. """
+
+    def __init__(self, on_hook_error: Optional[Callable[[Hook, Exception], None]] = None):
+        self.before_request: List[Hook] = []
+        self.after_response: List[Hook] = []
+        self.on_error: List[Hook] = []
+        self.on_hook_error = on_hook_error
+        self.hook_errors = 0
+
+    def add(self, before_request: Hook = None, after_response: Hook = None, on_error: Hook = None):
+        for hooks, hook in ((self.before_request, before_request), (self.after_response, after_response),
+                            (self.on_error, on_error)):
+            if hook is not None:
+                hooks.append(hook)
+        return self
+
+    def start(self, method: str, route: str, params=None, data=None) -> RequestEvent:
+        return RequestEvent(method, route, params, data)
+
+    def call(self, hooks: List[Hook], *args):
+        for hook in hooks:
+            try:
+                hook(*args)
+            except Exception as e:
+                self.hook_errors += 1
+                if self.on_hook_error is not None:
+                    try:
+                        self.on_hook_error(hook, e)
+                    except Exception:
+                        pass
+
+    def sent(self, event: RequestEvent):
+        self.call(self.before_request, event)
+
+    def succeeded(self, event: RequestEvent, content):
+        event.finished()
+        self.call(self.after_response, event, content)
+
+    def failed(self, event: RequestEvent, e: Exception):
+        event.finished(e)
+        self.call(self.on_error, event, e)
+
+
+class DebugPrinter:
+    """ What `Client(..., debug=True)` prints: every request and response in full. """
+
+    @staticmethod
+    def before_request(event: RequestEvent):
+        print('\nRequest:')
+        print(f'>>> {event.method} {event.url}')
+        print(f'>>> headers: {event.headers}')
+        if event.params:
+            print(f'>>> params: {event.params}')
+        if event.data:
+            print(f'>>> data: {event.data}')
+
+    @staticmethod
+    def after_response(event: RequestEvent, content):
+        print('\nResponse:')
+        print(f'<<< status code: {event.status}')
+        print(f'<<< content: {content}\n')
+
+    @staticmethod
+    def on_error(event: RequestEvent, e: Exception):
+        print('\nResponse:')
+        print(f'<<< status code: {event.status}')
+        print(f'<<< error: {e}\n')
+
+
+class LatencyHistogram:
+    """ HDR-style histogram of durations: values are recorded in microseconds into log-linear buckets with 64
+    sub-buckets per power of two, so every recorded value is kept with a relative error below 1.6%, in a few KB for
+    any range of latencies. """
+
+    SUB_BUCKET_BITS = 6
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def index(cls, microseconds: int) -> int:
+        magnitude = max(0, microseconds.bit_length() - cls.SUB_BUCKET_BITS - 1)
+        return (magnitude << cls.SUB_BUCKET_BITS) + (microseconds >> magnitude)
+
+    @classmethod
+    def lowest_value(cls, index: int) -> int:
+        magnitude = max(0, (index >> cls.SUB_BUCKET_BITS) - 1)
+        sub_bucket = index - (magnitude << cls.SUB_BUCKET_BITS)
+        return sub_bucket << magnitude
+
+    @classmethod
+    def highest_value(cls, index: int) -> int:
+        return cls.lowest_value(index + 1) - 1
+
+    def record(self, seconds: float):
+        index = self.index(int(seconds * 1e6))
+        with self.lock:
+            self.counts[index] = self.counts.get(index, 0) + 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, percentile: float) -> float:
+        """ The duration in seconds below which `percentile` percent of the recorded values lie. """
+        with self.lock:
+            counts = sorted(self.counts.items())
+            count = self.count
+        if not count:
+            return 0.0
+        rank = max(1, round(percentile / 100 * count))
+        seen = 0
+        for index, bucket_count in counts:
+            seen += bucket_count
+            if seen >= rank:
+                return self.highest_value(index) / 1e6
+        return self.max
+
+    def cumulative_counts(self, bounds: Tuple[float, ...]) -> List[int]:
+        """ Number of recorded values up to each of `bounds` (in seconds), for Prometheus histogram buckets. """
+        with self.lock:
+            counts = sorted(self.counts.items())
+        result = []
+        seen = 0
+        i = 0
+        for bound in bounds:
+            while i < len(counts) and self.highest_value(counts[i][0]) <= bound * 1e6:
+                seen += counts[i][1]
+                i += 1
+            result.append(seen)
+        return result
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+PROMETHEUS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(**labels) -> str:
+    return ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels.items())
+
+
+class RequestMetrics:
+    """ Latency histograms per (method, route template) and phase, plus request, error and byte counters, fed by
+    `Instrumentation` hooks and exported in the Prometheus text format. """
+
+    PHASES = ('total', 'queue', 'sign', 'connect', 'ttfb', 'transfer', 'decode')
+
+    def __init__(self, namespace: str = 'exchange_api'):
+        self.namespace = namespace
+        self.histograms: Dict[Tuple[str, str, str], LatencyHistogram] = {}
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+        self.bytes: Dict[Tuple[str, str, str], int] = {}
+        self.lock = threading.Lock()
+        self.started_at = monotonic()
+
+    def histogram(self, method: str, template: str, phase: str = 'total') -> LatencyHistogram:
+        key = (method, template, phase)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, LatencyHistogram())
+        return histogram
+
+    def record(self, event: RequestEvent, outcome: str):
+        for phase in self.PHASES:
+            value = getattr(event, phase)
+            if value is not None:
+                self.histogram(event.method, event.route_template, phase).record(value)
+        with self.lock:
+            key = (event.method, event.route_template, str(event.status or outcome))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            for direction, size in (('sent', event.request_bytes), ('received', event.response_bytes)):
+                if size:
+                    key = (event.method, event.route_template, direction)
+                    self.bytes[key] = self.bytes.get(key, 0) + size
+
+    def after_response(self, event: RequestEvent, content):
+        self.record(event, 'ok')
+
+    def on_error(self, event: RequestEvent, e: Exception):
+        self.record(event, type(e).__name__)
+
+    def install(self, instrumentation: Instrumentation) -> Instrumentation:
+        return instrumentation.add(after_response=self.after_response, on_error=self.on_error)
+
+    def throughput(self) -> Dict[Tuple[str, str], float]:
+        """ Requests per second per (method, route template) since the metrics were created. """
+        elapsed = monotonic() - self.started_at
+        totals = {}
+        for (method, template, _), count in list(self.requests.items()):
+            totals[method, template] = totals.get((method, template), 0) + count
+        return {key: count / elapsed for key, count in totals.items()}
+
+    def prometheus_text(self) -> str:
+        ns = self.namespace
+        lines = [f'# TYPE {ns}_request_duration_seconds histogram']
+        for (method, template, phase), histogram in sorted(self.histograms.items()):
+            labels = _labels(method=method, route=template, phase=phase)
+            for bound, count in zip(PROMETHEUS_BUCKETS, histogram.cumulative_counts(PROMETHEUS_BUCKETS)):
+                lines.append(f'{ns}_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{ns}_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'{ns}_request_duration_seconds_sum{{{labels}}} {histogram.sum}')
+            lines.append(f'{ns}_request_duration_seconds_count{{{labels}}} {histogram.count}')
+        lines.append(f'# TYPE {ns}_requests_total counter')
+        for (method, template, status), count in sorted(self.requests.items()):
+            lines.append(f'{ns}_requests_total{{{_labels(method=method, route=template, status=status)}}} {count}')
+        lines.append(f'# TYPE {ns}_bytes_total counter')
+        for (method, template, direction), count in sorted(self.bytes.items()):
+            labels = _labels(method=method, route=template, direction=direction)
+            lines.append(f'{ns}_bytes_total{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port: int = 9100, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """ Serves `prometheus_text` on every path from a background thread; `shutdown()` the returned server to
+        stop. Only reachable from the local host unless another `host` (e.g. '0.0.0.0') is given. """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics-exporter', daemon=True).start()
+        return server
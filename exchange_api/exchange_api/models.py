@@ -1,4 +1,7 @@
+from decimal import Decimal
 from enum import Enum
+import re
+import sys
 from typing import Optional
 
 
@@ -30,6 +33,15 @@ class CustodianStatus(Enum):
     Disabled = 'Disabled'
 
 
+class WebhookType(Enum):
+    CustomerStatusChanged = 'CustomerStatusChanged'
+    CustomerWithdrawalRequested = 'CustomerWithdrawalRequested'
+    CustomerDepositCompleted = 'CustomerDepositCompleted'
+    SettlementFundingStatusChanged = 'SettlementFundingStatusChanged'
+    SettlementStatusChanged = 'SettlementStatusChanged'
+    WithdrawalStatusChanged = 'WithdrawalStatusChanged'
+
+
 class Address:
     def __init__(self, street1: str, street2: str, city: str, region: str, postal_code: str, country: str):
         self.street1 = street1
@@ -99,3 +111,334 @@ class BankTransferDetails:
             'routingNumber': self.routing_number,
             'internationalDetails': self.international_details.to_json() if self.international_details else None,
         }
+
+
+class Interned:
+    """ Schema type of strings that repeat across records (identifiers, symbols, statuses); one copy is kept. """
+
+
+class Amount:
+    """ Schema type of decimal amounts. The string from the api is kept and only converted to a Decimal when the
+    attribute is accessed. """
+
+
+def snake_case(json_key: str) -> str:
+    return re.sub(r'(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])', '_', json_key).lower()
+
+
+def _amount_property(slot):
+    def get(self):
+        value = getattr(self, slot)
+        return None if value is None else Decimal(value)
+    return property(get)
+
+
+def _decoder(schema_type):
+    if schema_type is Interned:
+        return lambda value: sys.intern(value) if type(value) is str else value
+    if isinstance(schema_type, list):
+        item_decoder = _decoder(schema_type[0])
+        return lambda values: [item_decoder(value) for value in values]
+    if isinstance(schema_type, RecordMeta):
+        return schema_type.from_json
+    return None
+
+
+def _encoder(schema_type):
+    if isinstance(schema_type, list):
+        item_encoder = _encoder(schema_type[0])
+        return None if item_encoder is None else (lambda values: [item_encoder(value) for value in values])
+    if isinstance(schema_type, RecordMeta):
+        return lambda value: value.to_json()
+    return None
+
+
+class RecordMeta(type):
+    """ Turns the `schema` of a record class ({json key: schema type}) into `__slots__`, one per json key. """
+
+    def __new__(mcs, name, bases, namespace):
+        schema = namespace.setdefault('schema', {})
+        slots = []
+        fields = []
+        for json_key, schema_type in schema.items():
+            attribute = snake_case(json_key)
+            slot = attribute
+            if schema_type is Amount:
+                slot = '_' + attribute
+                namespace[attribute] = _amount_property(slot)
+            slots.append(slot)
+            fields.append((json_key, slot, _decoder(schema_type), _encoder(schema_type)))
+        namespace['__slots__'] = tuple(slots)
+        namespace['_fields'] = tuple(fields)
+        namespace['_slots_by_json_key'] = {json_key: slot for json_key, slot, _, _ in fields}
+        return super().__new__(mcs, name, bases, namespace)
+
+
+class Record(metaclass=RecordMeta):
+    """ Compact, read-only representation of an api response object. Attributes are the snake case names of the
+    json keys; records can also be read like the response dicts (`record['identifier']`, `record.get(...)`), which
+    return the values exactly as they came from the api. """
+
+    @classmethod
+    def from_json(cls, data):
+        record = cls.__new__(cls)
+        for json_key, slot, decode, _ in cls._fields:
+            value = data.get(json_key)
+            object.__setattr__(record, slot, value if value is None or decode is None else decode(value))
+        return record
+
+    def to_json(self):
+        json = {}
+        for json_key, slot, _, encode in self._fields:
+            value = getattr(self, slot)
+            json[json_key] = value if value is None or encode is None else encode(value)
+        return json
+
+    def __getitem__(self, json_key):
+        return getattr(self, self._slots_by_json_key[json_key])
+
+    def get(self, json_key, default=None):
+        slot = self._slots_by_json_key.get(json_key)
+        return default if slot is None else getattr(self, slot)
+
+    def __contains__(self, json_key):
+        return json_key in self._slots_by_json_key
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is read-only')
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.to_json()})'
+
+
+class ApiKey(Record):
+    schema = {'apiKey': str, 'venueIdentifier': Interned, 'createdBy': str}
+
+
+class Balance(Record):
+    schema = {'amount': Amount, 'symbol': Interned}
+
+
+class CustodianSymbol(Record):
+    schema = {'custodianIdentifier': Interned, 'symbol': Interned}
+
+
+class SymbolInfo(Record):
+    schema = {
+        'symbol': Interned,
+        'strikeSymbol': Interned,
+        'custodianSymbols': [CustodianSymbol],
+        'type': Interned,
+        'description': str,
+        'precision': int,
+    }
+
+
+class CustomerInfo(Record):
+    schema = {
+        'allowedCustodians': [Interned],
+        'custodian': Interned,
+        'custodianAccountIdentifier': Interned,
+        'depositBalance': [Balance],
+        'identifier': Interned,
+        'name': str,
+        'FIXAccountIdentifier': Interned,
+        'status': Interned,
+        'domicile': Interned,
+    }
+
+
+class CustomerDeposit(Record):
+    schema = {
+        'amount': Amount,
+        'symbol': Interned,
+        'identifier': str,
+        'customerIdentifier': Interned,
+        'completedAt': str,
+    }
+
+
+class CustomerWithdrawal(Record):
+    schema = {
+        'identifier': str,
+        'customerIdentifier': Interned,
+        'completedAt': str,
+        'venueWithdrawalIdentifier': str,
+        'amounts': [Balance],
+        'status': Interned,
+    }
+
+
+class CustomerWithdrawalRequest(Record):
+    schema = {'identifier': str, 'requested': [Balance], 'requestedAt': str}
+
+
+class WebhookSettings(Record):
+    schema = {'url': str, 'notificationEmail': str, 'retries': int, 'retryInterval': int}
+
+
+class TradeInfo(Record):
+    schema = {
+        'baseSymbol': Interned,
+        'counter': Amount,
+        'counterpartyIdentifier': Interned,
+        'dealt': Amount,
+        'executionDate': str,
+        'identifier': Interned,
+        'liquidityIndicator': Interned,
+        'notes': str,
+        'rate': Amount,
+        'receivedDate': str,
+        'settlementNumber': Interned,
+        'side': Interned,
+        'source': Interned,
+        'status': Interned,
+        'strikeFee': Amount,
+        'strikeFeeSymbol': Interned,
+        'strikeTradeId': str,
+        'termSymbol': Interned,
+        'tradeHash': str,
+        'venueFee': Amount,
+        'venueFeeSymbol': Interned,
+    }
+
+
+class TradeList(Record):
+    schema = {'continuationToken': str, 'trades': [TradeInfo]}
+
+
+class SettlementFlow(Record):
+    schema = {
+        'counterpartyIdentifier': Interned,
+        'counterpartyCustodianIdentifier': Interned,
+        'symbol': Interned,
+        'strikeSymbol': Interned,
+        'amount': Amount,
+    }
+
+
+class SettlementVenueFunding(Record):
+    schema = {'status': Interned, 'fundingRequired': [Balance]}
+
+
+class SettlementCustomerFunding(Record):
+    schema = {'status': Interned, 'customerIdentifier': Interned, 'fundingRequired': [Balance]}
+
+
+class SettlementPlan(Record):
+    schema = {
+        'identifier': Interned,
+        'settlementHash': str,
+        'custodian': Interned,
+        'flowHash': str,
+        'venueFunding': SettlementVenueFunding,
+        'customerFunding': [SettlementCustomerFunding],
+        'inflows': [SettlementFlow],
+        'outflows': [SettlementFlow],
+        'tradeIdentifiers': [Interned],
+    }
+
+
+class SettlementPlanShort(Record):
+    schema = {'identifier': Interned, 'settlementHash': str}
+
+
+class Settlement(Record):
+    schema = {
+        'identifier': Interned,
+        'status': Interned,
+        'inflows': [SettlementFlow],
+        'outflows': [SettlementFlow],
+        'flowHash': str,
+        'settlementHash': str,
+        'tradeIdentifiers': [Interned],
+        'startedAt': str,
+        'completedAt': str,
+        'error': str,
+    }
+
+
+class SettlementShort(Record):
+    schema = {
+        'identifier': Interned,
+        'settlementHash': str,
+        'status': Interned,
+        'startedAt': str,
+        'completedAt': str,
+        'error': str,
+    }
+
+
+class Webhook(Record):
+    schema = {
+        'createdAt': str,
+        'type': Interned,
+        'sequenceNumber': int,
+        'customer': CustomerInfo,
+        'withdrawalRequest': CustomerWithdrawalRequest,
+        'deposit': CustomerDeposit,
+        'withdrawal': CustomerWithdrawal,
+        'settlementPlan': SettlementPlan,
+        'settlement': Settlement,
+    }
+
+
+class WebhooksList(Record):
+    schema = {'webhooks': [Webhook], 'nextWebhookSequenceNumber': int}
+
+
+class Custodian(Record):
+    schema = {'identifier': Interned, 'status': Interned, 'accountIdentifier': Interned, 'balance': [Balance]}
+
+
+class SymbolWireInstructions(Record):
+    schema = {'fields': list, 'note': str}
+
+
+class CustodianDepositInstructions(Record):
+    schema = {
+        'symbol': Interned,
+        'walletAddress': str,
+        'destinationTag': str,
+        'signetAddress': str,
+        'wireInstructions': SymbolWireInstructions,
+    }
+
+
+class CustodianDeposit(Record):
+    schema = {
+        'amount': Amount,
+        'symbol': Interned,
+        'identifier': str,
+        'status': Interned,
+        'createdAt': str,
+        'updatedAt': str,
+        'error': str,
+        'source': Interned,
+    }
+
+
+class CustodianWithdrawal(Record):
+    schema = {
+        'identifier': str,
+        'completedAt': str,
+        'venueWithdrawalIdentifier': str,
+        'amount': Amount,
+        'symbol': Interned,
+        'status': Interned,
+    }
+
+
+class WithdrawalDestination(Record):
+    schema = {
+        'identifier': Interned,
+        'name': str,
+        'destinationType': Interned,
+        'symbol': Interned,
+        'address': str,
+        'destinationTag': str,
+        'counterpartyIdentifier': Interned,
+        'status': Interned,
+        'createdAt': str,
+        'updatedAt': str,
+    }
@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, only needed by `FileNonceAllocator`
+    fcntl = None
+
+
+class NonceAllocator:
+    """ Hands out nonces for signing requests. Implementations must never return the same nonce twice, even when
+    called from many threads at once. """
+
+    def next(self) -> int:
+        return self.reserve(1)
+
+    def reserve(self, count: int) -> int:
+        """ Reserves `count` consecutive nonces and returns the first one. """
+        raise NotImplementedError
+
+    def advance_to(self, nonce: int) -> bool:
+        """ Makes sure no nonce lower than `nonce` is handed out from now on. Never moves the counter backwards.
+        Returns whether the counter was moved. """
+        raise NotImplementedError
+
+    def peek(self) -> int:
+        """ Returns the nonce that will be handed out next. """
+        raise NotImplementedError
+
+
+class AtomicNonceAllocator(NonceAllocator):
+    """ In-process counter shared by all threads using the client. """
+
+    def __init__(self, start: int = 1):
+        self._next = start
+        self._lock = threading.Lock()
+
+    def reserve(self, count: int) -> int:
+        with self._lock:
+            nonce = self._next
+            self._next += count
+            return nonce
+
+    def advance_to(self, nonce: int) -> bool:
+        with self._lock:
+            if nonce <= self._next:
+                return False
+            self._next = nonce
+            return True
+
+    def peek(self) -> int:
+        return self._next
+
+
+class BlockNonceAllocator(NonceAllocator):
+    """ Every thread reserves a block of `block_size` nonces from `parent` and then hands them out without any
+    synchronization. Nonces are unique but only increase per thread, so this should only be used if the api key
+    accepts nonces that arrive out of order across threads. """
+
+    def __init__(self, parent: NonceAllocator, block_size: int = 100):
+        self.parent = parent
+        self.block_size = block_size
+        self._local = threading.local()
+
+    def reserve(self, count: int) -> int:
+        local = self._local
+        nonce = getattr(local, 'next', 0)
+        if nonce + count > getattr(local, 'end', 0):
+            nonce = self.parent.reserve(max(count, self.block_size))
+            local.end = nonce + max(count, self.block_size)
+        local.next = nonce + count
+        return nonce
+
+    def advance_to(self, nonce: int) -> bool:
+        # drop the current block of this thread, other threads drop theirs once they run into the same error
+        self._local.end = 0
+        return self.parent.advance_to(nonce)
+
+    def peek(self) -> int:
+        return self.parent.peek()
+
+
+class SharedNonceAllocator(NonceAllocator):
+    """ Counter in shared memory, for worker processes forked from a parent that created the allocator. """
+
+    def __init__(self, start: int = 1):
+        self._value = multiprocessing.Value('q', start)
+
+    def reserve(self, count: int) -> int:
+        with self._value.get_lock():
+            nonce = self._value.value
+            self._value.value += count
+            return nonce
+
+    def advance_to(self, nonce: int) -> bool:
+        with self._value.get_lock():
+            if nonce <= self._value.value:
+                return False
+            self._value.value = nonce
+            return True
+
+    def peek(self) -> int:
+        return self._value.value
+
+
+class FileNonceAllocator(NonceAllocator):
+    """ Counter stored in a file and protected by an exclusive `flock`, so unrelated processes (e.g. the workers of
+    a gateway) can share one api key. Each reservation takes the file lock, so combine this with a
+    `BlockNonceAllocator` to amortize the cost when nonces do not need to be strictly increasing. """
+
+    def __init__(self, path: str, start: int = 1):
+        if fcntl is None:
+            raise RuntimeError('FileNonceAllocator needs fcntl.flock, which is not available on this platform')
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._update(lambda current: (max(current, start), None))
+
+    def _update(self, update):
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                content = os.read(self._fd, 32).strip()
+                current = int(content) if content else 0
+                new, result = update(current)
+                if new != current:
+                    os.lseek(self._fd, 0, os.SEEK_SET)
+                    os.ftruncate(self._fd, 0)
+                    os.write(self._fd, str(new).encode())
+                return result
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def reserve(self, count: int) -> int:
+        return self._update(lambda current: (current + count, current))
+
+    def advance_to(self, nonce: int) -> bool:
+        return self._update(lambda current: (nonce, True) if nonce > current else (current, False))
+
+    def peek(self) -> int:
+        return self._update(lambda current: (current, current))
+
+    def close(self):
+        os.close(self._fd)
@@ -0,0 +1,196 @@
+import asyncio
+import threading
+from time import monotonic, sleep
+from typing import Any, Dict, Optional, Tuple
+
+# (requests per second, burst) of each endpoint class, see `endpoint_class`
+DEFAULT_RATES = {
+    'trades': (50.0, 100),
+    'settlement': (10.0, 20),
+    'reporting': (20.0, 40),
+    'default': (10.0, 20),
+}
+
+
+def endpoint_class(request_type: str, route_in: str) -> str:
+    """ The class of an endpoint for rate limiting: trades, settlement (plans), reporting (all other reads) or
+    default (all other writes). """
+    if route_in.startswith('trades'):
+        return 'trades'
+    if route_in.startswith('settlement'):
+        return 'settlement'
+    return 'reporting' if request_type == 'GET' else 'default'
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """ Takes a token and returns how long to wait until it is actually available. Tokens may go negative, so
+        waiting callers are served in the order they arrived. """
+        with self.lock:
+            now = monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    """ Token buckets per api key and per (api key, endpoint class). A request waits until both its key and its
+    endpoint class have a token. One limiter can be shared by several clients. """
+
+    def __init__(
+            self,
+            rates: Optional[Dict[str, Tuple[float, float]]] = None,
+            key_rate: Tuple[float, float] = (60.0, 120),
+    ):
+        self.rates = {**DEFAULT_RATES, **(rates or {})}
+        self.key_rate = key_rate
+        self.buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'throttled': 0, 'waited_seconds': 0.0}
+
+    def bucket(self, key: str, endpoint: Optional[str]) -> TokenBucket:
+        bucket = self.buckets.get((key, endpoint))
+        if bucket is None:
+            with self.lock:
+                bucket = self.buckets.get((key, endpoint))
+                if bucket is None:
+                    bucket = self.buckets[key, endpoint] = TokenBucket(
+                        *(self.key_rate if endpoint is None else self.rates.get(endpoint, self.rates['default'])))
+        return bucket
+
+    def reserve(self, key: str, endpoint: str) -> float:
+        delay = max(self.bucket(key, None).reserve(), self.bucket(key, endpoint).reserve())
+        with self.lock:
+            self.stats['requests'] += 1
+            if delay:
+                self.stats['throttled'] += 1
+                self.stats['waited_seconds'] += delay
+        return delay
+
+    def acquire(self, key: str, endpoint: str):
+        delay = self.reserve(key, endpoint)
+        if delay:
+            sleep(delay)
+
+    async def acquire_async(self, key: str, endpoint: str):
+        delay = self.reserve(key, endpoint)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'tokens': {f'{key}:{endpoint or "*"}': bucket.tokens for (key, endpoint), bucket in self.buckets.items()},
+        }
+
+
+class ConcurrencyLimiter:
+    """ Limits the number of requests in flight with additive increase / multiplicative decrease: each request that
+    completes in time raises the limit by 1 / limit (so by about one per round trip of a full window), while a 429,
+    a 5xx, a transport error or a latency above `latency_tolerance` times the lowest latency seen cuts it by
+    `decrease`, at most once per round trip. Latencies are compared per endpoint class (see `endpoint_class`), so
+    slow reporting endpoints are not measured against fast trade submissions. Works for threads and asyncio tasks
+    alike. """
+
+    def __init__(
+            self,
+            initial_limit: float = 8,
+            min_limit: float = 1,
+            max_limit: float = 128,
+            decrease: float = 0.5,
+            latency_tolerance: float = 3.0,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        # by endpoint class
+        self.min_latency: Dict[str, float] = {}
+        self.smoothed_latency: Dict[str, float] = {}
+        self.last_decrease = 0.0
+        self.stats = {'increases': 0, 'decreases': 0, 'waits': 0}
+        self.condition = threading.Condition()
+        # futures of asyncio tasks waiting for a slot, with their loops
+        self.async_waiters = []
+
+    def try_acquire(self, count_wait: bool = True) -> bool:
+        with self.condition:
+            if self.in_flight < max(1, int(self.limit)):
+                self.in_flight += 1
+                return True
+            if count_wait:
+                self.stats['waits'] += 1
+            return False
+
+    def acquire(self):
+        with self.condition:
+            if self.in_flight >= max(1, int(self.limit)):
+                self.stats['waits'] += 1
+                while self.in_flight >= max(1, int(self.limit)):
+                    self.condition.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        if self.try_acquire():
+            return
+        with self.condition:
+            self.stats['waits'] += 1
+        while not self.try_acquire(count_wait=False):
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            with self.condition:
+                self.async_waiters.append((loop, future))
+                # a slot may have been released in the meantime
+                available = self.in_flight < max(1, int(self.limit))
+            if not available:
+                await future
+
+    def release(self, latency: Optional[float], overloaded: bool, endpoint: str = 'default'):
+        """ Frees the slot of a request to `endpoint` (its class) that took `latency` seconds; `overloaded` if the
+        api pushed back. A request that was never sent (latency None) just frees its slot. """
+        with self.condition:
+            self.in_flight -= 1
+            if latency is not None:
+                self.adjust(latency, overloaded, endpoint)
+            self.condition.notify_all()
+            waiters, self.async_waiters = self.async_waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(lambda f=future: f.done() or f.set_result(None))
+
+    def adjust(self, latency: float, overloaded: bool, endpoint: str):
+        # called with the condition held
+        now = monotonic()
+        smoothed_latency = self.smoothed_latency.get(endpoint)
+        if not overloaded:
+            min_latency = self.min_latency[endpoint] = min(self.min_latency.get(endpoint, latency), latency)
+            smoothed_latency = self.smoothed_latency[endpoint] = latency if smoothed_latency is None \
+                else 0.9 * smoothed_latency + 0.1 * latency
+            overloaded = smoothed_latency > self.latency_tolerance * max(min_latency, 0.001)
+        if overloaded:
+            # one decrease per round trip, requests that were already in flight report the same congestion
+            if now - self.last_decrease > (smoothed_latency or latency):
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+                self.last_decrease = now
+                self.stats['decreases'] += 1
+        elif self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.stats['increases'] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'limit': self.limit,
+            'in_flight': self.in_flight,
+            'min_latency': dict(self.min_latency),
+            'smoothed_latency': dict(self.smoothed_latency),
+        }
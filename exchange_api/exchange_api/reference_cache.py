@@ -0,0 +1,106 @@
+from collections import OrderedDict
+import json
+import os
+import tempfile
+import threading
+from time import monotonic
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class ReferenceCache:
+    """ TTL and LRU cache for slowly changing reference data (symbols, custodians, the api key, deposit
+    instructions). Keys are tuples whose first element is the resource name, e.g. `('custodians', custodian_id)`,
+    so all entries of a resource can be invalidated at once:
+
+        cache = ReferenceCache(ttl=600)
+        client = Client(..., reference_cache=cache)
+        client.list_symbols()                  # miss, fetched from the api
+        client.list_symbols()                  # hit
+        cache.invalidate('symbols')
+
+    Any object with the same `get_or_load` and `invalidate` methods can be passed to the client instead. Cached
+    values are shared, so they should not be modified. """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (expiry, value), least recently used first
+        self.entries: 'OrderedDict[Tuple, Tuple[float, Any]]' = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key: Tuple[Hashable, ...]) -> Tuple[bool, Any]:
+        """ Returns (found, value). """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expiry, value = entry
+                if expiry > monotonic():
+                    self.entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return True, value
+                del self.entries[key]
+                self.stats['expirations'] += 1
+            self.stats['misses'] += 1
+            return False, None
+
+    def set(self, key: Tuple[Hashable, ...], value, ttl: Optional[float] = None):
+        with self.lock:
+            self.entries[key] = (monotonic() + (self.ttl if ttl is None else ttl), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def get_or_load(self, key: Tuple[Hashable, ...], load: Callable[[], Any], ttl: Optional[float] = None):
+        found, value = self.get(key)
+        if not found:
+            # loaded outside of the lock, concurrent misses of the same key may both load it
+            value = load()
+            self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, *key: Hashable):
+        """ Removes all entries whose key starts with `key`, e.g. `invalidate('custodians')` or
+        `invalidate('custodians', custodian_id)`; everything if `key` is empty. """
+        with self.lock:
+            for cached_key in [k for k in self.entries if k[:len(key)] == key]:
+                del self.entries[cached_key]
+
+
+class VenueIdCache:
+    """ Persists the venue id of each (url, api key), so clients created without a `venue_id` do not have to look
+    it up with `get_api_key` on every start:
+
+        client = Client(..., venue_id_cache=VenueIdCache(os.path.expanduser('~/.strike-venue-ids.json')))
+
+    Several processes may share the file; the last writer wins, which is fine as a key's venue never changes. """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load_all(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def load(self, url: str, key: str) -> Optional[str]:
+        return self.load_all().get(f'{url}|{key}')
+
+    def save(self, url: str, key: str, venue_id: str):
+        venue_ids = {**self.load_all(), f'{url}|{key}': venue_id}
+        # written to a temporary file of its own and renamed, so readers never see a partially written file and
+        # concurrent saves, from other processes or threads, never write to the same one
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(venue_ids, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
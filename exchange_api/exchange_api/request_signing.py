@@ -0,0 +1,43 @@
+import hashlib
+from time import gmtime, strftime, time
+from typing import Optional
+
+
+class RequestSigner:
+    """ Computes the HMAC digest of requests. The constant `key|secret|` prefix is hashed once and every digest
+    continues from a copy of that hash, and the timestamp string is only formatted once per second. """
+
+    def __init__(self, key: str, secret: str):
+        self.key = key
+        self._prefix_hash = hashlib.sha256(f'{key}|{secret}|'.encode())
+        # (second, formatted timestamp) is replaced as a whole, so concurrent readers always see a matching pair
+        self._timestamp = (None, None)
+
+    def timestamp(self) -> str:
+        now = int(time())
+        second, timestamp = self._timestamp
+        if second != now:
+            timestamp = strftime('%Y-%m-%dT%H:%M:%SZ', gmtime(now))
+            self._timestamp = (now, timestamp)
+        return timestamp
+
+    @staticmethod
+    def params_string(params) -> str:
+        return '' if not params else '&'.join(f'{k}={v}' for k, v in params.items() if v is not None)
+
+    def digest(
+            self,
+            timestamp: str,
+            nonce: int,
+            request_type: str,
+            route: str,
+            params_str: str,
+            body: Optional[bytes],
+            idempotency_id: Optional[str],
+    ) -> str:
+        digest = self._prefix_hash.copy()
+        digest.update(f'{timestamp}|{nonce}|{request_type}|{route}|{params_str}|'.encode())
+        if body:
+            digest.update(body)
+        digest.update(f'|{idempotency_id or ""}'.encode())
+        return digest.hexdigest()
@@ -0,0 +1,146 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import random
+import threading
+from time import monotonic
+from typing import Optional, Tuple, Type
+
+from .exceptions import UnexpectedStatusCode
+
+
+class RetryBudget:
+    """ Limits retries to a fraction of the requests sent, so a struggling api is not hit with a growing wave of
+    retries. Every request deposits `ratio` tokens and every retry withdraws one; on top of that
+    `min_retries_per_second` tokens are added over time, so a client sending few requests can still retry. At most
+    `max_tokens` tokens are kept. """
+
+    def __init__(self, ratio: float = 0.1, min_retries_per_second: float = 1.0, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.updated_at = monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, tokens: float):
+        now = monotonic()
+        self.tokens = min(
+            self.max_tokens, self.tokens + tokens + (now - self.updated_at) * self.min_retries_per_second)
+        self.updated_at = now
+
+    def deposit(self):
+        with self.lock:
+            self._refill(self.ratio)
+
+    def withdraw(self) -> bool:
+        with self.lock:
+            self._refill(0)
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class RetryPolicy:
+    """ Which failures are retried and how long to wait in between: responses with one of `retry_statuses`
+    and the transport errors of the client (connection errors and timeouts) are retried up to `max_attempts` times
+    in total, with exponential backoff and jitter.
+
+    Requests other than GETs keep their idempotency id across retries, so a retry of a request that was already
+    processed is not applied again. Only the nonce and timestamp are signed again.
+
+    A `Retry-After` header (seconds or an HTTP date) on a retried response is waited for if it is longer than the
+    backoff, up to `max_retry_after` seconds; a longer one fails the request instead. """
+
+    def __init__(
+            self,
+            max_attempts: int = 4,
+            initial_interval: float = 0.2,
+            max_interval: float = 5.0,
+            multiplier: float = 2.0,
+            jitter: float = 1.0,
+            retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504),
+            budget_ratio: float = 0.1,
+            min_retries_per_second: float = 1.0,
+            max_retry_after: float = 30.0,
+    ):
+        self.max_attempts = max_attempts
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.retry_statuses = retry_statuses
+        self.budget_ratio = budget_ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.max_retry_after = max_retry_after
+
+    def budget(self) -> RetryBudget:
+        return RetryBudget(self.budget_ratio, self.min_retries_per_second)
+
+    def is_retryable(self, e: Exception, transient_errors: Tuple[Type[Exception], ...]) -> bool:
+        if isinstance(e, UnexpectedStatusCode):
+            return e.status_code in self.retry_statuses
+        return isinstance(e, transient_errors)
+
+    def delay(self, retry: int) -> float:
+        """ The delay before retry number `retry` (starting at 0): up to `jitter` of the exponential interval is
+        randomized away ("full jitter" with the default of 1.0). """
+        interval = min(self.max_interval, self.initial_interval * self.multiplier ** retry)
+        return interval * (1 - self.jitter * random.random())
+
+    @staticmethod
+    def retry_after(e: Exception) -> Optional[float]:
+        """ The seconds to wait asked for by the `Retry-After` header of the response `e` is about, if any. """
+        value = getattr(e, 'retry_after', None)
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+
+# never retries, e.g. `Client(..., retry_policy=NO_RETRIES)`
+NO_RETRIES = RetryPolicy(max_attempts=1)
+
+
+class RetryState:
+    """ Retries of one logical request. """
+
+    def __init__(self, client):
+        self.client = client
+        self.retries = 0
+        self.nonce_retries = 0
+        client.retry_budget.deposit()
+
+    def next_delay(self, e: Exception) -> Optional[float]:
+        """ Returns how long to wait before resending after `e`, or None if the request should fail with `e`. A
+        "nonce too low" rejection is resent right away and does not count as a retry. """
+        client = self.client
+        if isinstance(e, UnexpectedStatusCode) and client.resync_nonce(e, self.nonce_retries):
+            self.nonce_retries += 1
+            return 0.0
+        policy = client.retry_policy
+        if not policy.is_retryable(e, client.transient_errors):
+            return None
+        retry_after = policy.retry_after(e)
+        with client._retry_stats_lock:
+            if retry_after is not None and retry_after > policy.max_retry_after:
+                client.retry_stats['exhausted'] += 1
+                return None
+            if self.retries + 1 >= policy.max_attempts:
+                client.retry_stats['exhausted'] += 1
+                return None
+            if not client.retry_budget.withdraw():
+                client.retry_stats['budget_exhausted'] += 1
+                return None
+            client.retry_stats['retries'] += 1
+        delay = policy.delay(self.retries)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        self.retries += 1
+        return delay
@@ -0,0 +1,148 @@
+import codecs
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JsonEncoder = Callable[[Any], bytes]
+
+
+def standard_json_encoder(data) -> bytes:
+    return json.dumps(data).encode()
+
+
+def orjson_encoder(data) -> bytes:
+    return orjson.dumps(data)
+
+
+# request bodies are signed exactly as they are sent, so any encoder producing valid JSON can be used
+default_json_encoder: JsonEncoder = orjson_encoder if orjson is not None else standard_json_encoder
+
+
+JsonDecoder = Callable[[bytes], Any]
+
+
+def orjson_decoder(content: bytes):
+    return orjson.loads(content)
+
+
+default_json_decoder: JsonDecoder = orjson_decoder if orjson is not None else json.loads
+
+# the keys of list responses that wrap their records in an object, e.g. {"trades": [...], "continuationToken": ...}
+RECORD_ARRAY_KEYS = ('trades', 'webhooks')
+
+# for each of `RECORD_ARRAY_KEYS`, the key of the response pointing to the next page and the query parameter to
+# pass it back in; no value means the last page was reached
+NEXT_PAGE_KEYS = {
+    'trades': ('continuationToken', 'continuationToken'),
+    'webhooks': ('nextWebhookSequenceNumber', 'fromSequenceNumber'),
+}
+
+
+def project_fields(content, fields: Iterable[str]):
+    """ Keeps only `fields` of every record in `content`: a single record, a list of records or a response with one
+    of `RECORD_ARRAY_KEYS` (whose other keys, e.g. the continuation token, are kept). """
+    fields = tuple(fields)
+
+    def project(record):
+        return {field: record[field] for field in fields if field in record}
+
+    if isinstance(content, list):
+        return [project(record) for record in content]
+    if isinstance(content, dict):
+        array_key = next((key for key in RECORD_ARRAY_KEYS if isinstance(content.get(key), list)), None)
+        if array_key is None:
+            return project(content)
+        return {**content, array_key: [project(record) for record in content[array_key]]}
+    return content
+
+
+class _JsonStream:
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.decoder = json.JSONDecoder()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def read_more(self):
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.eof = True
+            decoded = self.utf8.decode(b'', final=True)
+        else:
+            decoded = self.utf8.decode(chunk)
+        # drop everything that was already consumed
+        self.text = self.text[self.pos:] + decoded
+        self.pos = 0
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in ' \t\n\r':
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if self.eof:
+                raise ValueError('Unexpected end of JSON document')
+            self.read_more()
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise ValueError(f'Expected {character!r} at {self.text[self.pos:self.pos + 20]!r}')
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.text, self.pos)
+                # a number at the end of the buffer may continue in the next chunk
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.read_more()
+
+    def array_items(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ']':
+                self.pos += 1
+                return
+            self.expect(',')
+
+
+def iter_json_array(
+        chunks: Iterable[bytes], key: Optional[str] = None, rest: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+    """ Incrementally decodes a JSON document arriving in `chunks` and yields the items of the array under `key`
+    of the top-level object (or of the top-level array if `key` is None) one at a time, without holding the whole
+    document in memory. With `rest`, the other keys of the top-level object (e.g. the continuation token) are
+    decoded into it, which reads the document to its end. """
+    stream = _JsonStream(chunks)
+    if key is None:
+        yield from stream.array_items()
+        return
+    stream.expect('{')
+    while stream.peek() != '}':
+        name = stream.value()
+        stream.expect(':')
+        if name == key:
+            yield from stream.array_items()
+            if rest is None:
+                return
+        elif rest is not None:
+            rest[name] = stream.value()
+        else:
+            stream.value()
+        if stream.peek() == ',':
+            stream.pos += 1
@@ -0,0 +1,114 @@
+import hashlib
+import importlib.util
+import os
+from base64 import b64encode
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Type
+
+# the backends are only imported once a signer is created, which keeps them out of the client's start up
+HAS_CRYPTOGRAPHY = importlib.util.find_spec('cryptography') is not None
+
+
+class SettlementSigner:
+    """ Signs settlement flow hashes with the venue's private key. `sign` returns the DER encoded ECDSA signature
+    over the SHA-256 of the message, as produced by `ecdsa.util.sigencode_der`. """
+
+    def __init__(self, pem: str):
+        self.pem = pem
+
+    def sign(self, message: bytes) -> bytes:
+        raise NotImplementedError
+
+    def sign_b64(self, to_sign: str) -> str:
+        return b64encode(self.sign(to_sign.encode())).decode()
+
+
+class EcdsaSigner(SettlementSigner):
+    """ Pure python signer. The multiplication tables of the curve's generator are built when the signer is
+    created rather than by the first settlement. """
+
+    def __init__(self, pem: str):
+        from ecdsa import SigningKey, util
+        super().__init__(pem)
+        self.signing_key = SigningKey.from_pem(pem, hashlib.sha256)
+        self.sigencode = util.sigencode_der
+        self.sign(b'')
+
+    def sign(self, message: bytes) -> bytes:
+        return self.signing_key.sign(message, hashfunc=hashlib.sha256, sigencode=self.sigencode)
+
+
+class CryptographySigner(SettlementSigner):
+    """ Signer backed by OpenSSL through the `cryptography` package, a couple of orders of magnitude faster than
+    `EcdsaSigner`. """
+
+    def __init__(self, pem: str):
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+        super().__init__(pem)
+        self.private_key = serialization.load_pem_private_key(pem.encode(), password=None)
+        self.algorithm = ec.ECDSA(hashes.SHA256())
+
+    def sign(self, message: bytes) -> bytes:
+        return self.private_key.sign(message, self.algorithm)
+
+
+def default_signer(pem: str) -> SettlementSigner:
+    return CryptographySigner(pem) if HAS_CRYPTOGRAPHY else EcdsaSigner(pem)
+
+
+def load_signer(signing_key_file: str, signer_type: Optional[Type[SettlementSigner]] = None) -> SettlementSigner:
+    with open(signing_key_file) as f:
+        pem = f.read()
+    return default_signer(pem) if signer_type is None else signer_type(pem)
+
+
+_worker_signer: Optional[SettlementSigner] = None
+
+
+def _init_worker(signer_type: Type[SettlementSigner], pem: str):
+    global _worker_signer
+    _worker_signer = signer_type(pem)
+
+
+def _sign_chunk(messages: List[str]) -> List[str]:
+    return [_worker_signer.sign_b64(message) for message in messages]
+
+
+class SigningPool:
+    """ Signs many flow hashes at once on a pool of processes, each holding its own copy of the signer:
+
+        with SigningPool(client.settlement_signer) as pool:
+            signatures = pool.sign_many([plan['flowHash'] for plan in plans])
+
+    Batches smaller than `min_batch_size` are signed in the calling process, where sending them to the pool would
+    cost more than it saves. """
+
+    def __init__(self, signer: SettlementSigner, processes: Optional[int] = None, min_batch_size: int = 64):
+        self.signer = signer
+        self.processes = processes or os.cpu_count() or 1
+        self.min_batch_size = min_batch_size
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def sign_many(self, to_sign: Iterable[str]) -> List[str]:
+        """ The base64 encoded signatures of `to_sign`, in order. """
+        to_sign = list(to_sign)
+        if len(to_sign) < self.min_batch_size or self.processes == 1:
+            return [self.signer.sign_b64(message) for message in to_sign]
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                self.processes, initializer=_init_worker, initargs=(type(self.signer), self.signer.pem))
+        chunk_size = -(-len(to_sign) // (self.processes * 4))
+        chunks = [to_sign[i:i + chunk_size] for i in range(0, len(to_sign), chunk_size)]
+        return [signature for chunk in self.executor.map(_sign_chunk, chunks) for signature in chunk]
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
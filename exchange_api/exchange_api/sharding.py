@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# the timestamp each of the list endpoints with from/to filters is ordered by
+SHARDABLE_ENDPOINTS = {
+    'list_trades': 'executionDate',
+    'list_settlements': 'startedAt',
+    'list_customer_deposits': 'completedAt',
+    'list_customer_withdrawals': 'completedAt',
+    'list_custodian_deposits': 'createdAt',
+    'list_custodian_withdrawals': 'completedAt',
+}
+
+
+def split_time_range(from_dt: datetime, to_dt: datetime, shards: int) -> List[Tuple[datetime, datetime]]:
+    """ Splits [from_dt, to_dt) into `shards` adjacent, equally sized windows. """
+    step = (to_dt - from_dt) / shards
+    bounds = [from_dt + step * i for i in range(shards)] + [to_dt]
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def fetch_sharded(
+        fetch: Callable[[datetime, datetime], Iterable[Dict[str, Any]]],
+        from_dt: datetime,
+        to_dt: datetime,
+        shards: int = 8,
+        max_workers: int = 4,
+        key: str = 'identifier',
+        time_field: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """ Calls `fetch(shard_from, shard_to)` for every shard of [from_dt, to_dt) on a pool of `max_workers` threads and
+    merges the results. Records returned by more than one shard are only kept once (the last version wins), and the
+    result is ordered by `time_field` when given. Timestamps from the api are UTC ISO-8601 strings, so they are
+    ordered as strings; records without a timestamp go last. """
+    records = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for shard_records in executor.map(lambda shard: list(fetch(*shard)), split_time_range(from_dt, to_dt, shards)):
+            for record in shard_records:
+                records[record[key]] = record
+    merged = list(records.values())
+    if time_field:
+        merged.sort(key=lambda record: (record.get(time_field) is None, record.get(time_field) or ''))
+    return merged
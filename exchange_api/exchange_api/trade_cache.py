@@ -0,0 +1,219 @@
+from datetime import datetime, timedelta, timezone
+import json
+import sqlite3
+import threading
+from time import time
+from typing import Any, Dict, List, Optional, Union
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS trades (
+    identifier TEXT PRIMARY KEY,
+    counterparty_identifier TEXT,
+    settlement_number TEXT,
+    execution_date INTEGER,
+    received_date INTEGER,
+    trade TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trades_counterparty_identifier ON trades (counterparty_identifier, execution_date);
+CREATE INDEX IF NOT EXISTS trades_settlement_number ON trades (settlement_number);
+CREATE INDEX IF NOT EXISTS trades_execution_date ON trades (execution_date);
+CREATE INDEX IF NOT EXISTS trades_received_date ON trades (received_date);
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    value
+);
+'''
+
+
+def to_milliseconds(date: Optional[Union[datetime, str]]) -> Optional[int]:
+    if date is None:
+        return None
+    if type(date) is str:
+        date = datetime.strptime(''.join(date.rsplit(':', 1)), '%Y-%m-%dT%H:%M:%S.%f%z')
+    return round(date.timestamp() * 1000)
+
+
+def from_milliseconds(milliseconds: int) -> datetime:
+    return datetime.fromtimestamp(milliseconds / 1000, timezone.utc)
+
+
+class TradeCache:
+    """ Local SQLite copy of the trade history, so reconciliation runs only download what changed:
+
+        cache = TradeCache('trades.db')
+        cache.sync(client)
+        trades = cache.list_trades(from_dt=start, to_dt=end, counterparty_id='123456')
+
+    The `from` filter of `list_trades` is on the execution date, and the api has no filter for trades received or
+    updated since a point in time. So there are two kinds of syncs:
+
+    - an incremental sync lists the trades executed since the latest execution date in the cache (the high-water
+      mark) minus `overlap`. It picks up new trades, and trades received up to `overlap` after their execution.
+    - a refresh lists the whole synced history again, which also picks up trades received later than that and
+      updates (e.g. status changes) of older trades. A sync refreshes when the last refresh is older than
+      `refresh_interval` seconds, or with `sync(client, full=True)`.
+
+    Trades are stored by identifier, so fetching them again just replaces the stored copy. Only a refresh makes the
+    cache complete, so `is_fresh` counts from the start of the last refresh.
+
+    Pass the cache to `Client(..., trade_cache=cache)` to serve `get_trade` and `list_trades` locally while the last
+    refresh is more recent than `trade_cache_max_age` seconds. """
+
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        # the connection is shared by all threads of the client and only used under the lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _state(self, name: str):
+        row = self.connection.execute('SELECT value FROM sync_state WHERE name = ?', (name,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_state(self, name: str, value):
+        self.connection.execute('INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)', (name, value))
+
+    @property
+    def high_water_mark(self) -> Optional[datetime]:
+        """ The latest execution date of the cached trades. """
+        with self.lock:
+            milliseconds = self.connection.execute('SELECT MAX(execution_date) FROM trades').fetchone()[0]
+        return None if milliseconds is None else from_milliseconds(milliseconds)
+
+    @property
+    def last_sync(self) -> Optional[float]:
+        with self.lock:
+            return self._state('last_sync')
+
+    @property
+    def last_refresh(self) -> Optional[float]:
+        with self.lock:
+            return self._state('last_refresh')
+
+    def is_fresh(self, max_age: float) -> bool:
+        """ Whether the cache was complete, including late and updated trades, at most `max_age` seconds ago. """
+        last_refresh = self.last_refresh
+        return last_refresh is not None and time() - last_refresh <= max_age
+
+    def covers(self, from_dt: Optional[Union[datetime, str]]) -> bool:
+        """ Whether every trade executed on or after `from_dt` (None for the whole history) has been synced. """
+        with self.lock:
+            synced_from = self._state('synced_from')
+            full = self._state('full')
+        if full:
+            return True
+        return synced_from is not None and from_dt is not None and to_milliseconds(from_dt) >= synced_from
+
+    def store(self, trades) -> int:
+        rows = []
+        for trade in trades:
+            if not isinstance(trade, dict):
+                trade = trade.to_json()
+            rows.append((
+                trade['identifier'],
+                trade.get('counterpartyIdentifier'),
+                trade.get('settlementNumber'),
+                to_milliseconds(trade.get('executionDate')),
+                to_milliseconds(trade.get('receivedDate')),
+                json.dumps(trade)))
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO trades (identifier, counterparty_identifier, settlement_number, '
+                'execution_date, received_date, trade) VALUES (?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def sync(
+            self,
+            client,
+            from_dt: Optional[datetime] = None,
+            overlap: timedelta = timedelta(days=1),
+            full: bool = False,
+            refresh_interval: Optional[float] = 24 * 60 * 60,
+            batch_size: int = 1000,
+    ) -> int:
+        """ Fetches the trades executed since the high-water mark minus `overlap`, or refreshes the whole synced
+        history (on the first sync since `from_dt`, the whole history if None; with `full` always the whole
+        history) if the last refresh is older than `refresh_interval` seconds. Returns the number of trades
+        stored. """
+        with self.lock:
+            synced_from = self._state('synced_from')
+            synced_full = self._state('full')
+            last_refresh = self._state('last_refresh')
+        started = time()
+        refresh = full or last_refresh is None \
+            or (refresh_interval is not None and started - last_refresh >= refresh_interval)
+        high_water_mark = None if refresh else self.high_water_mark
+        if high_water_mark is not None:
+            sync_from_dt = high_water_mark - overlap
+        elif full or synced_full:
+            sync_from_dt = None
+        elif synced_from is not None:
+            sync_from_dt = from_milliseconds(synced_from) if from_dt is None else min(
+                from_milliseconds(synced_from), from_dt)
+        else:
+            sync_from_dt = from_dt
+
+        count = 0
+        batch = []
+        for trade in client.iter_trades(from_dt=sync_from_dt, cached=False):
+            batch.append(trade)
+            if len(batch) >= batch_size:
+                count += self.store(batch)
+                batch = []
+        count += self.store(batch)
+
+        with self.lock, self.connection:
+            if refresh:
+                if sync_from_dt is None:
+                    self._set_state('full', 1)
+                else:
+                    self._set_state('synced_from', to_milliseconds(sync_from_dt))
+                # trades received or updated while the refresh was running may be missing, so it counts from its
+                # start
+                self._set_state('last_refresh', started)
+            self._set_state('last_sync', started)
+        return count
+
+    def _trades(self, where: str, params) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.connection.execute(
+                f'SELECT trade FROM trades WHERE {where} ORDER BY execution_date, identifier', params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_trade(self, trade_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.connection.execute('SELECT trade FROM trades WHERE identifier = ?', (trade_id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def list_trades(
+            self,
+            from_dt: Optional[Union[datetime, str]] = None,
+            to_dt: Optional[Union[datetime, str]] = None,
+            counterparty_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """ Trades executed on or after `from_dt` and before `to_dt`, like the `from`/`to` filters of the api. """
+        conditions = ['1']
+        params = []
+        if from_dt is not None:
+            conditions.append('execution_date >= ?')
+            params.append(to_milliseconds(from_dt))
+        if to_dt is not None:
+            conditions.append('execution_date < ?')
+            params.append(to_milliseconds(to_dt))
+        if counterparty_id is not None:
+            conditions.append('counterparty_identifier = ?')
+            params.append(counterparty_id)
+        return self._trades(' AND '.join(conditions), params)
+
+    def settlement_trades(self, settlement_number: str) -> List[Dict[str, Any]]:
+        return self._trades('settlement_number = ?', (settlement_number,))
@@ -0,0 +1,247 @@
+from array import array
+from collections import defaultdict
+from copy import copy
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MILLISECONDS_PER_DAY = 24 * 60 * 60 * 1000
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+
+class DictionaryColumn:
+    """ Column of repeated strings (symbols, sides, statuses, counterparties), stored as int32 codes into a list of
+    the distinct values. """
+
+    def __init__(self):
+        self.codes = array('i')
+        self.values: List[Optional[str]] = []
+        self.index: Dict[Optional[str], int] = {}
+
+    def append(self, value: Optional[str]):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def code(self, value: Optional[str]) -> int:
+        return self.index.get(value, -1)
+
+
+class TradeFrame:
+    """ Columnar store of trades for aggregations over large trade histories:
+
+        frame = TradeFrame.from_client(client, from_dt=start, to_dt=end)
+        positions = frame.net_positions()
+
+    Amounts are stored as int64 scaled by 10**`scale`, execution dates as int64 milliseconds since the epoch and all
+    repeated strings are dictionary encoded. Aggregations are vectorized with numpy when it is installed, and fall
+    back to a loop over the columns otherwise.
+
+    Amounts are always stored exactly: a trade with more decimals than `scale` rescales the whole frame to its
+    number of decimals, and an amount column with a value that does not fit into int64 becomes a list of python
+    ints, which is aggregated with the loop instead of numpy. """
+
+    AMOUNT_COLUMNS = ('dealt', 'rate', 'counter')
+    DICTIONARY_COLUMNS = ('counterparty', 'side', 'base_symbol', 'term_symbol', 'status')
+
+    def __init__(self, scale: int = 8):
+        self.scale = scale
+        self.factor = 10 ** scale
+        self.identifiers: List[str] = []
+        self.counterparty = DictionaryColumn()
+        self.side = DictionaryColumn()
+        self.base_symbol = DictionaryColumn()
+        self.term_symbol = DictionaryColumn()
+        self.status = DictionaryColumn()
+        self.dealt = array('q')
+        self.rate = array('q')
+        self.counter = array('q')
+        self.execution_date = array('q')
+
+    @classmethod
+    def from_client(cls, client, scale: int = 8, **kwargs):
+        """ Builds a frame from `client.iter_trades(**kwargs)`, one page at a time. """
+        frame = cls(scale)
+        frame.extend(client.iter_trades(**kwargs))
+        return frame
+
+    def __len__(self):
+        return len(self.identifiers)
+
+    @staticmethod
+    def decimals(amount: Decimal) -> int:
+        """ The number of decimals needed to represent `amount` exactly, ignoring trailing zeros. """
+        _, digits, exponent = amount.as_tuple()
+        decimals = max(0, -exponent)
+        trailing_zeros = len(digits) - len(''.join(map(str, digits)).rstrip('0'))
+        return max(0, decimals - trailing_zeros)
+
+    def rescale(self, scale: int):
+        """ Scales the stored amounts up to `scale` decimals. """
+        factor = 10 ** (scale - self.scale)
+        for name in self.AMOUNT_COLUMNS:
+            values = [value * factor for value in getattr(self, name)]
+            fits = all(INT64_MIN <= value <= INT64_MAX for value in values)
+            setattr(self, name, array('q', values) if fits else values)
+        self.scale = scale
+        self.factor = 10 ** scale
+
+    def to_scaled(self, amount: Union[str, Decimal]) -> int:
+        """ `amount` as an integer scaled by 10**`scale`; the frame is rescaled first if `amount` has more
+        decimals. """
+        amount = Decimal(amount)
+        decimals = self.decimals(amount)
+        if decimals > self.scale:
+            self.rescale(decimals)
+        sign, digits, exponent = amount.as_tuple()
+        # exact, unlike Decimal.scaleb which rounds to the precision of the decimal context
+        value = int(''.join(map(str, digits)))
+        shift = exponent + self.scale
+        value = value * 10 ** shift if shift >= 0 else value // 10 ** -shift
+        return -value if sign else value
+
+    def append_amount(self, name: str, value: int):
+        column = getattr(self, name)
+        if type(column) is array and not INT64_MIN <= value <= INT64_MAX:
+            column = list(column)
+            setattr(self, name, column)
+        column.append(value)
+
+    def from_scaled(self, value: int) -> Decimal:
+        # built from its digits, which is exact for any number of digits
+        value = int(value)
+        return Decimal((int(value < 0), tuple(map(int, str(abs(value)))), -self.scale))
+
+    @staticmethod
+    def to_milliseconds(date: str) -> int:
+        parsed = datetime.strptime(''.join(date.rsplit(':', 1)), '%Y-%m-%dT%H:%M:%S.%f%z')
+        return int(parsed.timestamp() * 1000)
+
+    def append(self, trade):
+        """ Appends a trade dict (or `TradeInfo` record) as returned by the api. """
+        amounts = [Decimal(trade[field]) for field in ('dealt', 'rate', 'counter')]
+        decimals = max(self.decimals(amount) for amount in amounts)
+        if decimals > self.scale:
+            self.rescale(decimals)
+        # everything is converted before anything is appended, so a bad trade does not leave the columns misaligned
+        scaled = [self.to_scaled(amount) for amount in amounts]
+        execution_date = self.to_milliseconds(trade['executionDate'])
+        self.identifiers.append(trade['identifier'])
+        self.counterparty.append(trade['counterpartyIdentifier'])
+        self.side.append(trade['side'])
+        self.base_symbol.append(trade['baseSymbol'])
+        self.term_symbol.append(trade['termSymbol'])
+        self.status.append(trade['status'])
+        for name, value in zip(self.AMOUNT_COLUMNS, scaled):
+            self.append_amount(name, value)
+        self.execution_date.append(execution_date)
+
+    def extend(self, trades: Iterable[Any]):
+        for trade in trades:
+            self.append(trade)
+
+    def append_page(self, page):
+        """ Appends the trades of one `list_trades` response. """
+        self.extend(page['trades'])
+
+    def column(self, name: str):
+        """ Returns a copy of a column as a numpy array if numpy is installed, as an `array` otherwise, so the frame
+        can still be appended to while it is held. Dictionary encoded columns are returned as their codes, `day` as
+        days since the epoch. Amount columns with values beyond int64 are returned as a list of python ints. """
+        values = self._column(name)
+        # `day` is computed, and so already a new array
+        return values if name == 'day' else copy(values)
+
+    def _column(self, name: str):
+        # without copying: numpy arrays are views of the live arrays, which cannot be resized while a view exists,
+        # so these must not outlive the aggregation using them
+        if name == 'day':
+            dates = self._column('execution_date')
+            if numpy is not None:
+                return dates // MILLISECONDS_PER_DAY
+            return array('q', (date // MILLISECONDS_PER_DAY for date in dates))
+        values = getattr(self, name)
+        if isinstance(values, DictionaryColumn):
+            values = values.codes
+        if numpy is not None and type(values) is array:
+            return numpy.frombuffer(values, dtype=numpy.int32 if values.typecode == 'i' else numpy.int64)
+        return values
+
+    def decode_key(self, name: str, value: int):
+        if name == 'day':
+            return datetime.fromtimestamp(int(value) * MILLISECONDS_PER_DAY // 1000, timezone.utc).date()
+        column = getattr(self, name)
+        return column.values[value] if isinstance(column, DictionaryColumn) else value
+
+    def mask(self, exclude_statuses: Sequence[str] = ('Canceled',)):
+        codes = [self.status.code(status) for status in exclude_statuses]
+        statuses = self._column('status')
+        if numpy is not None:
+            return ~numpy.isin(statuses, codes)
+        return [status not in codes for status in statuses]
+
+    def group_sum(self, by: Sequence[str], value: str, sign=None, mask=None) -> Dict[Tuple, int]:
+        """ Sums the scaled `value` column (multiplied by `sign`, a column of +1/-1, if given) grouped by the `by`
+        columns, over the trades selected by `mask`. Returns {tuple of decoded keys: scaled sum}. """
+        keys = [self._column(name) for name in by]
+        values = self._column(value)
+        if numpy is not None and type(values) is not list:
+            selected = numpy.ones(len(self), dtype=bool) if mask is None else numpy.asarray(mask)
+            values = values[selected] if sign is None else (values * sign)[selected]
+            keys = [key[selected].astype(numpy.int64) for key in keys]
+            if not len(values):
+                return {}
+            # combine the keys into one row of a 2d array and let numpy find the distinct groups
+            groups, inverse = numpy.unique(numpy.stack(keys), axis=1, return_inverse=True)
+            # sums of scaled amounts easily overflow int64, so the high and low 32 bits are summed separately and
+            # only combined as python ints
+            inverse = inverse.reshape(-1)
+            high = numpy.zeros(groups.shape[1], dtype=numpy.int64)
+            low = numpy.zeros(groups.shape[1], dtype=numpy.int64)
+            numpy.add.at(high, inverse, values >> 32)
+            numpy.add.at(low, inverse, values & 0xFFFFFFFF)
+            return {
+                tuple(self.decode_key(name, group[i]) for i, name in enumerate(by)): (int(h) << 32) + int(l)
+                for group, h, l in zip(groups.T, high, low)}
+
+        sums = defaultdict(int)
+        for i in range(len(self)):
+            if mask is None or mask[i]:
+                sums[tuple(key[i] for key in keys)] += values[i] * (1 if sign is None else int(sign[i]))
+        return {
+            tuple(self.decode_key(name, code) for name, code in zip(by, group)): total
+            for group, total in sums.items()}
+
+    def side_sign(self, side: str = 'Buy'):
+        """ +1 for trades with `side`, -1 for all others. """
+        code = self.side.code(side)
+        sides = self._column('side')
+        if numpy is not None:
+            return numpy.where(sides == code, 1, -1)
+        return [1 if s == code else -1 for s in sides]
+
+    def net_positions(self, exclude_statuses: Sequence[str] = ('Canceled',)) -> Dict[Tuple[str, str], Decimal]:
+        """ Net amount per (counterparty, symbol): a Buy adds `dealt` of the base symbol and removes `counter` of
+        the term symbol, a Sell does the opposite. """
+        mask = self.mask(exclude_statuses)
+        buy = self.side_sign('Buy')
+        sell = [-s for s in buy] if numpy is None else -buy
+        positions = defaultdict(int)
+        for (counterparty, symbol), total in self.group_sum(('counterparty', 'base_symbol'), 'dealt', buy, mask).items():
+            positions[counterparty, symbol] += total
+        for (counterparty, symbol), total in self.group_sum(('counterparty', 'term_symbol'), 'counter', sell, mask).items():
+            positions[counterparty, symbol] += total
+        return {key: self.from_scaled(total) for key, total in positions.items()}
+
+    def notional_by_day(self, exclude_statuses: Sequence[str] = ('Canceled',)) -> Dict[Tuple[Any, str], Decimal]:
+        """ Sum of `counter` per (execution day in UTC, term symbol). """
+        totals = self.group_sum(('day', 'term_symbol'), 'counter', mask=self.mask(exclude_statuses))
+        return {key: self.from_scaled(total) for key, total in totals.items()}
@@ -0,0 +1,103 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from decimal import Decimal, getcontext
+import hashlib
+from itertools import repeat
+from typing import List, Optional, Sequence, Union
+
+QUANTA = Decimal('0.' + '0' * 18)
+DECIMALS = 18
+
+
+def format_amount(amount: str) -> str:
+    """ Returns exactly `str(Decimal(amount).quantize(QUANTA))`. The common case, an unsigned plain decimal string
+    with a non-zero integer part and at most 18 decimals, is formatted with string operations only; everything else
+    (signs, exponents, values below 1 that `str` of a Decimal may render in scientific notation, values too large for
+    the decimal context) goes through `Decimal`. """
+    if type(amount) is str:
+        integer, _, fraction = amount.partition('.')
+        if integer.isascii() and integer.isdigit() and integer[0] != '0' \
+                and len(integer) + DECIMALS <= getcontext().prec and len(fraction) <= DECIMALS \
+                and (not fraction or (fraction.isascii() and fraction.isdigit())):
+            return integer + '.' + fraction.ljust(DECIMALS, '0')
+    return str(Decimal(amount).quantize(QUANTA))
+
+
+def format_execution_date(execution_date: Union[datetime, str]) -> str:
+    if type(execution_date) is str:
+        return execution_date
+    return execution_date.isoformat(timespec='milliseconds')
+
+
+def trade_hash(
+        venue_id: str,
+        counterparty_id: str,
+        trade_id: str,
+        side: str,
+        base_symbol: str,
+        term_symbol: str,
+        dealt: str,
+        rate: str,
+        counter: str,
+        execution_date: Union[datetime, str],
+) -> str:
+    content = '|'.join([
+        venue_id,
+        counterparty_id,
+        trade_id,
+        side,
+        base_symbol,
+        term_symbol,
+        format_amount(dealt),
+        format_amount(rate),
+        format_amount(counter),
+        format_execution_date(execution_date)])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _hash_rows(rows):
+    sha256 = hashlib.sha256
+    hashes = []
+    for venue_id, counterparty_id, trade_id, side, base_symbol, term_symbol, dealt, rate, counter, date in rows:
+        content = '|'.join([venue_id, counterparty_id, trade_id, side, base_symbol, term_symbol, format_amount(dealt),
+                            format_amount(rate), format_amount(counter), format_execution_date(date)])
+        hashes.append(sha256(content.encode()).hexdigest())
+    return hashes
+
+
+def _column(values, length):
+    # a single string is used for every trade, e.g. the venue id
+    return repeat(values, length) if isinstance(values, str) else values
+
+
+def compute_trade_hashes(
+        venue_ids: Union[str, Sequence[str]],
+        counterparty_ids: Union[str, Sequence[str]],
+        trade_ids: Sequence[str],
+        sides: Union[str, Sequence[str]],
+        base_symbols: Union[str, Sequence[str]],
+        term_symbols: Union[str, Sequence[str]],
+        dealts: Sequence[str],
+        rates: Sequence[str],
+        counters: Sequence[str],
+        execution_dates: Sequence[Union[datetime, str]],
+        processes: Optional[int] = None,
+        chunk_size: int = 20000,
+) -> List[str]:
+    """ Computes the trade hash of many trades given as columns (lists, tuples or arrays of equal length; a single
+    string is used for all trades). The result is identical to calling `Client.compute_trade_hash` for every trade.
+
+    Inputs larger than `chunk_size` are hashed in chunks on a pool of `processes` processes (defaults to the number
+    of cpus); pass `processes=1` to hash in the current process. """
+    columns = (venue_ids, counterparty_ids, trade_ids, sides, base_symbols, term_symbols, dealts, rates, counters,
+               execution_dates)
+    length = len(trade_ids)
+    if any(not isinstance(column, str) and len(column) != length for column in columns):
+        raise ValueError('All trade columns must have the same length')
+    rows = list(zip(*(_column(column, length) for column in columns)))
+    if processes == 1 or length <= chunk_size:
+        return _hash_rows(rows)
+
+    chunks = [rows[i:i + chunk_size] for i in range(0, length, chunk_size)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return [h for hashes in executor.map(_hash_rows, chunks) for h in hashes]
@@ -0,0 +1,205 @@
+import asyncio
+import random
+import threading
+from time import monotonic, sleep
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Union
+
+from .models import WebhookType
+
+
+def backoff(
+        initial_interval: float = 0.1,
+        max_interval: float = 5.0,
+        multiplier: float = 2.0,
+        jitter: float = 0.5,
+) -> Iterator[float]:
+    """ Exponentially growing intervals, each reduced by a random fraction of up to `jitter`, so that many waits
+    started at the same time do not poll in lockstep. """
+    interval = initial_interval
+    while True:
+        yield interval * (1 - jitter * random.random())
+        interval = min(interval * multiplier, max_interval)
+
+
+def wait_until(
+        predicate: Callable[[Any], bool],
+        source: Callable[[], Any],
+        timeout: float = 90,
+        description: str = 'condition',
+        **backoff_kwargs
+):
+    """ Calls `source` until `predicate` holds for its result and returns that result, sleeping with `backoff`
+    in between. Raises `TimeoutError` once `timeout` seconds have passed. """
+    deadline = monotonic() + timeout
+    for interval in backoff(**backoff_kwargs):
+        value = source()
+        if predicate(value):
+            return value
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f'Timed out waiting for {description}. Last value: {value}')
+        sleep(min(interval, remaining))
+
+
+async def wait_until_async(
+        predicate: Callable[[Any], bool],
+        source: Callable[[], Awaitable[Any]],
+        timeout: float = 90,
+        description: str = 'condition',
+        **backoff_kwargs
+):
+    """ `wait_until` for a `source` returning awaitables, e.g. an `AsyncClient` endpoint method. """
+    deadline = monotonic() + timeout
+    for interval in backoff(**backoff_kwargs):
+        value = await source()
+        if predicate(value):
+            return value
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f'Timed out waiting for {description}. Last value: {value}')
+        await asyncio.sleep(min(interval, remaining))
+
+
+class _Waiter:
+    def __init__(self, predicate, webhook_types, webhook_predicate):
+        self.predicate = predicate
+        self.webhook_types = webhook_types
+        self.webhook_predicate = webhook_predicate
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[Exception] = None
+
+    def complete(self, value=None, error: Optional[Exception] = None):
+        self.value = value
+        self.error = error
+        self.done.set()
+
+
+class _Source:
+    def __init__(self, fetch, intervals: Iterator[float]):
+        self.fetch = fetch
+        self.intervals = intervals
+        self.waiters: List[_Waiter] = []
+        self.next_poll = monotonic()
+        self.value = None
+
+
+class Poller:
+    """ Waits on many conditions from many threads with a single polling thread. Waits on the same `key` share
+    one source, so e.g. any number of threads waiting on the withdrawals of a customer cause one
+    `list_customer_withdrawals` call per interval:
+
+        poller = Poller()
+        poller.wait(('withdrawals', customer_id), lambda: client.list_customer_withdrawals(customer_id),
+                    lambda withdrawals: all(w['status'] == 'Completed' for w in withdrawals),
+                    webhook_types=[WebhookType.WithdrawalStatusChanged])
+
+    Each source is polled right away when a wait is added, then with `backoff`. Pass `on_webhook` as a
+    `WebhookConsumer` handler (or call it from a `WebhookReceiver` handler): a webhook of one of the `webhook_types`
+    of a wait completes it if its `webhook_predicate` holds, and otherwise makes the poller check the wait's source
+    again immediately, so long backoff intervals do not delay the completion. """
+
+    def __init__(self, **backoff_kwargs):
+        self.backoff_kwargs = {'initial_interval': 0.1, 'max_interval': 10.0, **backoff_kwargs}
+        self.sources: Dict[Hashable, _Source] = {}
+        self.condition = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+        self.closed = False
+
+    def wait(
+            self,
+            key: Hashable,
+            source: Callable[[], Any],
+            predicate: Callable[[Any], bool],
+            timeout: float = 90,
+            webhook_types: Iterable[Union[WebhookType, str]] = (),
+            webhook_predicate: Optional[Callable[[Any], bool]] = None,
+    ):
+        """ Returns the first value of `source` (or webhook) satisfying `predicate` (or `webhook_predicate`). """
+        waiter = _Waiter(
+            predicate,
+            {t.name if isinstance(t, WebhookType) else t for t in webhook_types},
+            webhook_predicate)
+        with self.condition:
+            if self.closed:
+                raise RuntimeError('Poller is closed')
+            polled = self.sources.get(key)
+            if polled is None:
+                polled = self.sources[key] = _Source(source, backoff(**self.backoff_kwargs))
+            polled.waiters.append(waiter)
+            polled.next_poll = monotonic()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='poller', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+        if not waiter.done.wait(timeout):
+            with self.condition:
+                if waiter in polled.waiters:
+                    polled.waiters.remove(waiter)
+                    self.condition.notify()
+            if not waiter.done.is_set():
+                raise TimeoutError(f'Timed out waiting for {key}. Last value: {polled.value}')
+        if waiter.error is not None:
+            raise waiter.error
+        return waiter.value
+
+    def on_webhook(self, webhook):
+        with self.condition:
+            for polled in self.sources.values():
+                for waiter in list(polled.waiters):
+                    if webhook['type'] not in waiter.webhook_types:
+                        continue
+                    if waiter.webhook_predicate is not None and waiter.webhook_predicate(webhook):
+                        polled.waiters.remove(waiter)
+                        waiter.complete(webhook)
+                    else:
+                        polled.next_poll = monotonic()
+            self.condition.notify()
+
+    def close(self):
+        """ Stops the polling thread; waits still pending raise `RuntimeError` instead of running into their
+        timeout. """
+        with self.condition:
+            self.closed = True
+            for polled in self.sources.values():
+                for waiter in polled.waiters:
+                    waiter.complete(polled.value, RuntimeError('Poller is closed'))
+                polled.waiters.clear()
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while True:
+                    if self.closed:
+                        return
+                    # sources nobody waits on anymore are dropped
+                    for key in [k for k, s in self.sources.items() if not s.waiters]:
+                        del self.sources[key]
+                    now = monotonic()
+                    due = [s for s in self.sources.values() if s.next_poll <= now]
+                    if due:
+                        break
+                    next_poll = min((s.next_poll for s in self.sources.values()), default=None)
+                    self.condition.wait(None if next_poll is None else next_poll - now)
+
+            for polled in due:
+                try:
+                    value, error = polled.fetch(), None
+                except Exception as e:
+                    value, error = None, e
+                with self.condition:
+                    polled.value = value
+                    for waiter in list(polled.waiters):
+                        waiter_error = error
+                        try:
+                            done = error is not None or waiter.predicate(value)
+                        except Exception as e:
+                            done, waiter_error = True, e
+                        if done:
+                            polled.waiters.remove(waiter)
+                            waiter.complete(value, waiter_error)
+                    polled.next_poll = monotonic() + next(polled.intervals)
@@ -0,0 +1,283 @@
+import asyncio
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from aiohttp import web
+
+from .exceptions import SkippedWebhooks, UnexpectedStatusCode
+from .models import WebhookType
+from .serialization import JsonDecoder, default_json_decoder
+from .webhooks import MemorySequenceStore, SequenceStore
+
+WebhookBatchHandler = Callable[[List[Any]], Awaitable[None]]
+
+
+class WebhookReceiver:
+    """ Receives the webhooks Strike pushes to the url registered with `set_webhook_config` and hands them to
+    `handlers` in micro-batches, all on one event loop:
+
+        async def on_deposits(webhooks):
+            ...
+
+        receiver = WebhookReceiver(client, {WebhookType.CustomerDepositCompleted: on_deposits},
+                                   store=FileSequenceStore('webhooks.seq'))
+        await receiver.start(port=8080)
+
+    A request is acknowledged as soon as its webhooks are queued; pushes are not authenticated, so the receiver
+    should only be reachable by Strike. Webhooks are deduplicated by sequence number. Sequence numbers are expected
+    to be consecutive, and a gap that is not filled by pushes within `gap_timeout` seconds is backfilled from the
+    api with `client` (an `AsyncClient`) and the backfilled webhooks are marked as delivered. Numbers the api does
+    not return either (and every gap without `client`) are skipped, and reported to `on_error` as `SkippedWebhooks`.
+    A push that is not JSON or has a webhook without `sequenceNumber` or `type` is rejected with a 400.
+
+    Handlers are called with up to `batch_size` webhooks of one type, collected for at most `batch_interval`
+    seconds. The store is updated to the last sequence number up to which every webhook was handled; it stays below
+    a webhook whose handler failed `max_attempts` times, so after a restart that webhook is backfilled again. Errors
+    saving the store are reported to `on_error`, and saving is tried again after the next batch and on `stop`. """
+
+    def __init__(
+            self,
+            client=None,
+            handlers: Optional[Dict[Union[WebhookType, str], WebhookBatchHandler]] = None,
+            store: Optional[SequenceStore] = None,
+            default_handler: Optional[WebhookBatchHandler] = None,
+            path: str = '/webhooks',
+            batch_size: int = 100,
+            batch_interval: float = 0.01,
+            queue_size: int = 10000,
+            gap_timeout: float = 2.0,
+            max_attempts: int = 3,
+            json_decoder: Optional[JsonDecoder] = None,
+            on_error: Optional[Callable[[List[Any], Exception], None]] = None,
+    ):
+        self.client = client
+        self.handlers = {
+            webhook_type.name if isinstance(webhook_type, WebhookType) else webhook_type: handler
+            for webhook_type, handler in (handlers or {}).items()}
+        self.store = store or MemorySequenceStore()
+        self.default_handler = default_handler
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.queue_size = queue_size
+        self.gap_timeout = gap_timeout
+        self.max_attempts = max_attempts
+        self.json_decoder = json_decoder or (client.json_decoder if client is not None else default_json_decoder)
+        self.on_error = on_error
+        self.stats = {
+            'received': 0, 'duplicates': 0, 'handled': 0, 'failed': 0, 'batches': 0, 'gaps_detected': 0,
+            'backfilled': 0, 'skipped': 0}
+
+        # every webhook up to `contiguous` has been received, `received_above` are those received after a gap
+        self.contiguous: Optional[int] = self.store.load()
+        self.saved_sequence_number = self.contiguous
+        self.received_above = set()
+        self.highest = self.contiguous
+        self.gap_since: Optional[float] = None
+        # received but not handled yet, and those whose handler failed
+        self.unhandled = set()
+        self.failed = set()
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+        self.runner: Optional[web.AppRunner] = None
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.receive)
+        return app
+
+    async def start(self, host: str = '0.0.0.0', port: int = 8080):
+        """ Starts the dispatcher and gap monitor, and serves `path` on `host`:`port` unless `port` is None (for
+        embedding `app()` in an existing aiohttp application). """
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.tasks = [asyncio.ensure_future(self.dispatch()), asyncio.ensure_future(self.monitor_gaps())]
+        if port is not None:
+            self.runner = web.AppRunner(self.app())
+            await self.runner.setup()
+            await web.TCPSite(self.runner, host, port).start()
+        return self
+
+    async def stop(self):
+        """ Stops accepting pushes and returns once every queued webhook was handled. """
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+        await self.queue.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        # once more, in case saving after the last batch failed
+        await self.save()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'contiguous_sequence_number': self.contiguous,
+            'highest_sequence_number': self.highest,
+            'handled_sequence_number': self.saved_sequence_number,
+        }
+
+    async def receive(self, request: web.Request) -> web.Response:
+        try:
+            content = self.json_decoder(await request.read())
+        except ValueError:
+            return web.Response(status=400)
+        webhooks = content if isinstance(content, list) else [content]
+        # checked before any webhook of the push is queued, so a rejected push can be resent as a whole
+        if not all(is_webhook(webhook) for webhook in webhooks):
+            return web.Response(status=400, text='Every webhook needs an integer sequenceNumber and a type')
+        for webhook in webhooks:
+            await self.accept(webhook)
+        return web.Response(status=200)
+
+    async def accept(self, webhook) -> bool:
+        """ Queues a webhook unless it was received before. Waits while the queue is full. """
+        sequence_number = webhook['sequenceNumber']
+        if self.contiguous is None:
+            self.contiguous = sequence_number - 1
+        if sequence_number <= self.contiguous or sequence_number in self.received_above:
+            self.stats['duplicates'] += 1
+            return False
+        self.stats['received'] += 1
+        self.received_above.add(sequence_number)
+        self.unhandled.add(sequence_number)
+        self.highest = sequence_number if self.highest is None else max(self.highest, sequence_number)
+        self.advance()
+        await self.queue.put(webhook)
+        return True
+
+    def advance(self):
+        contiguous = self.contiguous
+        while contiguous + 1 in self.received_above:
+            contiguous += 1
+            self.received_above.remove(contiguous)
+        moved = contiguous != self.contiguous
+        self.contiguous = contiguous
+        if not self.received_above:
+            self.gap_since = None
+        elif moved or self.gap_since is None:
+            if self.gap_since is None:
+                self.stats['gaps_detected'] += 1
+            self.gap_since = monotonic()
+
+    async def next_batch(self) -> List[Any]:
+        batch = [await self.queue.get()]
+        while len(batch) < self.batch_size:
+            if self.queue.empty():
+                if not self.batch_interval or len(batch) > 1:
+                    break
+                # give a burst of pushes the chance to end up in the same batch
+                await asyncio.sleep(self.batch_interval)
+                if self.queue.empty():
+                    break
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def handle(self, handler: WebhookBatchHandler, webhooks: List[Any]) -> bool:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await handler(webhooks)
+                return True
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    if self.on_error is not None:
+                        self.on_error(webhooks, e)
+        return False
+
+    async def dispatch(self):
+        while True:
+            batch = await self.next_batch()
+            by_type = {}
+            for webhook in batch:
+                by_type.setdefault(webhook['type'], []).append(webhook)
+            for webhook_type, webhooks in by_type.items():
+                handler = self.handlers.get(webhook_type, self.default_handler)
+                ok = handler is None or await self.handle(handler, webhooks)
+                self.stats['handled' if ok else 'failed'] += len(webhooks)
+                if not ok:
+                    self.failed.update(webhook['sequenceNumber'] for webhook in webhooks)
+            self.stats['batches'] += 1
+            for webhook in batch:
+                self.unhandled.discard(webhook['sequenceNumber'])
+            await self.save()
+            for _ in batch:
+                self.queue.task_done()
+
+    async def save(self):
+        sequence_number = self.contiguous
+        # never past a webhook that is not handled yet or whose handler failed
+        for pending in (self.unhandled, self.failed):
+            if pending:
+                sequence_number = min(sequence_number, min(pending) - 1)
+        if sequence_number is not None and sequence_number != self.saved_sequence_number:
+            try:
+                # e.g. `FileSequenceStore` writes and fsyncs, which must not block the event loop
+                await asyncio.get_running_loop().run_in_executor(None, self.store.save, sequence_number)
+            except Exception as e:
+                # the dispatcher keeps running, `stop` waits for it
+                if self.on_error is not None:
+                    self.on_error([], e)
+                return
+            self.saved_sequence_number = sequence_number
+
+    async def monitor_gaps(self):
+        while True:
+            await asyncio.sleep(self.gap_timeout / 2)
+            if self.gap_since is not None and monotonic() - self.gap_since >= self.gap_timeout:
+                try:
+                    await self.backfill()
+                except Exception as e:
+                    if self.on_error is not None:
+                        self.on_error([], e)
+
+    async def backfill(self):
+        """ Fetches the webhooks missing between the last contiguous and the highest received sequence number, then
+        skips whatever is still missing. """
+        highest = self.highest
+        if self.client is not None:
+            missing = [n for n in range(self.contiguous + 1, highest) if n not in self.received_above]
+            backfilled = []
+            if len(missing) == 1:
+                try:
+                    backfilled.append(await self.client.get_webhook(missing[0]))
+                except UnexpectedStatusCode as e:
+                    if e.status_code != 404:
+                        raise
+            else:
+                # pages are only requested from missing sequence numbers, so received ranges are skipped over
+                wanted = set(missing)
+                i = 0
+                while i < len(missing):
+                    page = await self.client.list_webhooks(from_sequence_number=missing[i])
+                    if not page['webhooks']:
+                        break
+                    backfilled += [w for w in page['webhooks'] if w['sequenceNumber'] in wanted]
+                    last = page['webhooks'][-1]['sequenceNumber']
+                    while i < len(missing) and missing[i] <= last:
+                        i += 1
+            accepted = [webhook['sequenceNumber'] for webhook in backfilled if await self.accept(webhook)]
+            self.stats['backfilled'] += len(accepted)
+            if accepted:
+                await self.client.mark_webhooks_as_delivered(accepted)
+
+        # nothing else is going to fill the gaps up to the highest sequence number received before the backfill
+        while self.received_above and min(self.received_above) <= highest:
+            next_received = min(self.received_above)
+            first, last = self.contiguous + 1, next_received - 1
+            self.stats['skipped'] += last - first + 1
+            self.contiguous = last
+            self.advance()
+            if self.on_error is not None:
+                self.on_error([], SkippedWebhooks(f'Skipped the missing webhooks {first} to {last}', first, last))
+
+
+def is_webhook(webhook) -> bool:
+    return isinstance(webhook, dict) and type(webhook.get('sequenceNumber')) is int and 'type' in webhook
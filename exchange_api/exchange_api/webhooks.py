@@ -0,0 +1,330 @@
+from collections import deque
+from datetime import datetime, timezone
+import os
+import queue
+import threading
+from time import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from .models import WebhookType
+
+WebhookHandler = Callable[[Any], None]
+
+
+class SequenceStore:
+    """ Persists the sequence number of the last processed webhook, so a consumer restarts where it stopped. """
+
+    def load(self) -> Optional[int]:
+        raise NotImplementedError
+
+    def save(self, sequence_number: int):
+        raise NotImplementedError
+
+
+class MemorySequenceStore(SequenceStore):
+    def __init__(self, sequence_number: Optional[int] = None):
+        self.sequence_number = sequence_number
+
+    def load(self) -> Optional[int]:
+        return self.sequence_number
+
+    def save(self, sequence_number: int):
+        self.sequence_number = sequence_number
+
+
+class FileSequenceStore(SequenceStore):
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[int]:
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def save(self, sequence_number: int):
+        # written to a temporary file and renamed, so a crash never leaves a partially written number behind
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(sequence_number))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def parse_created_at(created_at: str) -> datetime:
+    return datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+
+
+class WebhookStats:
+    def __init__(self):
+        self.polls = 0
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.acked = 0
+        self.ack_requests = 0
+        # seconds between a webhook being created and its handler finishing
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.started_at = None
+
+    @property
+    def elapsed(self):
+        return 0.0 if self.started_at is None else time() - self.started_at
+
+    @property
+    def webhooks_per_second(self):
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def average_lag(self):
+        return self.total_lag / self.processed if self.processed else 0.0
+
+    def record_lag(self, created_at: Optional[str]):
+        if not created_at:
+            return
+        lag = max(0.0, datetime.now(timezone.utc).timestamp() - parse_created_at(created_at).timestamp())
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.total_lag += lag
+
+
+class WebhookConsumer:
+    """ Polls `list_webhooks` for undelivered webhooks and dispatches them by type to `handlers` on a pool of
+    `workers` threads:
+
+        consumer = WebhookConsumer(client, {
+            WebhookType.CustomerDepositCompleted: on_deposit,
+            WebhookType.SettlementStatusChanged: on_settlement,
+        }, store=FileSequenceStore('webhooks.seq'))
+        with consumer:
+            ...
+
+    The poll interval starts at `min_poll_interval` and doubles up to `max_poll_interval` while there are no new
+    webhooks; as long as webhooks are returned the next page is requested right away. Webhooks wait in a queue of
+    `queue_size`, and polling blocks while it is full.
+
+    Processed webhooks are marked as delivered in chunks of up to `ack_batch_size`, at least every `ack_interval`
+    seconds. After the acks, the store is updated to the last sequence number up to which every webhook was
+    processed. A handler failing `max_attempts` times is reported to `on_error` and the webhook is left undelivered;
+    the stored sequence number then stays below it, so it is fetched again when the consumer is restarted. Webhooks
+    without a handler go to `default_handler`, or are just acknowledged. """
+
+    def __init__(
+            self,
+            client,
+            handlers: Dict[Union[WebhookType, str], WebhookHandler],
+            store: Optional[SequenceStore] = None,
+            default_handler: Optional[WebhookHandler] = None,
+            workers: int = 4,
+            queue_size: int = 1000,
+            ack_batch_size: int = 100,
+            ack_interval: float = 1.0,
+            min_poll_interval: float = 0.1,
+            max_poll_interval: float = 10.0,
+            max_attempts: int = 3,
+            on_error: Optional[Callable[[Any, Exception], None]] = None,
+    ):
+        self.client = client
+        self.handlers = {
+            webhook_type.name if isinstance(webhook_type, WebhookType) else webhook_type: handler
+            for webhook_type, handler in handlers.items()}
+        self.store = store or MemorySequenceStore()
+        self.default_handler = default_handler
+        self.workers = workers
+        self.ack_batch_size = ack_batch_size
+        self.ack_interval = ack_interval
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.max_attempts = max_attempts
+        self.on_error = on_error
+        self.stats = WebhookStats()
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.acks_ready = threading.Condition(self.lock)
+        self.stopping = threading.Event()
+        self.workers_done = threading.Event()
+        self.threads: List[threading.Thread] = []
+
+        last_sequence_number = self.store.load()
+        self.next_sequence_number = None if last_sequence_number is None else last_sequence_number + 1
+        self.processed_sequence_number = last_sequence_number
+        # sequence numbers in the order they were queued, those of them that were processed and those that failed
+        self.dispatched = deque()
+        self.done = set()
+        self.failed = set()
+        self.pending_acks: List[int] = []
+
+    def start(self):
+        self.stats.started_at = time()
+        # resumes at the first webhook that failed in a previous run, the api still returns it as undelivered
+        with self.lock:
+            if self.failed:
+                self.next_sequence_number = None if self.processed_sequence_number is None \
+                    else self.processed_sequence_number + 1
+            self.dispatched.clear()
+            self.done.clear()
+            self.failed.clear()
+        self.stopping.clear()
+        self.workers_done.clear()
+        self.threads = [threading.Thread(target=self.poll, name='webhook-poller', daemon=True),
+                        threading.Thread(target=self.acknowledge, name='webhook-acker', daemon=True)]
+        self.threads += [threading.Thread(target=self.work, name=f'webhook-worker-{i}', daemon=True)
+                         for i in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """ Stops polling, lets the workers finish the queued webhooks and flushes the remaining acks. Does
+        nothing if the consumer is not running. """
+        if not self.threads:
+            return
+        self.stopping.set()
+        poller, acker, *workers = self.threads
+        poller.join()
+        for _ in workers:
+            self.queue.put(None)
+        for worker in workers:
+            worker.join()
+        with self.acks_ready:
+            self.workers_done.set()
+            self.acks_ready.notify()
+        acker.join()
+        self.threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            'polls': self.stats.polls,
+            'received': self.stats.received,
+            'processed': self.stats.processed,
+            'failed': self.stats.failed,
+            'acked': self.stats.acked,
+            'ack_requests': self.stats.ack_requests,
+            'queue_depth': self.queue.qsize(),
+            'webhooks_per_second': self.stats.webhooks_per_second,
+            'last_lag': self.stats.last_lag,
+            'average_lag': self.stats.average_lag,
+            'max_lag': self.stats.max_lag,
+            'processed_sequence_number': self.processed_sequence_number,
+        }
+
+    def report_error(self, webhook, e: Exception):
+        if self.on_error is not None:
+            self.on_error(webhook, e)
+
+    def poll(self):
+        interval = self.min_poll_interval
+        while not self.stopping.is_set():
+            try:
+                page = self.client.list_webhooks(from_sequence_number=self.next_sequence_number, undelivered=True)
+            except Exception as e:
+                self.report_error(None, e)
+                interval = min(interval * 2, self.max_poll_interval)
+                self.stopping.wait(interval)
+                continue
+            self.stats.polls += 1
+            webhooks = page['webhooks']
+            for webhook in webhooks:
+                with self.lock:
+                    self.dispatched.append(webhook['sequenceNumber'])
+                # blocks while the workers are behind
+                while True:
+                    try:
+                        self.queue.put(webhook, timeout=0.1)
+                        break
+                    except queue.Full:
+                        if self.stopping.is_set():
+                            return
+                self.stats.received += 1
+            if webhooks:
+                self.next_sequence_number = page.get('nextWebhookSequenceNumber') \
+                    or webhooks[-1]['sequenceNumber'] + 1
+                interval = self.min_poll_interval
+            else:
+                self.stopping.wait(interval)
+                interval = min(interval * 2, self.max_poll_interval)
+
+    def handle(self, webhook) -> bool:
+        handler = self.handlers.get(webhook['type'], self.default_handler)
+        if handler is None:
+            return True
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                handler(webhook)
+                return True
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    self.report_error(webhook, e)
+        return False
+
+    def work(self):
+        while True:
+            webhook = self.queue.get()
+            if webhook is None:
+                return
+            ok = self.handle(webhook)
+            with self.lock:
+                sequence_number = webhook['sequenceNumber']
+                if ok:
+                    self.stats.processed += 1
+                    self.stats.record_lag(webhook.get('createdAt'))
+                    self.pending_acks.append(sequence_number)
+                    self.done.add(sequence_number)
+                else:
+                    self.stats.failed += 1
+                    self.failed.add(sequence_number)
+                # webhooks finish out of order, only move past those whose predecessors are all done, and never
+                # past one that failed
+                while self.dispatched and (self.dispatched[0] in self.done or self.dispatched[0] in self.failed):
+                    sequence_number = self.dispatched.popleft()
+                    self.done.discard(sequence_number)
+                    if not self.failed:
+                        self.processed_sequence_number = sequence_number
+                if len(self.pending_acks) >= self.ack_batch_size:
+                    self.acks_ready.notify()
+
+    def acknowledge(self):
+        saved_sequence_number = self.processed_sequence_number
+        while True:
+            with self.acks_ready:
+                if not self.workers_done.is_set():
+                    self.acks_ready.wait(self.ack_interval)
+                # the final flush, after the last webhook was processed
+                last = self.workers_done.is_set()
+                acks, self.pending_acks = self.pending_acks, []
+                processed_sequence_number = self.processed_sequence_number
+
+            failed_acks = []
+            for i in range(0, len(acks), self.ack_batch_size):
+                chunk = acks[i:i + self.ack_batch_size]
+                try:
+                    self.client.mark_webhooks_as_delivered(chunk)
+                    self.stats.acked += len(chunk)
+                    self.stats.ack_requests += 1
+                except Exception as e:
+                    self.report_error(None, e)
+                    failed_acks += chunk
+            with self.lock:
+                # retried with the next batch
+                self.pending_acks += failed_acks
+                unacked = self.pending_acks
+            if processed_sequence_number is not None:
+                # never persist past a webhook that is processed but not acknowledged yet
+                if unacked:
+                    processed_sequence_number = min(processed_sequence_number, min(unacked) - 1)
+                if processed_sequence_number != saved_sequence_number:
+                    self.store.save(processed_sequence_number)
+                    saved_sequence_number = processed_sequence_number
+            if last:
+                return
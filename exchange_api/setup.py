@@ -8,5 +8,6 @@ setup(
    author='Strike Protocols, Inc.',
    author_email='developers@strikeprotocols.com',
    packages=['exchange_api'],
-   install_requires=['ecdsa', 'requests', 'pytz']
+   install_requires=['ecdsa', 'requests', 'pytz'],
+   extras_require={'async': ['aiohttp'], 'fast-json': ['orjson'], 'frames': ['numpy'], 'signing': ['cryptography']},
 )
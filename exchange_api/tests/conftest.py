@@ -0,0 +1,17 @@
+import pytest
+
+from exchange_api.client import Client
+
+from .stub_server import StubApi
+
+
+@pytest.fixture
+def api():
+    with StubApi() as api:
+        yield api
+
+
+@pytest.fixture
+def client(api):
+    with Client(api.key, api.secret, api.url, signing_key_file=None, venue_id='venue') as client:
+        yield client
@@ -0,0 +1,179 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import json
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+
+class StubRequest:
+    def __init__(self, method: str, path: str, route: str, params: List[Tuple[str, str]], headers, body: bytes):
+        self.method = method
+        self.path = path
+        self.route = route
+        self.params = dict(params)
+        self.params_str = '&'.join(f'{k}={v}' for k, v in params)
+        self.headers = headers
+        self.body = body
+        self.match: Optional[re.Match] = None
+
+    @property
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+
+StubHandler = Callable[[StubRequest], Tuple]
+
+
+class StubApi:
+    """ Stand-in for the Strike api on a local port, for tests and benchmarks. Requests are checked like the api
+    does (the HMAC digest of the `Authorization` header) and answered by the handlers registered with `route`:
+
+        with StubApi() as api:
+            api.route('GET', 'symbols', lambda request: (200, [{'symbol': 'BTC'}]))
+            client = Client(api.key, api.secret, api.url, signing_key_file=None, venue_id='venue')
+            client.list_symbols()
+
+    Routes are regular expressions matched against the path after the api version, e.g. `trades/(?P<id>[^/]+)`.
+    Handlers return (status, content) or (status, content, headers), where content is encoded as JSON unless it is
+    None.
+
+    With `check_nonces`, nonces are checked like the api does: a nonce that was used before, or that is more than
+    `nonce_window` below the highest nonce used so far, is rejected with "The nonce is too low". The window lets
+    requests signed concurrently arrive slightly out of order. """
+
+    def __init__(
+            self,
+            key: str = 'key',
+            secret: str = 'secret',
+            api_version: str = 'v1',
+            check_nonces: bool = False,
+            nonce_window: int = 0,
+            highest_used_nonce: int = 0,
+    ):
+        self.key = key
+        self.secret = secret
+        self.api_version = api_version
+        self.check_nonces = check_nonces
+        self.nonce_window = nonce_window
+        self.highest_used_nonce = highest_used_nonce
+        self.used_nonces = set()
+        self.rejected_nonces = 0
+        self.routes: List[Tuple[str, re.Pattern, StubHandler]] = []
+        self.requests: List[StubRequest] = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def route(self, method: str, pattern: str, handler: StubHandler):
+        # routes registered later take precedence, so tests can override the defaults
+        self.routes.insert(0, (method, re.compile(pattern + '$'), handler))
+        return self
+
+    def digest(self, timestamp: str, nonce: str, request: StubRequest, idempotency_id: str) -> str:
+        # written out like `auth.py` rather than reusing the client's signer, so the stub checks it independently
+        content = '|'.join([
+            self.key, self.secret, timestamp, nonce, request.method, request.path, request.params_str,
+            request.body.decode(), idempotency_id])
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def authenticate(self, request: StubRequest) -> Optional[Tuple[int, Any]]:
+        """ Returns the error response for a request that is not signed correctly, None otherwise. """
+        authorization = request.headers.get('Authorization', '')
+        match = re.fullmatch(r'HMAC ([^|]+)\|([^|]+)\|(\d+)\|([0-9a-f]+)', authorization)
+        if match is None or match.group(1) != self.key:
+            return 401, error('The api key is missing or invalid')
+        _, timestamp, nonce, digest = match.groups()
+        if digest != self.digest(timestamp, nonce, request, request.headers.get('X-Idempotency-ID', '')):
+            return 401, error('The signature is invalid')
+        if self.check_nonces:
+            return self.use_nonce(int(nonce))
+        return None
+
+    def use_nonce(self, nonce: int) -> Optional[Tuple[int, Any]]:
+        with self.lock:
+            if nonce in self.used_nonces or nonce <= self.highest_used_nonce - self.nonce_window:
+                self.rejected_nonces += 1
+                return 401, error(f'The nonce is too low. The highest used nonce is {self.highest_used_nonce}')
+            self.used_nonces.add(nonce)
+            self.highest_used_nonce = max(self.highest_used_nonce, nonce)
+        return None
+
+    def dispatch(self, request: StubRequest) -> Tuple:
+        with self.lock:
+            self.requests.append(request)
+        failure = self.authenticate(request)
+        if failure is not None:
+            return failure
+        for method, pattern, handler in self.routes:
+            match = pattern.match(request.route) if method == request.method else None
+            if match is not None:
+                request.match = match
+                return handler(request)
+        return 404, error(f'{request.method} {request.route} not found')
+
+    def handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keeps connections open between requests, like the api
+            protocol_version = 'HTTP/1.1'
+            # headers and body are written separately, which Nagle's algorithm would delay by a round trip
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with api.lock:
+                    api.connections += 1
+
+            def handle_request(self):
+                url = urlsplit(self.path)
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                prefix = f'/{api.api_version}/'
+                route = url.path[len(prefix):] if url.path.startswith(prefix) else url.path
+                request = StubRequest(
+                    self.command, url.path, route, parse_qsl(url.query, keep_blank_values=True), self.headers, body)
+                status, content, *headers = api.dispatch(request)
+                response_body = b'' if content is None else json.dumps(content).encode()
+                self.send_response(status)
+                for name, value in (headers[0] if headers else {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response_body)))
+                self.end_headers()
+                self.wfile.write(response_body)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = handle_request
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={'poll_interval': 0.05}, name='stub-api', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def error(message: str) -> Dict[str, Any]:
+    return {'errors': [{'message': message}]}
@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime, timezone
+import threading
+
+import pytest
+
+from exchange_api.async_client import AsyncClient
+from exchange_api.exceptions import UnexpectedStatusCode
+from exchange_api.reference_cache import VenueIdCache
+from tests.test_client import fail_on, pages
+
+TRADE = dict(
+    trade_id='abc123', side='Sell', base_symbol='XBT', term_symbol='USD', dealt='12.345678', rate='11201.72',
+    counter='138292.83', counterparty_id='987654', liquidity_indicator=None, venue_fee='0', venue_fee_symbol=None,
+    notes=None, execution_date=datetime(2020, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc))
+
+
+def test_submit_trade_resolves_the_venue_id_without_context_manager(api):
+    api.route('GET', 'api-key', lambda request: (200, {'venueIdentifier': '123456'}))
+    api.route('POST', 'trades', lambda request: (200, request.json))
+
+    async def submit():
+        client = AsyncClient(api.key, api.secret, api.url, None)
+        try:
+            return await client.submit_trade(**TRADE)
+        finally:
+            await client.close()
+
+    trade = asyncio.run(submit())
+    # the example of trade_hash.py
+    assert trade['tradeHash'] == '1d0b0b4ab7a8bb2c28062323efae4e4270c478daf65bdffdb97f0c1c08287305'
+
+
+def test_unresolved_venue_id_is_an_error(api):
+    client = AsyncClient(api.key, api.secret, api.url, None)
+    with pytest.raises(RuntimeError):
+        client.trade_payload(**TRADE)
+
+
+def test_concurrent_callers_share_one_venue_id_lookup(api):
+    api.route('GET', 'api-key', lambda request: (200, {'venueIdentifier': '123456'}))
+
+    async def resolve():
+        client = AsyncClient(api.key, api.secret, api.url, None)
+        try:
+            return await asyncio.gather(*(client.resolve_venue_id() for _ in range(5)))
+        finally:
+            await client.close()
+
+    assert asyncio.run(resolve()) == ['123456'] * 5
+    assert len(api.requests) == 1
+
+
+def test_venue_id_cache_is_read_and_written_off_the_event_loop(api, tmp_path):
+    api.route('GET', 'api-key', lambda request: (200, {'venueIdentifier': '123456'}))
+    threads = []
+
+    class RecordingCache(VenueIdCache):
+        def load_all(self):
+            threads.append(threading.current_thread())
+            return super().load_all()
+
+    async def resolve():
+        client = AsyncClient(
+            api.key, api.secret, api.url, None, venue_id_cache=RecordingCache(str(tmp_path / 'venues.json')))
+        try:
+            return await client.resolve_venue_id()
+        finally:
+            await client.close()
+
+    assert asyncio.run(resolve()) == '123456'
+    assert asyncio.run(resolve()) == '123456'
+    # looked up from the api once, then from the file
+    assert len(api.requests) == 1
+    assert threads and threading.main_thread() not in threads
+
+
+def iter_trades(api, **kwargs):
+    async def run():
+        client = AsyncClient(api.key, api.secret, api.url, None, venue_id='venue')
+        received = []
+        try:
+            async for trade in client.iter_trades(**kwargs):
+                received.append(trade)
+        except UnexpectedStatusCode as e:
+            return received, e
+        finally:
+            await client.close()
+        return received, None
+
+    return asyncio.run(asyncio.wait_for(run(), 5))
+
+
+def test_iter_trades_yields_every_page_in_order(api):
+    trades = [{'identifier': str(i)} for i in range(25)]
+    api.route('GET', 'trades', pages('trades', 'continuationToken', 'continuationToken', trades, 10))
+    for prefetch in (True, False):
+        api.requests.clear()
+        assert iter_trades(api, prefetch=prefetch) == (trades, None)
+        assert [request.params.get('continuationToken') for request in api.requests] == [None, '10', '20']
+
+
+def test_iter_trades_raises_the_error_of_a_prefetched_page(api):
+    trades = [{'identifier': str(i)} for i in range(25)]
+    api.route('GET', 'trades', fail_on('10', pages('trades', 'continuationToken', 'continuationToken', trades, 10)))
+    received, error = iter_trades(api)
+    assert received == trades[:10]
+    assert error.status_code == 400
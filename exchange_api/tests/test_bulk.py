@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+import threading
+
+from exchange_api.bulk import BulkSubmitStats, submit_trades
+from exchange_api.client import Client
+from exchange_api.retry import NO_RETRIES
+from exchange_api.trade_hashing import trade_hash
+
+EXECUTION_DATE = datetime(2020, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc)
+
+
+def trades(count):
+    for i in range(count):
+        yield dict(
+            trade_id=f'trade-{i}', side='Buy' if i % 2 else 'Sell', base_symbol='XBT', term_symbol='USD',
+            dealt=f'{i}.5', rate='11201.72', counter=f'{i * 11201.72 + 5600.86:.2f}', counterparty_id='987654',
+            liquidity_indicator=None, venue_fee='0', venue_fee_symbol=None, notes=None,
+            execution_date=EXECUTION_DATE + timedelta(seconds=i))
+
+
+class TradesApi:
+    """ Books trades by idempotency id, like the api, and loses the response of every 5th trade the first time. """
+
+    def __init__(self):
+        self.booked = {}
+        self.by_idempotency_id = {}
+        self.lock = threading.Lock()
+
+    def submit(self, request):
+        trade = request.json
+        with self.lock:
+            idempotency_id = request.headers['X-Idempotency-ID']
+            if idempotency_id in self.by_idempotency_id:
+                return 200, self.by_idempotency_id[idempotency_id]
+            self.booked.setdefault(trade['identifier'], []).append(trade)
+            self.by_idempotency_id[idempotency_id] = trade
+        if int(trade['identifier'].split('-')[1]) % 5 == 0:
+            return 503, {'errors': [{'message': 'Service unavailable'}]}
+        return 200, trade
+
+
+def test_submit_trades_in_order_without_booking_twice(api):
+    trades_api = TradesApi()
+    api.route('POST', 'trades', trades_api.submit)
+    stats = BulkSubmitStats()
+    with Client(api.key, api.secret, api.url, None, venue_id='123456', retry_policy=NO_RETRIES) as client:
+        submissions = list(submit_trades(
+            client, trades(100), max_in_flight=8, max_attempts=2, retry_interval=0, stats=stats))
+
+    assert [s.trade_id for s in submissions] == [f'trade-{i}' for i in range(100)]
+    assert all(s.ok for s in submissions)
+    assert all(len(booked) == 1 for booked in trades_api.booked.values())
+    assert len(trades_api.booked) == 100
+    assert (stats.submitted, stats.failed, stats.retries) == (100, 0, 20)
+
+    trade = next(trades(1))
+    assert submissions[0].response['tradeHash'] == trade_hash(
+        '123456', trade['counterparty_id'], trade['trade_id'], trade['side'], trade['base_symbol'],
+        trade['term_symbol'], trade['dealt'], trade['rate'], trade['counter'], trade['execution_date'])
+
+
+def test_failures_are_reported_per_trade(api):
+    api.route('POST', 'trades', lambda request: (400, {'errors': [{'message': 'Invalid trade'}]}))
+    stats = BulkSubmitStats()
+    with Client(api.key, api.secret, api.url, None, venue_id='123456', retry_policy=NO_RETRIES) as client:
+        submissions = list(client.submit_trades(trades(10), max_attempts=3, stats=stats))
+    assert [s.error.status_code for s in submissions] == [400] * 10
+    assert (stats.submitted, stats.failed, stats.retries) == (0, 10, 0)
+
+
+def test_failed_trades_are_resubmitted_if_the_retry_policy_allows(api):
+    # the first response for each trade
+    responses = {'trade-0': (429, {'errors': []}), 'trade-1': (400, {'errors': []})}
+    api.route('POST', 'trades', lambda request: responses.pop(request.json['identifier'], (200, request.json)))
+    with Client(api.key, api.secret, api.url, None, venue_id='venue', retry_policy=NO_RETRIES) as client:
+        submissions = list(submit_trades(client, trades(2), max_in_flight=1, max_attempts=2, retry_interval=0))
+    # the 429 is submitted again with the same idempotency id, the 400 is not
+    assert [submission.ok for submission in submissions] == [True, False]
+    idempotency_ids = [request.headers['X-Idempotency-ID'] for request in api.requests]
+    assert len(idempotency_ids) == 3 and idempotency_ids[0] == idempotency_ids[1] != idempotency_ids[2]
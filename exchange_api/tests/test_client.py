@@ -0,0 +1,204 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import socket
+from time import monotonic
+
+import pytest
+import requests
+
+from exchange_api.client import Client
+from exchange_api.exceptions import UnexpectedStatusCode
+from exchange_api.retry import RetryBudget, RetryPolicy
+from exchange_api.waiting import wait_until
+
+
+def test_requests_reuse_pooled_connections(api, client):
+    api.route('GET', 'symbols', lambda request: (200, [{'symbol': 'BTC'}]))
+    for _ in range(20):
+        assert client.list_symbols() == [{'symbol': 'BTC'}]
+    assert api.connections == 1
+    assert list(client.connection_stats().values()) == [{'connections': 1, 'requests': 20}]
+
+
+def test_without_keep_alive_every_request_opens_a_connection(api):
+    api.route('GET', 'symbols', lambda request: (200, []))
+    with Client(api.key, api.secret, api.url, None, venue_id='venue', keep_alive=False) as client:
+        for _ in range(5):
+            client.list_symbols()
+    assert api.connections == 5
+
+
+def test_every_verb_is_signed(api, client):
+    api.route('POST', 'trades', lambda request: (200, request.json))
+    api.route('PATCH', 'customers/(?P<id>[^/]+)', lambda request: (200, {'identifier': request.match['id']}))
+    api.route('DELETE', 'trades/(?P<id>[^/]+)', lambda request: (204, None))
+    api.route('GET', 'settlements', lambda request: (200, [request.params]))
+
+    assert client.post('trades', data={'identifier': 'abc'}) == {'identifier': 'abc'}
+    assert client.change_customer('123', custodian_id='c') == {'identifier': '123'}
+    assert client.cancel_trade('abc') is None
+    assert client.list_settlements(from_dt='2020-01-02T03:04:05.678+00:00') == [
+        {'from': '2020-01-02T03:04:05.678+00:00'}]
+
+
+def test_unexpected_status_code(api, client):
+    with pytest.raises(UnexpectedStatusCode) as e:
+        client.get_customer('missing')
+    assert e.value.status_code == 404
+
+
+def pages(array_key, next_page_key, next_page_param, records, page_size):
+    def page(request):
+        start = int(request.params.get(next_page_param) or 0)
+        content = {array_key: records[start:start + page_size]}
+        if start + page_size < len(records):
+            content[next_page_key] = start + page_size
+        return 200, content
+    return page
+
+
+def test_streamed_list_trades_follows_the_continuation_token(api, client):
+    trades = [{'identifier': str(i)} for i in range(25)]
+    api.route('GET', 'trades', pages('trades', 'continuationToken', 'continuationToken', trades, 10))
+    assert list(client.list_trades(stream=True)) == trades
+    assert [request.params.get('continuationToken') for request in api.requests] == [None, '10', '20']
+
+
+def test_streamed_list_webhooks_follows_the_next_sequence_number(api, client):
+    webhooks = [{'sequenceNumber': i, 'type': 'CustomerStatusChanged'} for i in range(7)]
+    api.route('GET', 'webhooks', pages('webhooks', 'nextWebhookSequenceNumber', 'fromSequenceNumber', webhooks, 3))
+    assert list(client.list_webhooks(stream=True, fields=['sequenceNumber'])) == [
+        {'sequenceNumber': i} for i in range(7)]
+    assert len(api.requests) == 3
+
+
+def fail_on(token, handler):
+    def page(request):
+        if request.params.get('continuationToken') == token:
+            return 400, {'errorMessage': 'bad continuation token'}
+        return handler(request)
+    return page
+
+
+def test_iter_trades_yields_every_page_in_order(api, client):
+    trades = [{'identifier': str(i)} for i in range(25)]
+    api.route('GET', 'trades', pages('trades', 'continuationToken', 'continuationToken', trades, 10))
+    for prefetch in (True, False):
+        api.requests.clear()
+        assert list(client.iter_trades(prefetch=prefetch)) == trades
+        # and stops after the page without a continuation token
+        assert [request.params.get('continuationToken') for request in api.requests] == [None, '10', '20']
+
+
+def test_iter_trades_prefetches_the_next_page(api, client):
+    trades = [{'identifier': str(i)} for i in range(20)]
+    api.route('GET', 'trades', pages('trades', 'continuationToken', 'continuationToken', trades, 10))
+    iterator = client.iter_trades()
+    assert next(iterator) == trades[0]
+    # the second page is requested while the first one is still being consumed
+    wait_until(lambda requests: requests == 2, lambda: len(api.requests), timeout=5, initial_interval=0.01)
+    assert list(iterator) == trades[1:]
+    assert len(api.requests) == 2
+
+
+def test_iter_trades_raises_the_error_of_a_prefetched_page(api, client):
+    trades = [{'identifier': str(i)} for i in range(25)]
+    api.route('GET', 'trades', fail_on('10', pages('trades', 'continuationToken', 'continuationToken', trades, 10)))
+    received = []
+    with pytest.raises(UnexpectedStatusCode) as e:
+        for trade in client.iter_trades():
+            received.append(trade)
+    assert e.value.status_code == 400
+    # the trades of the first page were all yielded before the error
+    assert received == trades[:10]
+
+
+def fast_retries(**kwargs):
+    return RetryPolicy(initial_interval=0.001, max_interval=0.01, **kwargs)
+
+
+def failing(statuses, content=None, headers=None):
+    """ Answers with each of `statuses` in turn, then with 200 and `content` (the request body if None). """
+    statuses = list(statuses)
+
+    def handler(request):
+        if statuses:
+            return statuses.pop(0), {'errors': []}, headers or {}
+        return 200, request.json if content is None else content
+    return handler
+
+
+def test_retries_keep_the_idempotency_id_and_sign_again(api):
+    api.route('POST', 'trades', failing([503, 502, 500]))
+    with Client(api.key, api.secret, api.url, None, venue_id='venue', retry_policy=fast_retries()) as client:
+        assert client.post('trades', data={'identifier': 'abc'}) == {'identifier': 'abc'}
+        assert client.retry_stats == {'retries': 3, 'exhausted': 0, 'budget_exhausted': 0}
+    assert len({request.headers['X-Idempotency-ID'] for request in api.requests}) == 1
+    assert len({request.headers['Authorization'] for request in api.requests}) == 4
+
+
+def test_429_is_retried_after_the_retry_after_header(api):
+    api.route('GET', 'symbols', failing([429], [], {'Retry-After': '0.2'}))
+    with Client(api.key, api.secret, api.url, None, venue_id='venue', retry_policy=fast_retries()) as client:
+        start = monotonic()
+        assert client.list_symbols() == []
+        assert monotonic() - start >= 0.2
+    assert len(api.requests) == 2
+
+
+def test_too_long_retry_after_is_not_waited_for(api):
+    api.route('GET', 'symbols', failing([503], [], {'Retry-After': '120'}))
+    with Client(api.key, api.secret, api.url, None, venue_id='venue', retry_policy=fast_retries()) as client:
+        with pytest.raises(UnexpectedStatusCode) as e:
+            client.list_symbols()
+    assert e.value.retry_after == '120'
+    assert len(api.requests) == 1
+
+
+def test_retry_after_as_http_date():
+    e = UnexpectedStatusCode('', 503, None, format_datetime(datetime.now(timezone.utc) + timedelta(seconds=10), True))
+    assert 8 < RetryPolicy.retry_after(e) <= 10
+    assert RetryPolicy.retry_after(UnexpectedStatusCode('', 503, None, 'soon')) is None
+
+
+def test_client_errors_are_not_retried(api):
+    api.route('POST', 'trades', failing([400]))
+    with Client(api.key, api.secret, api.url, None, venue_id='venue', retry_policy=fast_retries()) as client:
+        with pytest.raises(UnexpectedStatusCode):
+            client.post('trades', data={'identifier': 'abc'})
+    assert len(api.requests) == 1
+
+
+def test_retries_stop_after_max_attempts(api):
+    api.route('GET', 'symbols', failing([500] * 10))
+    with Client(api.key, api.secret, api.url, None, venue_id='venue',
+                retry_policy=fast_retries(max_attempts=3)) as client:
+        with pytest.raises(UnexpectedStatusCode):
+            client.list_symbols()
+        assert client.retry_stats == {'retries': 2, 'exhausted': 1, 'budget_exhausted': 0}
+    assert len(api.requests) == 3
+
+
+def test_transport_errors_are_retried():
+    # a port nothing listens on
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    with Client('key', 'secret', f'http://127.0.0.1:{port}', None, venue_id='venue',
+                retry_policy=fast_retries(max_attempts=3)) as client:
+        with pytest.raises(requests.ConnectionError):
+            client.list_symbols()
+        assert client.retry_stats == {'retries': 2, 'exhausted': 1, 'budget_exhausted': 0}
+
+
+def test_retry_budget_limits_retries(api):
+    api.route('GET', 'symbols', failing([503] * 10))
+    with Client(api.key, api.secret, api.url, None, venue_id='venue', retry_policy=fast_retries()) as client:
+        # one retry in the budget, and no more added by requests or over time
+        client.retry_budget = RetryBudget(ratio=0, min_retries_per_second=0, max_tokens=1)
+        for _ in range(2):
+            with pytest.raises(UnexpectedStatusCode):
+                client.list_symbols()
+        assert client.retry_stats == {'retries': 1, 'exhausted': 0, 'budget_exhausted': 2}
+    assert len(api.requests) == 3
+
@@ -0,0 +1,123 @@
+import asyncio
+from time import sleep
+from urllib.request import urlopen
+
+import pytest
+
+from exchange_api.async_client import AsyncClient
+from exchange_api.exceptions import UnexpectedStatusCode
+from exchange_api.instrumentation import REDACTED, Instrumentation, RequestEvent, RequestMetrics, route_template
+from exchange_api.rate_limiting import ConcurrencyLimiter
+
+
+def test_route_template():
+    assert route_template('trades/abc123') == 'trades/{id}'
+    assert route_template('customers/123/deposits/456') == 'customers/{id}/deposits/{id}'
+    assert route_template('settlement-plans/1/settle') == 'settlement-plans/{id}/settle'
+
+
+def test_hooks_see_redacted_credentials(api, client):
+    api.route('POST', 'trades', lambda request: (200, request.json))
+    events = []
+    client.instrumentation = Instrumentation().add(before_request=events.append)
+    assert client.post('trades', data={'identifier': 'abc'}) == {'identifier': 'abc'}
+    assert events[0].headers['Authorization'] == REDACTED
+    assert events[0].headers['X-Idempotency-ID']
+    # the request itself was signed with the real header
+    assert api.requests[0].headers['Authorization'].startswith('HMAC key|')
+
+
+def test_settlement_signatures_are_redacted():
+    data = {'signedSettlementFlowHash': 'MEUCIQ', 'identifier': '1'}
+    event = RequestEvent('POST', 'settlement-plans/1/settle', None, data)
+    assert event.data == {'signedSettlementFlowHash': REDACTED, 'identifier': '1'}
+    assert data['signedSettlementFlowHash'] == 'MEUCIQ'
+    plain = {'identifier': '1'}
+    assert RequestEvent('POST', 'trades', None, plain).data is plain
+
+
+def test_metrics_per_route_template(api, client):
+    api.route('GET', 'trades/(?P<id>[^/]+)', lambda request: (200, {'identifier': request.match['id']}))
+    metrics = RequestMetrics()
+    client.instrumentation = metrics.install(Instrumentation())
+    for i in range(3):
+        client.get_trade(str(i))
+    with pytest.raises(UnexpectedStatusCode):
+        client.get_customer('missing')
+    assert metrics.histogram('GET', 'trades/{id}').count == 3
+    assert metrics.requests == {('GET', 'trades/{id}', '200'): 3, ('GET', 'customers/{id}', '404'): 1}
+    text = metrics.prometheus_text()
+    assert 'exchange_api_requests_total{method="GET",route="trades/{id}",status="200"} 3' in text
+
+
+def test_async_queue_phase_includes_waiting_for_a_slot(api):
+    def slow(request):
+        sleep(0.1)
+        return 200, []
+
+    api.route('GET', 'symbols', slow)
+    events = []
+
+    async def run():
+        client = AsyncClient(
+            api.key, api.secret, api.url, None, venue_id='venue', concurrency_limiter=ConcurrencyLimiter(1, 1, 1),
+            instrumentation=Instrumentation().add(after_response=lambda event, content: events.append(event)))
+        try:
+            await asyncio.gather(client.list_symbols(), client.list_symbols())
+        finally:
+            await client.close()
+
+    asyncio.run(run())
+    assert max(event.queue for event in events) >= 0.05
+
+
+def test_exporter_binds_to_localhost():
+    server = RequestMetrics().serve(port=0)
+    try:
+        host, port = server.server_address[:2]
+        assert host == '127.0.0.1'
+        with urlopen(f'http://{host}:{port}/metrics') as response:
+            assert response.read().startswith(b'# TYPE exchange_api_request_duration_seconds histogram')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_raising_hooks_do_not_fail_or_resend_the_request(api, client):
+    def broken(*args):
+        raise ValueError('broken hook')
+
+    api.route('POST', 'trades', lambda request: (200, request.json))
+    api.route('GET', 'customers/(?P<id>[^/]+)', lambda request: (404, {'errorMessage': 'not found'}))
+    errors, hook_errors = [], []
+    client.instrumentation = Instrumentation(on_hook_error=lambda hook, e: hook_errors.append(e)).add(
+        before_request=broken, after_response=broken, on_error=broken)
+    client.instrumentation.add(on_error=lambda event, e: errors.append(e))
+    assert client.post('trades', data={'identifier': 'abc'}) == {'identifier': 'abc'}
+    assert len(api.requests) == 1
+    assert errors == []
+    # the request's own error is raised, not the hook's
+    with pytest.raises(UnexpectedStatusCode):
+        client.get_customer('missing')
+    assert len(errors) == 1
+    assert client.instrumentation.hook_errors == 4
+    assert [str(e) for e in hook_errors] == ['broken hook'] * 4
+
+
+def test_async_raising_hooks_do_not_fail_the_request(api):
+    def broken(*args):
+        raise ValueError('broken hook')
+
+    api.route('POST', 'trades', lambda request: (200, request.json))
+    instrumentation = Instrumentation().add(before_request=broken, after_response=broken, on_error=broken)
+
+    async def run():
+        client = AsyncClient(api.key, api.secret, api.url, None, venue_id='venue', instrumentation=instrumentation)
+        try:
+            return await client.post('trades', data={'identifier': 'abc'})
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()) == {'identifier': 'abc'}
+    assert len(api.requests) == 1
+    assert instrumentation.hook_errors == 2
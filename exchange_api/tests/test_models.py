@@ -0,0 +1,36 @@
+from decimal import Decimal
+import json
+
+import pytest
+
+from exchange_api.models import TradeInfo, TradeList
+
+TRADE = {
+    'baseSymbol': 'XXBT', 'counter': '100000.00000000', 'counterpartyIdentifier': '123456', 'dealt': '10',
+    'executionDate': '2020-09-07T11:17:23.456+00:00', 'identifier': 'venue-trade-identifier',
+    'liquidityIndicator': 'Aggressive', 'notes': 'Trade notes', 'rate': '10000.00000000',
+    'receivedDate': '2020-09-07T11:17:24.000+00:00', 'settlementNumber': 'KRKN-000001', 'side': 'Buy',
+    'source': 'source-api-key', 'status': 'Open', 'strikeFee': '0.02', 'strikeFeeSymbol': 'USD',
+    'strikeTradeId': 'strike-trade-id', 'termSymbol': 'ZUSD', 'tradeHash': 'hash', 'venueFee': '0.01',
+    'venueFeeSymbol': 'USD',
+}
+
+
+def test_records_read_like_the_response_dicts():
+    trade = TradeInfo.from_json(TRADE)
+    assert trade.to_json() == TRADE
+    assert trade['dealt'] == '10'
+    assert trade.dealt == Decimal('10')
+    assert trade.get('missing', 'default') == 'default'
+    assert not hasattr(trade, '__dict__')
+    with pytest.raises(AttributeError):
+        trade.status = 'Canceled'
+
+
+def test_nested_records_and_interning():
+    page = TradeList.from_json(json.loads(json.dumps({'continuationToken': None, 'trades': [TRADE, TRADE]})))
+    first, second = page['trades']
+    assert isinstance(first, TradeInfo)
+    # decoded separately, but repeated strings are kept once
+    assert first['baseSymbol'] is second['baseSymbol']
+    assert page.to_json() == {'continuationToken': None, 'trades': [TRADE, TRADE]}
@@ -0,0 +1,100 @@
+import multiprocessing
+import sys
+import threading
+
+import pytest
+
+from exchange_api.nonce import AtomicNonceAllocator, BlockNonceAllocator, FileNonceAllocator, SharedNonceAllocator
+
+THREADS = 16
+NONCES_PER_THREAD = 2000
+
+
+def allocators(tmp_path):
+    return {
+        'atomic': AtomicNonceAllocator(),
+        'block': BlockNonceAllocator(AtomicNonceAllocator(), block_size=64),
+        'shared': SharedNonceAllocator(),
+        'file': FileNonceAllocator(str(tmp_path / 'nonce')),
+    }
+
+
+def hammer(allocator, threads=THREADS, nonces_per_thread=NONCES_PER_THREAD, advance_every=0):
+    """ Takes nonces from `threads` threads at once, some of them reserving several at a time and, with
+    `advance_every`, moving the allocator forward in between. Returns the nonces taken by each thread. """
+    barrier = threading.Barrier(threads)
+    taken = [[] for _ in range(threads)]
+
+    def take(i):
+        barrier.wait()
+        for j in range(nonces_per_thread):
+            if advance_every and j % advance_every == 0:
+                allocator.advance_to(allocator.peek() + 10)
+            if j % 10 == 0:
+                first = allocator.reserve(3)
+                taken[i] += [first, first + 1, first + 2]
+            else:
+                taken[i].append(allocator.next())
+
+    workers = [threading.Thread(target=take, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return taken
+
+
+@pytest.mark.parametrize('name', ['atomic', 'block', 'shared', 'file'])
+@pytest.mark.parametrize('advance_every', [0, 50])
+def test_no_nonce_is_handed_out_twice_under_contention(tmp_path, name, advance_every):
+    allocator = allocators(tmp_path)[name]
+    nonces_per_thread = NONCES_PER_THREAD if name != 'file' else NONCES_PER_THREAD // 10
+    taken = hammer(allocator, nonces_per_thread=nonces_per_thread, advance_every=advance_every)
+    nonces = [nonce for thread_nonces in taken for nonce in thread_nonces]
+    assert len(nonces) == len(set(nonces))
+    # every allocator hands out increasing nonces within a thread
+    for thread_nonces in taken:
+        assert thread_nonces == sorted(thread_nonces)
+
+
+def test_advance_to_never_moves_backwards():
+    allocator = AtomicNonceAllocator(100)
+    assert not allocator.advance_to(50)
+    assert allocator.next() == 100
+    assert allocator.advance_to(200)
+    assert allocator.next() == 200
+
+
+def take_in_process(allocator_factory, count, queue):
+    allocator = allocator_factory()
+    queue.put([allocator.next() for _ in range(count)])
+
+
+class FileAllocatorFactory:
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self):
+        # every process opens the file itself, like unrelated workers of a gateway
+        return FileNonceAllocator(self.path)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs fork')
+@pytest.mark.parametrize('name', ['shared', 'file'])
+def test_no_nonce_is_handed_out_twice_across_processes(tmp_path, name):
+    context = multiprocessing.get_context('fork')
+    if name == 'shared':
+        shared = SharedNonceAllocator()
+        factory = lambda: shared  # noqa: E731, inherited by the forked processes
+    else:
+        factory = FileAllocatorFactory(str(tmp_path / 'nonce'))
+    queue = context.Queue()
+    processes = [context.Process(target=take_in_process, args=(factory, 500, queue)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    taken = [queue.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join()
+    nonces = [nonce for process_nonces in taken for nonce in process_nonces]
+    assert len(nonces) == 2000
+    assert len(set(nonces)) == 2000
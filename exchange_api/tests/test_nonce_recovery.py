@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+
+from exchange_api.client import Client
+from exchange_api.exceptions import UnexpectedStatusCode
+
+from .stub_server import StubApi
+
+THREADS = 16
+
+
+@pytest.fixture
+def stale_api():
+    # the api key was used by another process up to nonce 10000, the client starts over at 1
+    with StubApi(check_nonces=True, nonce_window=1000, highest_used_nonce=10000) as api:
+        api.route('GET', 'symbols', lambda request: (200, []))
+        yield api
+
+
+def test_concurrent_nonce_too_low_failures_resync_once(stale_api):
+    with Client(stale_api.key, stale_api.secret, stale_api.url, None, venue_id='venue',
+                pool_maxsize=THREADS) as client:
+        barrier = threading.Barrier(THREADS)
+
+        def request(_):
+            barrier.wait()
+            return client.list_symbols()
+
+        with ThreadPoolExecutor(THREADS) as executor:
+            assert list(executor.map(request, range(THREADS))) == [[]] * THREADS
+
+        stats = client.nonce_stats
+        # only the first failure moves the allocator, the others are just signed again
+        assert stats['resyncs'] == 1
+        assert stats['coalesced_resyncs'] == stats['retries'] - 1
+        assert stats['retries'] == stale_api.rejected_nonces
+        assert stats['retries_exhausted'] == 0
+        assert client.counter_nonce > 10000
+
+
+def test_nonce_retries_are_bounded(stale_api):
+    with Client(stale_api.key, stale_api.secret, stale_api.url, None, venue_id='venue',
+                max_nonce_retries=0) as client:
+        with pytest.raises(UnexpectedStatusCode) as e:
+            client.list_symbols()
+        assert e.value.status_code == 401
+        assert client.nonce_stats['retries_exhausted'] == 1
+        assert len(stale_api.requests) == 1
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from exchange_api.async_client import AsyncClient
+from exchange_api.rate_limiting import ConcurrencyLimiter
+
+
+def test_latency_baseline_is_kept_per_endpoint_class():
+    limiter = ConcurrencyLimiter(initial_limit=8)
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release(0.01, False, 'trades')
+    # ten times slower than trade submissions, but not slower than reporting itself
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release(0.1, False, 'reporting')
+    assert limiter.stats['decreases'] == 0
+    assert limiter.metrics()['min_latency'] == {'trades': 0.01, 'reporting': 0.1}
+
+    # reporting slowing down to several times its own baseline does count
+    for _ in range(5):
+        limiter.acquire()
+        limiter.release(1.0, False, 'reporting')
+    assert limiter.stats['decreases'] == 1
+
+
+def test_request_that_was_never_sent_frees_its_slot_without_a_latency_sample():
+    limiter = ConcurrencyLimiter(initial_limit=1)
+    limiter.acquire()
+    limiter.release(None, False, 'trades')
+    assert limiter.in_flight == 0
+    assert limiter.min_latency == {}
+    assert limiter.try_acquire()
+
+
+def test_streamed_get_holds_a_slot_until_the_stream_is_consumed(api, client):
+    trades = [{'identifier': str(i)} for i in range(3)]
+    api.route('GET', 'trades', lambda request: (200, {'trades': trades}))
+    client.concurrency_limiter = limiter = ConcurrencyLimiter()
+    stream = client.list_trades(stream=True)
+    assert next(stream) == trades[0]
+    assert limiter.in_flight == 1
+    assert list(stream) == trades[1:]
+    assert limiter.in_flight == 0
+    assert list(limiter.min_latency) == ['trades']
+
+
+def test_failure_before_sending_does_not_leak_the_slot(api, client):
+    def fail(*args, **kwargs):
+        raise ValueError('signing failed')
+
+    client.concurrency_limiter = limiter = ConcurrencyLimiter(initial_limit=1)
+    client.get_headers = fail
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            client.list_symbols()
+        with pytest.raises(ValueError):
+            list(client.list_trades(stream=True))
+    assert limiter.in_flight == 0
+
+
+def test_async_failure_before_sending_does_not_leak_the_slot(api):
+    def fail(*args, **kwargs):
+        raise ValueError('signing failed')
+
+    async def run():
+        client = AsyncClient(api.key, api.secret, api.url, None, venue_id='venue', concurrency_limiter=limiter)
+        client.get_headers = fail
+        try:
+            for _ in range(3):
+                with pytest.raises(ValueError):
+                    await client.list_symbols()
+        finally:
+            await client.close()
+
+    limiter = ConcurrencyLimiter(initial_limit=1)
+    asyncio.run(asyncio.wait_for(run(), 5))
+    assert limiter.in_flight == 0
@@ -0,0 +1,114 @@
+import os
+import threading
+from time import sleep
+
+from exchange_api.client import Client
+from exchange_api.reference_cache import ReferenceCache, VenueIdCache
+
+SYMBOLS = [
+    {'symbol': 'BTC', 'custodianSymbols': [{'custodianIdentifier': 'c1'}, {'custodianIdentifier': 'c2'}]},
+    {'symbol': 'ETH', 'custodianSymbols': [{'custodianIdentifier': 'c1'}, {'custodianIdentifier': 'c1'}]},
+]
+
+
+def test_entries_expire_after_their_ttl():
+    cache = ReferenceCache(ttl=0.1)
+    cache.set(('symbols',), 'symbols')
+    cache.set(('custodians',), 'custodians', ttl=10)
+    assert cache.get(('symbols',)) == (True, 'symbols')
+    sleep(0.15)
+    assert cache.get(('symbols',)) == (False, None)
+    assert cache.get(('custodians',)) == (True, 'custodians')
+    assert len(cache) == 1
+    assert cache.stats == {'hits': 2, 'misses': 1, 'evictions': 0, 'expirations': 1}
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ReferenceCache(max_entries=2)
+    cache.set(('a',), 1)
+    cache.set(('b',), 2)
+    # reading a makes b the least recently used entry
+    assert cache.get(('a',)) == (True, 1)
+    cache.set(('c',), 3)
+    assert cache.get(('b',)) == (False, None)
+    assert cache.get(('a',)) == (True, 1)
+    assert cache.get(('c',)) == (True, 3)
+    assert cache.stats['evictions'] == 1
+
+
+def test_get_or_load_only_loads_on_a_miss():
+    cache = ReferenceCache()
+    loads = []
+    for _ in range(3):
+        assert cache.get_or_load(('symbols',), lambda: loads.append(1) or 'symbols') == 'symbols'
+    assert len(loads) == 1
+    assert cache.stats['hits'] == 2 and cache.stats['misses'] == 1
+
+
+def test_invalidate_by_key_prefix():
+    cache = ReferenceCache()
+    for key in [('custodians',), ('custodians', 'c1'), ('custodians', 'c2'), ('symbols',)]:
+        cache.set(key, key)
+    cache.invalidate('custodians', 'c1')
+    assert sorted(cache.entries) == [('custodians',), ('custodians', 'c2'), ('symbols',)]
+    cache.invalidate('custodians')
+    assert list(cache.entries) == [('symbols',)]
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_client_reads_reference_data_through_the_cache(api, client):
+    api.route('GET', 'symbols', lambda request: (200, SYMBOLS))
+    client.reference_cache = cache = ReferenceCache()
+    assert client.list_symbols() == SYMBOLS
+    assert client.list_symbols() == SYMBOLS
+    assert len(api.requests) == 1
+    # get() options bypass the cache
+    assert client.list_symbols(fields=['symbol']) == [{'symbol': 'BTC'}, {'symbol': 'ETH'}]
+    assert len(api.requests) == 2
+
+    by_custodian = client.symbols_by_custodian()
+    assert by_custodian == {'c1': SYMBOLS, 'c2': SYMBOLS[:1]}
+    assert client.symbols_by_custodian() is by_custodian
+    assert len(api.requests) == 2
+    # the index is invalidated with the symbols it was built from
+    cache.invalidate('symbols')
+    assert client.symbols_by_custodian() == by_custodian
+    assert len(api.requests) == 3
+
+
+def test_clients_of_different_environments_do_not_share_entries(api, client):
+    api.route('GET', 'api-key', lambda request: (200, {'venueIdentifier': 'venue'}))
+    client.reference_cache = cache = ReferenceCache()
+    other = Client(api.key, api.secret, api.url.replace('127.0.0.1', 'localhost'), None, venue_id='venue',
+                   reference_cache=cache)
+    with other:
+        for _ in range(2):
+            client.get_api_key()
+            other.get_api_key()
+    assert len(api.requests) == 2
+    assert len(cache) == 2
+
+
+def test_venue_ids_saved_concurrently_from_threads(tmp_path):
+    cache = VenueIdCache(str(tmp_path / 'venue-ids.json'))
+    errors = []
+
+    def save(i):
+        try:
+            for j in range(20):
+                cache.save('http://localhost', f'key-{i}-{j}', str(i))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    # the last writer wins, but the file is always complete and no temporary files are left behind
+    assert cache.load_all()
+    assert os.listdir(tmp_path) == ['venue-ids.json']
+    cache.save('http://localhost', 'key', '123456')
+    assert cache.load('http://localhost', 'key') == '123456'
@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+import hashlib
+import json
+
+from exchange_api.request_signing import RequestSigner
+
+
+def naive_digest(key, secret, timestamp, nonce, request_type, route, params, data, idempotency_id):
+    # how every request was signed before the signing context, see auth.py
+    params_str = '' if not params else '&'.join(f'{k}={v}' for k, v in params.items() if v is not None)
+    json_str = '' if not data else json.dumps(data)
+    content = f'{key}|{secret}|{timestamp}|{nonce}|{request_type}|{route}|{params_str}|{json_str}|{idempotency_id}'
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def test_digest_matches_the_naive_digest():
+    signer = RequestSigner('key', 'secret')
+    data = {'identifier': 'abc123', 'dealt': '12.345678'}
+    params = {'from': '2020-01-02T03:04:05.678+00:00', 'to': None}
+    for request_type, route, params, data, idempotency_id in (
+            ('GET', '/v1/trades', params, None, None),
+            ('POST', '/v1/trades', None, data, 'idempotency-id'),
+            ('DELETE', '/v1/trades/abc123', None, None, 'idempotency-id')):
+        body = json.dumps(data).encode() if data else None
+        expected = naive_digest(
+            'key', 'secret', '2020-01-02T03:04:05Z', 7, request_type, route, params, data, idempotency_id or '')
+        assert signer.digest('2020-01-02T03:04:05Z', 7, request_type, route, signer.params_string(params), body,
+                             idempotency_id) == expected
+
+
+def test_timestamp_is_the_current_second():
+    before = datetime.now(timezone.utc).replace(microsecond=0)
+    timestamp = datetime.strptime(RequestSigner('key', 'secret').timestamp(), '%Y-%m-%dT%H:%M:%SZ')
+    after = datetime.now(timezone.utc)
+    assert before <= timestamp.replace(tzinfo=timezone.utc) <= after
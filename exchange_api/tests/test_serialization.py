@@ -0,0 +1,28 @@
+import json
+
+from exchange_api.serialization import iter_json_array, project_fields
+
+
+def chunked(document, size):
+    encoded = json.dumps(document).encode()
+    return [encoded[i:i + size] for i in range(0, len(encoded), size)]
+
+
+def test_iter_json_array_in_small_chunks():
+    page = {'continuationToken': 'token', 'trades': [{'identifier': str(i), 'dealt': 1.5 * i} for i in range(50)]}
+    for size in (1, 7, 1000):
+        assert list(iter_json_array(chunked(page, size), 'trades')) == page['trades']
+        assert list(iter_json_array(chunked(page['trades'], size))) == page['trades']
+
+
+def test_iter_json_array_decodes_the_other_keys_into_rest():
+    for page in ({'trades': [{'identifier': '1'}], 'continuationToken': 'after'},
+                 {'continuationToken': 'before', 'trades': [{'identifier': '1'}]}):
+        rest = {}
+        assert list(iter_json_array(chunked(page, 5), 'trades', rest)) == [{'identifier': '1'}]
+        assert rest == {'continuationToken': page['continuationToken']}
+
+
+def test_project_fields_keeps_the_continuation_token():
+    page = {'continuationToken': 'token', 'trades': [{'identifier': '1', 'dealt': '2'}]}
+    assert project_fields(page, ['identifier']) == {'continuationToken': 'token', 'trades': [{'identifier': '1'}]}
@@ -0,0 +1,44 @@
+import hashlib
+from base64 import b64decode
+
+from ecdsa import BadSignatureError, NIST256p, SigningKey
+from ecdsa.util import sigdecode_der
+import pytest
+
+from exchange_api.settlement_signing import HAS_CRYPTOGRAPHY, CryptographySigner, EcdsaSigner, SigningPool
+
+SIGNING_KEY = SigningKey.generate(curve=NIST256p, hashfunc=hashlib.sha256)
+PEM = SIGNING_KEY.to_pem().decode()
+FLOW_HASHES = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(50)]
+
+
+def verify(signature: str, message: str) -> bool:
+    return SIGNING_KEY.get_verifying_key().verify(
+        b64decode(signature), message.encode(), hashfunc=hashlib.sha256, sigdecode=sigdecode_der)
+
+
+@pytest.mark.parametrize('signer_type', [
+    EcdsaSigner,
+    pytest.param(CryptographySigner, marks=pytest.mark.skipif(not HAS_CRYPTOGRAPHY, reason='needs cryptography')),
+])
+def test_signatures_verify_against_the_same_public_key(signer_type):
+    signer = signer_type(PEM)
+    for flow_hash in FLOW_HASHES[:5]:
+        assert verify(signer.sign_b64(flow_hash), flow_hash)
+
+
+def test_signing_pool_keeps_the_order():
+    with SigningPool(EcdsaSigner(PEM), processes=2, min_batch_size=1) as pool:
+        signatures = pool.sign_many(FLOW_HASHES)
+    assert len(signatures) == len(FLOW_HASHES)
+    # ECDSA signatures are randomized, so the order is checked by verifying each against its own message
+    assert all(verify(signature, flow_hash) for signature, flow_hash in zip(signatures, FLOW_HASHES))
+    with pytest.raises(BadSignatureError):
+        verify(signatures[1], FLOW_HASHES[0])
+
+
+def test_small_batches_are_signed_in_process():
+    pool = SigningPool(EcdsaSigner(PEM), processes=2, min_batch_size=64)
+    signatures = pool.sign_many(FLOW_HASHES[:3])
+    assert pool.executor is None
+    assert all(verify(signature, flow_hash) for signature, flow_hash in zip(signatures, FLOW_HASHES))
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from exchange_api.client import Client
+from exchange_api.sharding import fetch_sharded, split_time_range
+
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def test_shards_cover_the_range_without_gaps_or_overlaps():
+    end = START + timedelta(days=1, microseconds=7)
+    for shards in (1, 3, 7, 8):
+        windows = split_time_range(START, end, shards)
+        assert len(windows) == shards
+        assert windows[0][0] == START and windows[-1][1] == end
+        assert all(a_end == b_start for (_, a_end), (b_start, _) in zip(windows, windows[1:]))
+        assert all(start < end for start, end in windows)
+
+
+def test_no_empty_shards():
+    # fewer microseconds than shards: the step rounds down to nothing, and the range is one shard
+    end = START + timedelta(microseconds=3)
+    assert split_time_range(START, end, 8) == [(START, end)]
+    assert split_time_range(START, START, 8) == []
+
+
+def test_records_returned_by_several_shards_are_kept_once():
+    def fetch(from_dt, to_dt):
+        # every shard also returns the record on its lower bound, with the version of that shard
+        return [{'identifier': 'edge', 'version': from_dt.hour}, {'identifier': str(from_dt.hour), 'at': None}]
+
+    records = fetch_sharded(fetch, START, START + timedelta(hours=4), shards=4, max_workers=2)
+    assert sorted(record['identifier'] for record in records) == ['0', '1', '2', '3', 'edge']
+    # shards are merged in order, so the last one wins
+    assert [record for record in records if record['identifier'] == 'edge'] == [{'identifier': 'edge', 'version': 3}]
+
+
+def test_records_are_ordered_by_time_with_missing_timestamps_last():
+    def fetch(from_dt, to_dt):
+        return [{'identifier': f'{from_dt.hour}-none', 'at': None},
+                {'identifier': str(from_dt.hour), 'at': f'2020-01-01T{3 - from_dt.hour:02}:00:00.000+00:00'}]
+
+    records = fetch_sharded(fetch, START, START + timedelta(hours=4), shards=4, time_field='at')
+    assert [record['identifier'] for record in records[:4]] == ['3', '2', '1', '0']
+    assert all(record['at'] is None for record in records[4:])
+
+
+def trades_between(trades, page_size):
+    """ The trades endpoint with inclusive from/to filters and continuation tokens. """
+    def handler(request):
+        matching = [trade for trade in trades
+                    if request.params['from'] <= trade['executionDate'] <= request.params['to']]
+        start = int(request.params.get('continuationToken') or 0)
+        page = {'trades': matching[start:start + page_size]}
+        if start + page_size < len(matching):
+            page['continuationToken'] = start + page_size
+        return 200, page
+    return handler
+
+
+def execution_date(dt: datetime) -> str:
+    return Client.format_date(dt)
+
+
+def test_list_sharded_trades(api, client):
+    end = START + timedelta(hours=8)
+    # one trade every 10 minutes, so several land exactly on shard boundaries
+    trades = [{'identifier': str(i), 'executionDate': execution_date(START + timedelta(minutes=10 * i))}
+              for i in range(48)]
+    api.route('GET', 'trades', trades_between(trades, 5))
+    assert client.list_sharded('list_trades', from_dt=START, to_dt=end, shards=4) == trades
+    # trades on a boundary are returned by both shards but kept once, and each shard followed its continuation tokens
+    assert len(api.requests) > 4
+    assert {request.params['from'] for request in api.requests} == {
+        execution_date(START + timedelta(hours=2 * i)) for i in range(4)}
+
+
+def test_list_sharded_passes_the_endpoint_arguments(api, client):
+    deposits = [{'identifier': str(i), 'createdAt': execution_date(START + timedelta(hours=i))} for i in range(4)]
+    api.route('GET', 'custodians/(?P<id>[^/]+)/deposits', lambda request: (200, [
+        deposit for deposit in reversed(deposits)
+        if request.match['id'] == 'c1' and request.params['from'] <= deposit['createdAt'] <= request.params['to']]))
+    assert client.list_sharded(
+        'list_custodian_deposits', 'c1', from_dt=START, to_dt=START + timedelta(hours=4), shards=2) == deposits
+    with pytest.raises(ValueError, match='list_symbols cannot be sharded'):
+        client.list_sharded('list_symbols', from_dt=START, to_dt=START + timedelta(hours=4))
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+
+from exchange_api.trade_cache import TradeCache, to_milliseconds
+
+START = datetime(2020, 9, 1, tzinfo=timezone.utc)
+
+
+def trade(identifier, days, status='Pending', received_days=None):
+    return {
+        'identifier': identifier,
+        'counterpartyIdentifier': 'counterparty',
+        'executionDate': (START + timedelta(days=days)).isoformat(timespec='milliseconds'),
+        'receivedDate': (START + timedelta(days=days if received_days is None else received_days)).isoformat(
+            timespec='milliseconds'),
+        'status': status,
+    }
+
+
+def trades_route(api, trades):
+    # filters on the execution date like the api, unpaged
+    def list_trades(request):
+        from_ms = to_milliseconds(request.params['from']) if 'from' in request.params else None
+        return 200, {'trades': [
+            t for t in trades.values() if from_ms is None or to_milliseconds(t['executionDate']) >= from_ms]}
+    api.route('GET', 'trades', list_trades)
+
+
+def test_incremental_sync_fetches_from_the_high_water_mark_minus_overlap(api, client):
+    trades = {t['identifier']: t for t in (trade('a', 0), trade('b', 5))}
+    trades_route(api, trades)
+    cache = TradeCache()
+    assert cache.sync(client) == 2
+    trades['c'] = trade('c', 6)
+    assert cache.sync(client) == 2
+    assert api.requests[-1].params['from'] == '2020-09-05T00:00:00.000+00:00'
+    assert [t['identifier'] for t in cache.list_trades()] == ['a', 'b', 'c']
+
+
+def test_refresh_picks_up_late_and_updated_trades(api, client):
+    trades = {t['identifier']: t for t in (trade('a', 0), trade('b', 5))}
+    trades_route(api, trades)
+    cache = TradeCache()
+    cache.sync(client)
+    # received long after its execution, and a status change of an older trade
+    trades['late'] = trade('late', 1, received_days=5)
+    trades['a'] = trade('a', 0, status='Settled')
+    cache.sync(client)
+    assert cache.get_trade('late') is None
+    assert cache.sync(client, refresh_interval=0) == 3
+    assert 'from' not in api.requests[-1].params
+    assert cache.get_trade('late') is not None
+    assert cache.get_trade('a')['status'] == 'Settled'
+
+
+def test_freshness_counts_from_the_last_refresh(api, client):
+    trades_route(api, {'a': trade('a', 0)})
+    cache = TradeCache()
+    assert not cache.is_fresh(60)
+    cache.sync(client)
+    refreshed = cache.last_refresh
+    cache.sync(client)
+    assert cache.last_refresh == refreshed
+    assert cache.last_sync >= refreshed
+    assert cache.is_fresh(60)
+
+
+def test_sync_from_date_covers_only_that_range(api, client):
+    trades_route(api, {t['identifier']: t for t in (trade('a', 0), trade('b', 5))})
+    cache = TradeCache()
+    cache.sync(client, from_dt=START + timedelta(days=3))
+    assert cache.covers(START + timedelta(days=3))
+    assert not cache.covers(START)
+    assert not cache.covers(None)
+    cache.sync(client, full=True)
+    assert cache.covers(None)
+
+
+def test_client_serves_trades_from_a_fresh_cache(api, client):
+    trades_route(api, {'a': trade('a', 0)})
+    api.route('GET', 'trades/(?P<id>[^/]+)', lambda request: (200, trade(request.match['id'], 0, 'Settled')))
+    client.trade_cache = TradeCache()
+    client.trade_cache.sync(client)
+    requests = len(api.requests)
+    assert [t['identifier'] for t in client.list_trades()['trades']] == ['a']
+    assert client.get_trade('a')['status'] == 'Pending'
+    assert len(api.requests) == requests
+    # not in the cache, bypassing it, and once the last refresh is too old
+    assert client.get_trade('b')['identifier'] == 'b'
+    assert client.get_trade('a', cached=False)['status'] == 'Settled'
+    client.trade_cache_max_age = 0
+    client.trade_cache._set_state('last_refresh', client.trade_cache.last_refresh - 1)
+    assert client.get_trade('a')['status'] == 'Settled'
+    assert len(api.requests) == requests + 3
@@ -0,0 +1,82 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from exchange_api import trade_frame
+from exchange_api.trade_frame import TradeFrame
+
+
+def trade(identifier, side, dealt, rate, counter, counterparty='123456', status='Open',
+          execution_date='2020-09-07T11:17:23.456+00:00'):
+    return {
+        'identifier': identifier, 'counterpartyIdentifier': counterparty, 'side': side, 'baseSymbol': 'XXBT',
+        'termSymbol': 'ZUSD', 'status': status, 'dealt': dealt, 'rate': rate, 'counter': counter,
+        'executionDate': execution_date,
+    }
+
+
+TRADES = [
+    trade('1', 'Buy', '10', '10000.00000000', '100000.00000000'),
+    trade('2', 'Sell', '2.5', '10000', '25000'),
+    trade('3', 'Buy', '1', '1', '1', status='Canceled'),
+    trade('4', 'Sell', '1.000000000000000001', '3', '3.000000000000000003', counterparty='234567',
+          execution_date='2020-09-08T00:00:00.000+00:00'),
+    # far beyond int64 once scaled to 18 decimals
+    trade('5', 'Buy', '123456789012.123456789012345678', '1', '123456789012.123456789012345678',
+          counterparty='234567', execution_date='2020-09-08T00:00:00.000+00:00'),
+]
+
+EXPECTED_POSITIONS = {
+    ('123456', 'XXBT'): Decimal('7.5'),
+    ('123456', 'ZUSD'): Decimal('-75000'),
+    ('234567', 'XXBT'): Decimal('123456789011.123456789012345677'),
+    ('234567', 'ZUSD'): Decimal('-123456789009.123456789012345675'),
+}
+
+
+@pytest.fixture(params=['numpy', 'no numpy'])
+def numpy_or_not(request, monkeypatch):
+    if request.param == 'no numpy':
+        monkeypatch.setattr(trade_frame, 'numpy', None)
+    elif trade_frame.numpy is None:
+        pytest.skip('numpy is not installed')
+
+
+def test_amounts_with_18_decimals_and_beyond_int64_are_kept_exactly(numpy_or_not):
+    frame = TradeFrame()
+    frame.extend(TRADES)
+    assert frame.scale == 18
+    assert frame.net_positions() == EXPECTED_POSITIONS
+    assert frame.notional_by_day() == {
+        (date(2020, 9, 7), 'ZUSD'): Decimal('125000'),
+        (date(2020, 9, 8), 'ZUSD'): Decimal('123456789015.123456789012345681')}
+
+
+def test_small_amounts_stay_int64_columns(numpy_or_not):
+    frame = TradeFrame()
+    frame.extend(TRADES[:3])
+    assert frame.scale == 8
+    assert frame.dealt.typecode == 'q'
+    assert frame.net_positions() == {('123456', 'XXBT'): Decimal('7.5'), ('123456', 'ZUSD'): Decimal('-75000')}
+
+
+def test_trailing_zeros_do_not_rescale():
+    frame = TradeFrame()
+    frame.append(trade('1', 'Buy', '10.000000000000000000000', '1', '10'))
+    assert frame.scale == 8
+    assert frame.from_scaled(frame.dealt[0]) == Decimal('10')
+
+
+def test_columns_are_copies_that_do_not_block_appends(numpy_or_not):
+    frame = TradeFrame()
+    frame.extend(TRADES[:3])
+    dealt, sides, days = frame.column('dealt'), frame.column('side'), frame.column('day')
+    frame.extend(TRADES[3:4])
+    assert list(dealt) == [1000000000, 250000000, 100000000]
+    assert list(sides) == [0, 1, 0]
+    assert len(days) == 3
+    assert list(frame.column('side')) == [0, 1, 0, 1]
+    # changing a returned column does not change the frame
+    dealt[0] = 0
+    assert frame.dealt[0] != 0
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import hashlib
+import random
+
+from exchange_api.trade_hashing import QUANTA, compute_trade_hashes, format_amount, trade_hash
+
+EXECUTION_DATE = datetime(2020, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc)
+
+
+def scalar_trade_hash(venue_id, counterparty_id, trade_id, side, base_symbol, term_symbol, dealt, rate, counter,
+                      execution_date):
+    # the reference implementation of trade_hash.py
+    content = '|'.join([
+        venue_id, counterparty_id, trade_id, side, base_symbol, term_symbol,
+        str(Decimal(dealt).quantize(QUANTA)), str(Decimal(rate).quantize(QUANTA)),
+        str(Decimal(counter).quantize(QUANTA)), execution_date.isoformat(timespec='milliseconds')])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def test_trade_hash_of_the_example():
+    assert trade_hash('123456', '987654', 'abc123', 'Sell', 'XBT', 'USD', '12.345678', '11201.72', '138292.83',
+                      EXECUTION_DATE) == '1d0b0b4ab7a8bb2c28062323efae4e4270c478daf65bdffdb97f0c1c08287305'
+
+
+def test_format_amount_matches_decimal():
+    amounts = ['1', '12.345678', '0.5', '0.000001', '1e-7', '-3.25', '100', '1234567890.123456789012345678',
+               '0', '0.0', '7.', '1E+3', '00012.5']
+    for amount in amounts:
+        assert format_amount(amount) == str(Decimal(amount).quantize(QUANTA)), amount
+
+
+def test_batch_hashes_are_identical_to_the_scalar_path():
+    rng = random.Random(1)
+    count = 2000
+    trade_ids = [f'trade-{i}' for i in range(count)]
+    sides = [rng.choice(['Buy', 'Sell']) for _ in range(count)]
+    dealts = [f'{rng.randint(0, 10 ** 4)}.{rng.randint(0, 10 ** 8)}' for _ in range(count)]
+    rates = [f'{rng.randint(1, 10 ** 5)}.{rng.randint(0, 99):02d}' for _ in range(count)]
+    counters = [str(Decimal(d) * Decimal(r)) for d, r in zip(dealts, rates)]
+    dates = [EXECUTION_DATE + timedelta(milliseconds=rng.randint(0, 10 ** 9)) for _ in range(count)]
+    expected = [scalar_trade_hash('123456', '987654', *trade) for trade in zip(
+        trade_ids, sides, ['XBT'] * count, ['USD'] * count, dealts, rates, counters, dates)]
+
+    for processes, chunk_size in ((1, 20000), (2, 300)):
+        assert compute_trade_hashes(
+            '123456', '987654', trade_ids, sides, 'XBT', 'USD', dealts, rates, counters, dates,
+            processes=processes, chunk_size=chunk_size) == expected
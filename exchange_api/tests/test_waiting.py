@@ -0,0 +1,148 @@
+import asyncio
+import threading
+from itertools import count, islice
+from time import monotonic, sleep
+
+import pytest
+
+from exchange_api.models import WebhookType
+from exchange_api.waiting import Poller, backoff, wait_until, wait_until_async
+
+
+def test_backoff_grows_to_the_max_interval_with_jitter():
+    assert list(islice(backoff(0.1, 0.4, 2.0, jitter=0), 5)) == [0.1, 0.2, 0.4, 0.4, 0.4]
+    for interval, jittered in zip([0.1, 0.2, 0.4, 0.4], backoff(0.1, 0.4, 2.0, jitter=0.5)):
+        assert interval / 2 <= jittered <= interval
+
+
+def test_wait_until_returns_the_first_value_satisfying_the_predicate():
+    values = count()
+    assert wait_until(lambda n: n >= 3, lambda: next(values), timeout=5, initial_interval=0.01) == 3
+
+
+def test_wait_until_times_out_and_backs_off():
+    calls = []
+    start = monotonic()
+    with pytest.raises(TimeoutError, match='Timed out waiting for nothing. Last value: False'):
+        wait_until(bool, lambda: calls.append(monotonic()) or False, timeout=0.5, description='nothing',
+                   initial_interval=0.05, jitter=0)
+    assert 0.5 <= monotonic() - start < 1.5
+    # 0.05, 0.1, 0.2 and the rest of the timeout, not a call every 0.05 seconds
+    assert len(calls) <= 5
+    gaps = [b - a for a, b in zip(calls, calls[1:])]
+    assert gaps[1] > gaps[0]
+
+
+def test_wait_until_async():
+    values = count()
+
+    async def source():
+        return next(values)
+
+    assert asyncio.run(wait_until_async(lambda n: n >= 3, source, timeout=5, initial_interval=0.01)) == 3
+    with pytest.raises(TimeoutError):
+        asyncio.run(wait_until_async(lambda n: False, source, timeout=0.1, initial_interval=0.01))
+
+
+def test_waits_on_the_same_key_share_one_poll():
+    polls = []
+    poller = Poller(initial_interval=0.05, jitter=0)
+    results = []
+
+    def source():
+        polls.append(monotonic())
+        return len(polls)
+
+    def wait():
+        results.append(poller.wait('withdrawals', source, lambda n: n >= 4, timeout=5))
+
+    threads = [threading.Thread(target=wait) for _ in range(10)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        poller.close()
+    # each new wait polls right away, but never more than once per wait plus the backoff polls
+    assert len(results) == 10 and all(n >= 4 for n in results)
+    assert len(polls) < 10 + 4
+
+
+def test_predicate_and_source_errors_end_the_wait():
+    poller = Poller(initial_interval=0.01)
+
+    def fail():
+        raise ValueError('source failed')
+
+    try:
+        with pytest.raises(ValueError, match='source failed'):
+            poller.wait('a', fail, lambda value: True, timeout=5)
+        with pytest.raises(ZeroDivisionError):
+            poller.wait('b', lambda: 0, lambda value: 1 / value, timeout=5)
+    finally:
+        poller.close()
+
+
+def test_matching_webhook_completes_the_wait():
+    poller = Poller(initial_interval=10)
+    webhook = {'type': 'WithdrawalStatusChanged', 'payload': {'status': 'Completed'}}
+    threading.Timer(0.1, poller.on_webhook, [webhook]).start()
+    try:
+        start = monotonic()
+        assert poller.wait(
+            'withdrawals', lambda: 'Pending', lambda status: status == 'Completed', timeout=5,
+            webhook_types=[WebhookType.WithdrawalStatusChanged],
+            webhook_predicate=lambda w: w['payload']['status'] == 'Completed') is webhook
+        assert monotonic() - start < 5
+    finally:
+        poller.close()
+
+
+def test_webhook_makes_the_poller_check_again_immediately():
+    statuses = iter(['Pending', 'Completed'])
+    poller = Poller(initial_interval=10, jitter=0)
+    # no webhook predicate: the webhook only triggers a poll, and ones of other types are ignored
+    threading.Timer(0.1, poller.on_webhook, [{'type': 'CustomerDepositCompleted'}]).start()
+    threading.Timer(0.2, poller.on_webhook, [{'type': 'WithdrawalStatusChanged'}]).start()
+    try:
+        start = monotonic()
+        assert poller.wait('withdrawals', lambda: next(statuses), lambda status: status == 'Completed',
+                           timeout=5, webhook_types=['WithdrawalStatusChanged']) == 'Completed'
+        assert monotonic() - start < 5
+    finally:
+        poller.close()
+
+
+def test_timed_out_waits_leave_the_source():
+    poller = Poller(initial_interval=0.01)
+    try:
+        with pytest.raises(TimeoutError, match="Timed out waiting for a. Last value: 0"):
+            poller.wait('a', lambda: 0, bool, timeout=0.1)
+        sleep(0.1)
+        assert poller.sources == {}
+    finally:
+        poller.close()
+
+
+def test_close_ends_pending_waits_and_the_thread():
+    poller = Poller(initial_interval=10)
+    errors = []
+
+    def wait():
+        try:
+            poller.wait('a', lambda: 0, bool, timeout=30)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=wait)
+    thread.start()
+    sleep(0.1)
+    start = monotonic()
+    poller.close()
+    thread.join(5)
+    assert monotonic() - start < 5
+    assert [str(e) for e in errors] == ['Poller is closed']
+    assert not poller.thread.is_alive()
+    with pytest.raises(RuntimeError, match='Poller is closed'):
+        poller.wait('a', lambda: 0, bool)
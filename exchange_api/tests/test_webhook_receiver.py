@@ -0,0 +1,131 @@
+import asyncio
+
+from exchange_api.async_client import AsyncClient
+from exchange_api.exceptions import SkippedWebhooks
+from exchange_api.webhook_receiver import WebhookReceiver
+from exchange_api.webhooks import MemorySequenceStore
+from tests.webhook_pusher import WebhookPusher, webhook
+
+
+def url(receiver: WebhookReceiver) -> str:
+    host, port = receiver.runner.addresses[0][:2]
+    return f'http://{host}:{port}{receiver.path}'
+
+
+def receive(pushes, client=None, store=None, gap_timeout=0.1, fail=lambda webhooks: False, **pusher_kwargs):
+    """ Runs a receiver and pushes `pushes` (lists of webhooks or raw bodies) to it, returns the handled webhooks,
+    the errors, the receiver and the response statuses. The handler raises for the batches `fail` returns True
+    for. """
+    handled = []
+    errors = []
+
+    async def handler(webhooks):
+        if fail(webhooks):
+            raise ValueError('handler failed')
+        handled.extend(webhooks)
+
+    async def run():
+        receiver = WebhookReceiver(
+            client, default_handler=handler, store=store, gap_timeout=gap_timeout,
+            on_error=lambda webhooks, e: errors.append(e))
+        await receiver.start(host='127.0.0.1', port=0)
+        statuses = []
+        try:
+            async with WebhookPusher(url(receiver), **pusher_kwargs) as pusher:
+                for push in pushes:
+                    statuses += await push(pusher)
+            # long enough for gaps to be backfilled or skipped
+            await asyncio.sleep(gap_timeout * 3)
+        finally:
+            await asyncio.wait_for(receiver.stop(), 5)
+            if client is not None:
+                await client.close()
+        return receiver, statuses
+
+    receiver, statuses = asyncio.run(run())
+    return handled, errors, receiver, statuses
+
+
+def test_out_of_order_and_duplicate_pushes_are_handled_once():
+    store = MemorySequenceStore(0)
+    webhooks = [webhook(n) for n in range(1, 501)]
+    handled, errors, receiver, statuses = receive(
+        [lambda pusher: pusher.push(webhooks, shuffle=20, duplicates=0.2)], store=store, per_request=5)
+    assert sorted(w['sequenceNumber'] for w in handled) == list(range(1, 501))
+    assert receiver.stats['duplicates'] == 100
+    assert set(statuses) == {200}
+    assert errors == []
+    assert store.sequence_number == 500
+
+
+def test_push_without_sequence_number_is_rejected():
+    async def push(pusher):
+        return [await pusher.send([webhook(1), {'type': 'CustomerStatusChanged'}]), await pusher.send(b'{')]
+
+    handled, errors, receiver, statuses = receive([push])
+    assert statuses == [400, 400]
+    assert handled == []
+
+
+def test_gaps_without_client_are_reported_as_skipped():
+    webhooks = [webhook(n) for n in range(1, 11)]
+    handled, errors, receiver, statuses = receive([
+        lambda pusher: pusher.push(webhooks[:1]), lambda pusher: pusher.push(webhooks[1:], drop={4, 5, 8})])
+    assert len(handled) == 7
+    assert receiver.stats['skipped'] == 3
+    assert [(e.first_sequence_number, e.last_sequence_number) for e in errors] == [(4, 5), (8, 8)]
+    assert all(isinstance(e, SkippedWebhooks) for e in errors)
+
+
+def test_gaps_are_backfilled_from_the_api(api):
+    webhooks = [webhook(n) for n in range(1, 11)]
+    delivered = []
+
+    def mark_delivered(request):
+        delivered.extend(request.json['deliveredWebhooks'])
+        return 200, None
+
+    api.route('GET', 'webhooks/(?P<n>\\d+)', lambda request: (200, webhooks[int(request.match['n']) - 1]))
+    api.route('GET', 'webhooks', lambda request: (
+        200, {'webhooks': webhooks[int(request.params['fromSequenceNumber']) - 1:]}))
+    api.route('POST', 'webhooks/delivered', mark_delivered)
+    client = AsyncClient(api.key, api.secret, api.url, None, venue_id='venue')
+    store = MemorySequenceStore()
+    handled, errors, receiver, statuses = receive([
+        lambda pusher: pusher.push(webhooks[:1]), lambda pusher: pusher.push(webhooks[1:], drop={4, 5, 8})],
+        client=client, store=store)
+    assert sorted(w['sequenceNumber'] for w in handled) == list(range(1, 11))
+    assert sorted(delivered) == [4, 5, 8]
+    assert receiver.stats['skipped'] == 0
+    assert errors == []
+    assert store.sequence_number == 10
+
+
+def test_failed_handler_holds_the_saved_sequence_number():
+    store = MemorySequenceStore(0)
+    webhooks = [webhook(n) for n in range(1, 11)]
+    handled, errors, receiver, statuses = receive(
+        [lambda pusher: pusher.push(webhooks)], store=store, concurrency=1,
+        fail=lambda batch: any(w['sequenceNumber'] == 4 for w in batch))
+    assert 4 in receiver.failed
+    assert receiver.stats['failed'] == len(receiver.failed)
+    assert store.sequence_number == min(receiver.failed) - 1 < 4
+    assert all(isinstance(e, ValueError) for e in errors)
+
+
+def test_store_errors_are_reported_and_do_not_stop_the_dispatcher():
+    class FailingStore(MemorySequenceStore):
+        def save(self, sequence_number):
+            if self.sequence_number == 0:
+                self.sequence_number = -1
+                raise OSError('disk full')
+            super().save(sequence_number)
+
+    store = FailingStore(0)
+    webhooks = [webhook(n) for n in range(1, 11)]
+    handled, errors, receiver, statuses = receive(
+        [lambda pusher: pusher.push(webhooks[:5]), lambda pusher: pusher.push(webhooks[5:])], store=store,
+        concurrency=1)
+    assert len(handled) == 10
+    assert [type(e) for e in errors] == [OSError]
+    assert store.sequence_number == 10
@@ -0,0 +1,82 @@
+from exchange_api.waiting import wait_until
+from exchange_api.webhooks import MemorySequenceStore, WebhookConsumer
+
+
+def webhooks_route(api, webhooks, delivered):
+    def list_webhooks(request):
+        start = int(request.params.get('fromSequenceNumber') or 0)
+        return 200, {'webhooks': [
+            webhook for webhook in webhooks if webhook['sequenceNumber'] >= start
+            and webhook['sequenceNumber'] not in delivered]}
+
+    def mark_delivered(request):
+        delivered.update(request.json['deliveredWebhooks'])
+        return 200, None
+
+    api.route('GET', 'webhooks', list_webhooks)
+    api.route('POST', 'webhooks/delivered', mark_delivered)
+
+
+def test_failed_webhooks_hold_the_stored_sequence_number(api, client):
+    webhooks = [{'sequenceNumber': i, 'type': 'CustomerStatusChanged'} for i in range(5)]
+    delivered = set()
+    webhooks_route(api, webhooks, delivered)
+    store = MemorySequenceStore()
+    errors = []
+
+    def fail_on_2(webhook):
+        if webhook['sequenceNumber'] == 2:
+            raise ValueError('handler failed')
+
+    consumer = WebhookConsumer(
+        client, {'CustomerStatusChanged': fail_on_2}, store=store, workers=2, ack_interval=0.01,
+        min_poll_interval=0.01, max_poll_interval=0.01, max_attempts=2, on_error=lambda webhook, e: errors.append(e))
+    with consumer:
+        wait_until(lambda stats: stats.processed + stats.failed == 5, lambda: consumer.stats, timeout=5)
+    assert delivered == {0, 1, 3, 4}
+    assert store.sequence_number == 1
+    assert consumer.metrics()['processed_sequence_number'] == 1
+    assert len(errors) == 1
+
+    handled = []
+    consumer = WebhookConsumer(
+        client, {'CustomerStatusChanged': lambda webhook: handled.append(webhook['sequenceNumber'])}, store=store,
+        ack_interval=0.01, min_poll_interval=0.01, max_poll_interval=0.01)
+    assert consumer.next_sequence_number == 2
+    with consumer:
+        wait_until(lambda stats: stats.processed == 1, lambda: consumer.stats, timeout=5)
+    assert handled == [2]
+    assert delivered == {0, 1, 2, 3, 4}
+    assert store.sequence_number == 2
+
+
+def test_restart_resumes_at_the_failed_webhook(api, client):
+    webhooks = [{'sequenceNumber': i, 'type': 'CustomerStatusChanged'} for i in range(3)]
+    delivered = set()
+    webhooks_route(api, webhooks, delivered)
+    failing = [True]
+
+    def handler(webhook):
+        if webhook['sequenceNumber'] == 0 and failing[0]:
+            raise ValueError('handler failed')
+
+    consumer = WebhookConsumer(
+        client, {'CustomerStatusChanged': handler}, workers=1, ack_interval=0.01, min_poll_interval=0.01,
+        max_poll_interval=0.01, max_attempts=1)
+    with consumer:
+        wait_until(lambda stats: stats.processed + stats.failed == 3, lambda: consumer.stats, timeout=5)
+    assert delivered == {1, 2}
+    assert consumer.processed_sequence_number is None
+
+    failing[0] = False
+    with consumer:
+        wait_until(lambda stats: stats.processed == 3, lambda: consumer.stats, timeout=5)
+    assert delivered == {0, 1, 2}
+    # 1 and 2 were delivered in the first run and are not returned again
+    assert consumer.processed_sequence_number == 0
+
+
+def test_stop_without_start_does_nothing(client):
+    consumer = WebhookConsumer(client, {})
+    consumer.stop()
+    assert consumer.threads == []
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import random
+from typing import Any, Dict, Iterable, List, Optional
+
+import aiohttp
+
+
+def webhook(sequence_number: int, webhook_type: str = 'CustomerStatusChanged') -> Dict[str, Any]:
+    return {'sequenceNumber': sequence_number, 'type': webhook_type, 'data': {'customerIdentifier': 'customer'}}
+
+
+class WebhookPusher:
+    """ Stand-in for Strike pushing webhooks to a `WebhookReceiver`, for tests and benchmarks:
+
+        async with WebhookPusher(f'http://127.0.0.1:{port}/webhooks') as pusher:
+            await pusher.push([webhook(n) for n in range(1000)], shuffle=10, duplicates=0.1, drop={5})
+
+    Webhooks are sent `per_request` at a time from `concurrency` connections. Like the real pushes they may arrive
+    out of order (shuffled within windows of `shuffle`), more than once (a `duplicates` fraction is sent again) or
+    not at all (the sequence numbers in `drop`). """
+
+    def __init__(self, url: str, concurrency: int = 8, per_request: int = 1, seed: int = 0):
+        self.url = url
+        self.concurrency = concurrency
+        self.per_request = per_request
+        self.random = random.Random(seed)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.statuses: Dict[int, int] = {}
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.concurrency))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    def order(self, webhooks: List[Any], shuffle: int, duplicates: float, drop: Iterable[int]) -> List[Any]:
+        drop = set(drop)
+        webhooks = [w for w in webhooks if w['sequenceNumber'] not in drop]
+        webhooks += self.random.sample(webhooks, int(len(webhooks) * duplicates))
+        if shuffle > 1:
+            windows = [webhooks[i:i + shuffle] for i in range(0, len(webhooks), shuffle)]
+            for window in windows:
+                self.random.shuffle(window)
+            webhooks = [w for window in windows for w in window]
+        return webhooks
+
+    async def send(self, body) -> int:
+        # bytes are sent as they are, e.g. to push malformed JSON
+        data = body if isinstance(body, bytes) else json.dumps(body)
+        async with self.session.post(self.url, data=data, headers={'Content-Type': 'application/json'}) as response:
+            await response.read()
+            self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+            return response.status
+
+    async def push(self, webhooks: List[Any], shuffle: int = 0, duplicates: float = 0.0, drop: Iterable[int] = ()):
+        webhooks = self.order(webhooks, shuffle, duplicates, drop)
+        bodies = [webhooks[i:i + self.per_request] for i in range(0, len(webhooks), self.per_request)]
+        if self.per_request == 1:
+            bodies = [body[0] for body in bodies]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send(body):
+            async with semaphore:
+                return await self.send(body)
+
+        return await asyncio.gather(*(send(body) for body in bodies))
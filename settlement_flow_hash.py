@@ -36,6 +36,42 @@ def compute_settlement_flow_hash(
     return content, settlement_flow_hash
 
 
+def flow_sort_key(flow):
+    return flow['counterpartyCustodianIdentifier'], flow['strikeSymbol']
+
+
+def compute_settlement_flow_hash_streaming(
+        settlement_plan_identifier, account_identifier, inflows, outflows, presorted=False):
+    """ Same hash as compute_settlement_flow_hash, but every flow is fed straight into sha256 instead of building and
+    joining the whole content, and the caller's lists are not modified. With presorted=True, inflows and outflows
+    must already be ordered by (counterpartyCustodianIdentifier, strikeSymbol) and can be any iterables, e.g.
+    generators reading flows from disk, so memory stays bounded regardless of the number of flows. Otherwise only a
+    sorted list of references to the flows is built. """
+
+    if not presorted:
+        inflows = sorted(inflows, key=flow_sort_key)
+        outflows = sorted(outflows, key=flow_sort_key)
+
+    settlement_flow_hash = sha256()
+    for inflow in inflows:
+        settlement_flow_hash.update(str.encode("|".join([
+            inflow['counterpartyCustodianIdentifier'],
+            account_identifier,
+            inflow['strikeSymbol'],
+            str(Decimal(inflow['amount']).quantize(quanta)),
+            ""])))
+    for outflow in outflows:
+        settlement_flow_hash.update(str.encode("|".join([
+            account_identifier,
+            outflow['counterpartyCustodianIdentifier'],
+            outflow['strikeSymbol'],
+            str(Decimal(outflow['amount']).quantize(quanta)),
+            ""])))
+    settlement_flow_hash.update(str.encode(settlement_plan_identifier))
+
+    return settlement_flow_hash.hexdigest()
+
+
 content, settlement_flow_hash = compute_settlement_flow_hash(
     settlement_plan_identifier="sp-1",
     account_identifier="id-1",
@@ -52,3 +88,18 @@ assert content == \
     "id-2|id-1|USD|500.000000000000000000|id-3|id-1|USD|1000.000000000000000000|id-3|id-1|XBT|1.000000000000000000|id-1|id-2|XET|1.500000000000000000|id-1|id-3|XET|3.000000000000000000|sp-1"
 assert settlement_flow_hash == \
     "b64c129e8d94b746a54f5ab2dfc27090513db8f7647e13ab60844f2ae459af42"
+
+inflows = [
+    {'counterpartyCustodianIdentifier': 'id-3', 'strikeSymbol': 'XBT', 'amount': '1'},
+    {'counterpartyCustodianIdentifier': 'id-3', 'strikeSymbol': 'USD', 'amount': '1000'},
+    {'counterpartyCustodianIdentifier': 'id-2', 'strikeSymbol': 'USD', 'amount': '500'}]
+
+assert compute_settlement_flow_hash_streaming(
+    settlement_plan_identifier="sp-1",
+    account_identifier="id-1",
+    inflows=inflows,
+    outflows=[
+        {'counterpartyCustodianIdentifier': 'id-3', 'strikeSymbol': 'XET', 'amount': '3'},
+        {'counterpartyCustodianIdentifier': 'id-2', 'strikeSymbol': 'XET', 'amount': '1.5'}]) == settlement_flow_hash
+# the caller's flows are left in their original order
+assert inflows[0]['strikeSymbol'] == 'XBT'
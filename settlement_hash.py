@@ -1,14 +1,80 @@
+from bisect import bisect_left, insort
 from hashlib import sha256
 
+try:
+    from sortedcontainers import SortedList
+except ImportError:
+    SortedList = None
+
 
 def compute_settlement_hash(trades):
     content = "|".join(trades[x] for x in sorted(trades.keys()))
     return sha256(str.encode(content)).hexdigest()
 
 
+class SettlementHashState:
+    """ Keeps the settlement hash of a settlement plan up to date while trades are added to and removed from it,
+    e.g. after `modify_trades_in_settlement_plan` or `remove_customer_from_settlement_plan`.
+
+    Trade ids are kept sorted instead of re-sorting every trade id, and the encoded trade hashes are cached so
+    computing the hash is a single streaming pass. With `sortedcontainers` installed, adding or removing a trade is
+    O(log n); without it the ids are kept in a plain list, where the binary search is O(log n) but inserting and
+    deleting shift the list, which is O(n). """
+
+    def __init__(self, trades=None):
+        self.trade_ids = [] if SortedList is None else SortedList()
+        self.encoded_trade_hashes = {}
+        self.settlement_hash = None
+        for trade_id, trade_hash in (trades or {}).items():
+            self.add(trade_id, trade_hash)
+
+    def add(self, trade_id, trade_hash):
+        if trade_id not in self.encoded_trade_hashes:
+            if SortedList is None:
+                insort(self.trade_ids, trade_id)
+            else:
+                self.trade_ids.add(trade_id)
+        self.encoded_trade_hashes[trade_id] = str.encode(trade_hash)
+        self.settlement_hash = None
+
+    def remove(self, trade_id):
+        del self.encoded_trade_hashes[trade_id]
+        if SortedList is None:
+            del self.trade_ids[bisect_left(self.trade_ids, trade_id)]
+        else:
+            self.trade_ids.remove(trade_id)
+        self.settlement_hash = None
+
+    def update(self, add_trades=None, remove_trades=None):
+        for trade_id in remove_trades or []:
+            self.remove(trade_id)
+        for trade_id, trade_hash in (add_trades or {}).items():
+            self.add(trade_id, trade_hash)
+
+    def hexdigest(self):
+        if self.settlement_hash is None:
+            content_hash = sha256()
+            for i, trade_id in enumerate(self.trade_ids):
+                if i:
+                    content_hash.update(b"|")
+                content_hash.update(self.encoded_trade_hashes[trade_id])
+            self.settlement_hash = content_hash.hexdigest()
+        return self.settlement_hash
+
+
 settlement_hash = compute_settlement_hash({
     'def456': '1691397c0dd59e172873b77fe6a156a323a1ecd13d00bce16edd0a751599cc09',
     'abc123': '224e51ea4aa4fa8b8e4ae0c6b0417b19f9f02aba761247da2d601532177a2b2a'
 })
 
 assert settlement_hash == 'e76b23c00d35eacab62b6bd699149a8156bd53c8cbe17c354f4d52d2b25e2bc5'
+
+settlement_hash_state = SettlementHashState({
+    'def456': '1691397c0dd59e172873b77fe6a156a323a1ecd13d00bce16edd0a751599cc09',
+    'xyz789': '0e5751c026e543b2e8ab2eb06099daa1d1e5df47778f7787faab45cdf12fe3a8',
+})
+settlement_hash_state.update(
+    add_trades={'abc123': '224e51ea4aa4fa8b8e4ae0c6b0417b19f9f02aba761247da2d601532177a2b2a'},
+    remove_trades=['xyz789'])
+
+assert settlement_hash_state.hexdigest() == settlement_hash